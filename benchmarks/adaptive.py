@@ -0,0 +1,67 @@
+import os
+import json
+import time
+import tempfile
+import numpy as np
+from simulator.simulator import Simulator
+from simulator.settings import simulator_settings
+
+# scenario, variable compared, sample time given to the PID
+SCENARIOS = [
+    ("rl_limited_vr", ("rl_limited_vr", "i"), None),
+    ("rl_series_with_rc", ("rl", "i"), None),
+    ("rl_plus_pid", ("rl", "i"), 0.01),
+]
+DURATION = 25
+# name, integrator of the continuous models, adaptive settings
+RUNS = [
+    ("fixed euler", "euler", None),
+    ("adaptive euler", "euler", {"tolerance": 1e-6, "max_step": 0.1}),
+    ("adaptive rk4", "rk4", {"tolerance": 1e-6, "max_step": 0.1}),
+    ("adaptive zoh", "zoh", {"tolerance": 1e-6, "max_step": 0.1}),
+    ("adaptive zoh 1e-8", "zoh", {"tolerance": 1e-8, "max_step": 0.1}),
+]
+
+def write_scenario(path, scenario, integrator, sample_time, scale = 1):
+    """ Copies a scenario, with its events `scale` times more cycles away """
+    source = os.path.join(simulator_settings["path_to_models"], "examples", scenario)
+    for f in os.listdir(source):
+        with open(os.path.join(source, f), "r") as rf:
+            spec = json.load(rf)
+        if spec["class"] in ["RC", "RL", "RLLimitedVr"]:
+            spec["integrator"] = integrator
+        if spec["class"].startswith("PID") and sample_time:
+            spec["sample_time"] = sample_time
+        if spec["class"] == "SignalGenerator":
+            for event in spec["params"]["events"]:
+                for key, settings in event.items():
+                    if "cycle" in settings:
+                        settings["cycle"] *= scale
+                    if key.startswith("ramp"):
+                        settings["value"] /= scale
+        with open(os.path.join(path, f), "w") as wf:
+            json.dump(spec, wf)
+
+def simulate(scenario, variable, integrator, sample_time, dt, adaptive = None, scale = 1):
+    with tempfile.TemporaryDirectory() as path:
+        write_scenario(path, scenario, integrator, sample_time, scale)
+        sim = Simulator(path, dt, DURATION, adaptive = adaptive)
+    sim.record(*variable)
+    start = time.perf_counter()
+    sim.run()
+    elapsed = time.perf_counter() - start
+    return sim.t.values(), getattr(sim.models[variable[0]], variable[1]).values(), elapsed
+
+def run():
+    dt = simulator_settings["dt"]
+    print("{} s at dt = {} s, error against rk4 at dt/10".format(DURATION, dt))
+    print("{:<18} {:<18} {:>7} {:>10} {:>9}".format("scenario", "run", "steps", "max error", "time (s)"))
+    for scenario, variable, sample_time in SCENARIOS:
+        t_reference, reference, _ = simulate(scenario, variable, "rk4", sample_time, dt/10, scale = 10)
+        for name, integrator, adaptive in RUNS:
+            t, values, elapsed = simulate(scenario, variable, integrator, sample_time, dt, adaptive)
+            error = np.max(np.abs(values - np.interp(t, t_reference, reference)))
+            print("{:<18} {:<18} {:>7} {:>10.1e} {:>9.3f}".format(scenario, name, len(t) - 1, error, elapsed))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,71 @@
+import os
+import json
+import time
+import tempfile
+import numpy as np
+from multiprocessing.dummy import Pool
+from simulator.simulator import Simulator
+from simulator.settings import simulator_settings
+from simulator.utils.performance_meter import PerformanceMeter
+from simulator.tuner.brute import BruteTuner
+
+SCENARIO = "rl_plus_pid"
+DURATION = 2
+STEPS = 12
+
+def write_settings(source, path, processes):
+    """ Tuner settings trying STEPS values of Kp and of Ti """
+    os.makedirs(os.path.join(path, "tuner"), exist_ok = True)
+    with open(os.path.join(source, "tuner", "brute.json"), "r") as rf:
+        settings = json.load(rf)
+    settings.update({"p_range": [1, 10], "p_steps": STEPS, "i_range": [0.1, 1], "i_steps": STEPS, "d_steps": 1,
+        "processes": processes, "quiet": True, "cache": {"enabled": False}})
+    with open(os.path.join(path, "tuner", "brute.json"), "w") as wf:
+        json.dump(settings, wf)
+
+def thread_pool_run(tuner):
+    """ The tuner as it was: a thread pool and a simulator built for each candidate """
+    def run_sim(p, i, d):
+        sim = Simulator(simulator_settings["path_to_models"], simulator_settings["dt"], simulator_settings["duration"])
+        pf = PerformanceMeter(sim, simulator_settings["performance_meter"])
+        for name, value in [("Kp", p), ("Ti", i), ("Td", d)]:
+            setattr(sim.models[tuner.pid_name], name, value)
+        sim.run(None, pf)
+        return {"result": tuner.calculate_result(pf.results()), "settings": {"p": p, "i": i, "d": d}, "abandoned": False}
+    candidates = [[p, i, d] for p in np.linspace(*tuner.p_range, tuner.p_steps)
+        for i in np.linspace(*tuner.i_range, tuner.i_steps) for d in np.linspace(*tuner.d_range, tuner.d_steps)]
+    with Pool() as pool:
+        tuner.results = pool.starmap(run_sim, candidates)
+    tuner.find_best()
+
+def run():
+    saved = dict(simulator_settings)
+    with tempfile.TemporaryDirectory() as path:
+        simulator_settings.update({
+            "path_to_settings": path,
+            "path_to_models": os.path.join(saved["path_to_models"], "examples", SCENARIO),
+            "duration": DURATION
+        })
+        cpus = os.cpu_count()
+        print("{}, {} candidates of {} s at dt = {} s, {} CPUs".format(SCENARIO, STEPS**2, DURATION, simulator_settings["dt"], cpus))
+        results = {}
+        times = {}
+        cases = [("threads", None), ("1 process", 1)] + ([("{} processes".format(cpus), cpus)] if cpus > 1 else [])
+        for name, processes in cases:
+            write_settings(saved["path_to_settings"], path, processes)
+            tuner = BruteTuner()
+            start = time.perf_counter()
+            if name == "threads":
+                thread_pool_run(tuner)
+            else:
+                tuner.run()
+            elapsed = time.perf_counter() - start
+            results[name] = [r["result"] for r in tuner.results]
+            times[name] = elapsed
+            print("{:<14} {:>8.2f} s {:>8.1f} candidates/s ({:.1f}x)".format(name, elapsed, len(tuner.results)/elapsed, times["threads"]/elapsed))
+        assert all(r == results["threads"] for r in results.values()), "results differ"
+    simulator_settings.clear()
+    simulator_settings.update(saved)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,32 @@
+import os
+import time
+import numpy as np
+from simulator.simulator import Simulator
+from simulator.settings import simulator_settings
+
+SCENARIOS = ["pid_limited_integral_rl", "rl_limited_vr_pid", "rl_plus_pid", "rl_series_with_rc"]
+DURATION = 100
+
+def simulate(path, dt, record, compiled):
+    sim = Simulator(path, dt, DURATION, record = record)
+    start = time.perf_counter()
+    if compiled:
+        sim.compile()
+    sim.run()
+    return sim, time.perf_counter() - start
+
+def run():
+    dt = simulator_settings["dt"]
+    print("{} s at dt = {} s, compile time included".format(DURATION, dt))
+    print("{:<24} {:<9} {:>12} {:>10} {:>8} {:>10}".format("scenario", "record", "interpreted", "compiled", "speedup", "identical"))
+    for scenario in SCENARIOS:
+        path = os.path.join(simulator_settings["path_to_models"], "examples", scenario)
+        for record in ["observed", "all"]:
+            reference, interpreted = simulate(path, dt, record, False)
+            sim, compiled = simulate(path, dt, record, True)
+            identical = all(np.array_equal(np.asarray(getattr(model, variable)), np.asarray(getattr(sim.models[name], variable)), equal_nan = True)
+                for name, model in reference.models.items() for variable in model.traces)
+            print("{:<24} {:<9} {:>10.2f} s {:>8.2f} s {:>7.1f}x {:>10}".format(scenario, record, interpreted, compiled, interpreted/compiled, str(identical)))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,61 @@
+import time
+import numpy as np
+from scipy.integrate import solve_ivp
+from simulator.models.electric_motor import ElectricMotor
+
+DURATION = 2.
+# speeds compared every
+PERIOD = 0.004
+VA = 12.
+# a small DC motor: te = 1 ms, ta = 0.2 ms, tm = 1 s
+PARAMS = {
+    "coil_turns": 1000, "coil_size": 0.05, "magnetic_permea": 1e-3, "solenoid_length": 0.1, "solenoid_area": 1e-3,
+    "stator_induc": 0.1, "stator_resist": 100,
+    "rotor_induc": 2e-4, "rotor_resist": 1, "rotor_inertia": 1e-4, "viscous_friction": 1e-4,
+    "load_torque": 0.01,
+    "stator_current": 0.5, "rotor_current": 0, "rotor_speed": 0, "rotor_position": 0,
+    "stator_voltage": 100
+}
+
+def reference():
+    """ Speeds every PERIOD, by a stiff solver """
+    m = ElectricMotor(PERIOD, **PARAMS)
+    def derivatives(t, x):
+        ie, ia, w = x
+        return [(m.stator_voltage - m.Re*ie)/m.Le, (VA - m.Ra*ia - m.K*ie*w)/m.La, (m.K*ie*ia - m.F*w - m.load_torque)/m.J]
+    times = np.arange(int(round(DURATION/PERIOD)) + 1)*PERIOD
+    return solve_ivp(derivatives, (0, DURATION), [m.ie[0], m.ia[0], m.w[0]], method = "Radau", t_eval = times, rtol = 1e-10, atol = 1e-10).y[2]
+
+def stable_euler_step():
+    """ Longest step of explicit Euler stable on the rotor, at the final stator current """
+    m = ElectricMotor(PERIOD, **PARAMS)
+    flux = m.K*m.stator_voltage/m.Re
+    eigenvalues = np.linalg.eigvals([[-m.Ra/m.La, -flux/m.La], [flux/m.J, -m.F/m.J]])
+    return min(-2*e.real/abs(e)**2 for e in eigenvalues)
+
+def run_motor(integrator, dt):
+    motor = ElectricMotor(dt, **dict(PARAMS, integrator = integrator))
+    steps = int(round(DURATION/dt))
+    start = time.perf_counter()
+    with np.errstate(all = "ignore"):
+        for _ in range(steps):
+            motor.calculate(VA)
+    elapsed = time.perf_counter() - start
+    return np.array(motor.w[::int(round(PERIOD/dt))]), steps, elapsed
+
+def run():
+    expected = reference()
+    limit = stable_euler_step()
+    # steps dividing PERIOD, below the stability limit of Euler
+    stable = PERIOD/np.ceil(PERIOD/(0.9*limit))
+    cases = [("zoh", PERIOD), ("zoh", 0.001), ("trapezoidal", 0.001), ("backward_euler", 0.001),
+        ("euler", PERIOD), ("euler", stable), ("euler", 0.00001)]
+    print("DC motor, Va = {} V for {} s, explicit Euler stable below dt = {:.3g} s".format(VA, DURATION, limit))
+    print("{:<16} {:>9} {:>8} {:>10} {:>14}".format("integrator", "dt (s)", "steps", "time (s)", "max error (%)"))
+    for integrator, dt in cases:
+        w, steps, elapsed = run_motor(integrator, dt)
+        error = np.max(np.abs(w - expected))/np.max(np.abs(expected))*100
+        print("{:<16} {:>9.2g} {:>8} {:>10.4f} {:>14.3g}".format(integrator, dt, steps, elapsed, error))
+
+if __name__ == "__main__":
+    run()
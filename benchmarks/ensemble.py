@@ -0,0 +1,34 @@
+import os
+import time
+import numpy as np
+from simulator.simulator import Simulator
+from simulator.settings import simulator_settings
+
+SCENARIO = "pid_limited_integral_rl"
+SIZE = 1000
+SERIAL_RUNS = 10
+
+def run():
+    duration = 5
+    dt = simulator_settings["dt"]
+    path = os.path.join(simulator_settings["path_to_models"], "examples", SCENARIO)
+    gains = np.linspace(1, 20, SIZE)
+    print("{}, {} s at dt = {} s, Kp swept over {} values".format(SCENARIO, duration, dt, SIZE))
+    # one simulator per parameter set
+    start = time.perf_counter()
+    for Kp in gains[:SERIAL_RUNS]:
+        sim = Simulator(path, dt, duration)
+        sim.set_parameter("pid", "Kp", Kp)
+        sim.run()
+    serial = SERIAL_RUNS*sim.cycles/(time.perf_counter() - start)
+    # every parameter set at once
+    start = time.perf_counter()
+    sim = Simulator(path, dt, duration, ensemble = SIZE)
+    sim.set_parameter("pid", "Kp", gains)
+    sim.run()
+    ensemble = SIZE*sim.cycles/(time.perf_counter() - start)
+    print("{:<10} {:>12.0f} scenario-cycles/s".format("serial", serial))
+    print("{:<10} {:>12.0f} scenario-cycles/s ({:.0f}x)".format("ensemble", ensemble, ensemble/serial))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,25 @@
+import os
+import time
+from simulator.simulator import Simulator
+from simulator.settings import simulator_settings
+
+def run_scenario(path, dt, duration, record):
+    """ Runs a scenario and returns the achieved cycles per second """
+    sim = Simulator(path, dt, duration, record = record)
+    start = time.perf_counter()
+    sim.run()
+    elapsed = time.perf_counter() - start
+    return sim.cycles/elapsed
+
+def run():
+    duration = simulator_settings["duration"]
+    dt = simulator_settings["dt"]
+    path = os.path.join(simulator_settings["path_to_models"], "examples")
+    print("Shipped examples, {} s at dt = {} s, cycles/s".format(duration, dt))
+    print("{:<28} {:>10} {:>10}".format("", "all", "observed"))
+    for scenario in sorted(os.listdir(path)):
+        results = [run_scenario(os.path.join(path, scenario), dt, duration, record) for record in ["all", "observed"]]
+        print("{:<28} {:>10.0f} {:>10.0f}".format(scenario, *results))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,37 @@
+import os
+import time
+import numpy as np
+from simulator.simulator import Simulator
+from simulator.settings import simulator_settings
+from simulator.utils.performance_meter import PerformanceMeter
+
+SCENARIOS = ["pid_limited_integral_rl", "rl_plus_pid", "rl_series_with_rc"]
+DURATION = 120
+TOLERANCES = [None, 0, 1e-12, 1e-9]
+
+def run():
+    dt = simulator_settings["dt"]
+    print("{} s at dt = {} s, values held for 100 cycles before skipping".format(DURATION, dt))
+    print("{:<24} {:>9} {:>9} {:>10} {:>12} {:>8}".format("scenario", "tolerance", "time (s)", "calculated", "max error", "meters"))
+    for scenario in SCENARIOS:
+        path = os.path.join(simulator_settings["path_to_models"], "examples", scenario)
+        reference = None
+        for tolerance in TOLERANCES:
+            fast_forward = None if tolerance is None else {"tolerance": tolerance, "cycles": 100}
+            sim = Simulator(path, dt, DURATION, record = "all", fast_forward = fast_forward)
+            pf = PerformanceMeter(sim, simulator_settings["performance_meter"]) if scenario.startswith("pid") else None
+            # count the cycles calculated, not skipped
+            calculated = []
+            sim.models["sig"].calculate = lambda cycle, calculate = sim.models["sig"].calculate: calculated.append(cycle) or calculate(cycle)
+            start = time.perf_counter()
+            sim.run(None, pf)
+            elapsed = time.perf_counter() - start
+            if reference is None:
+                reference = sim, pf
+            error = max(np.nanmax(np.abs(np.asarray(getattr(model, variable)) - np.asarray(getattr(reference[0].models[name], variable))), initial = 0)
+                for name, model in sim.models.items() for variable in model.traces)
+            meters = "-" if pf is None else "same" if pf.result_to_string() == reference[1].result_to_string() else "differ"
+            print("{:<24} {:>9} {:>9.2f} {:>10} {:>12.1e} {:>8}".format(scenario, str(tolerance), elapsed, len(calculated), error, meters))
+
+if __name__ == "__main__":
+    run()
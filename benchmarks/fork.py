@@ -0,0 +1,47 @@
+import os
+import time
+import tempfile
+import numpy as np
+from simulator.simulator import Simulator
+from simulator.settings import simulator_settings
+from simulator.utils.snapshot import Snapshot
+
+SCENARIO = "pid_limited_integral_rl"
+WARM_UP = 15
+CANDIDATES = 20
+
+def run():
+    duration = simulator_settings["duration"]
+    dt = simulator_settings["dt"]
+    path = os.path.join(simulator_settings["path_to_models"], "examples", SCENARIO)
+    gains = np.linspace(1, 20, CANDIDATES)
+    print("{}, {} s at dt = {} s, Kp changed at {} s, {} candidates".format(SCENARIO, duration, dt, WARM_UP, CANDIDATES))
+    # every candidate from t = 0
+    start = time.perf_counter()
+    for Kp in gains:
+        sim = Simulator(path, dt, duration)
+        sim.run(until = WARM_UP)
+        sim.set_parameter("pid", "Kp", Kp)
+        sim.run()
+    from_start = time.perf_counter() - start
+    # shared warm-up, one fork per candidate
+    start = time.perf_counter()
+    warm = Simulator(path, dt, duration)
+    warm.run(until = WARM_UP)
+    for Kp in gains:
+        sim = warm.fork()
+        sim.set_parameter("pid", "Kp", Kp)
+        sim.run()
+    forked = time.perf_counter() - start
+    print("{:<12} {:>8.2f} s".format("from t = 0", from_start))
+    print("{:<12} {:>8.2f} s ({:.1f}x)".format("forked", forked, from_start/forked))
+    with tempfile.TemporaryDirectory() as tmp:
+        f = os.path.join(tmp, "snapshot.pkl")
+        start = time.perf_counter()
+        warm.snapshot().save(f)
+        Snapshot.load(f)
+        elapsed = time.perf_counter() - start
+        print("snapshot saved and loaded in {:.1f} ms, {:.0f} kB on disk".format(elapsed*1000, os.path.getsize(f)/1024))
+
+if __name__ == "__main__":
+    run()
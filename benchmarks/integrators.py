@@ -0,0 +1,52 @@
+import json
+import os
+import time
+import tempfile
+import numpy as np
+from simulator.simulator import Simulator
+from simulator.utils.numerical_analysis import FIRST_ORDER_POLES
+
+V = 10.
+DURATION = 10
+STEPS = [0.001, 0.01, 0.05, 0.1, 0.5]
+# model, params, state variable and its analytic step response
+CIRCUITS = [
+    ("RL", {"resistance": 2, "inductance": 10, "current": 0.}, "i",
+        lambda t: V/2*(1 - np.exp(-t*2/10))),
+    ("RC", {"resistance": 2, "capacitance": 0.4, "charge": 0.}, "Q",
+        lambda t: 0.4*V*(1 - np.exp(-t/(2*0.4)))),
+]
+
+def write_scenario(path, class_, params, integrator):
+    """ A step of V volts applied to a circuit from t = 0 """
+    sig = {"name": "sig", "class": "SignalGenerator", "enabled": True,
+        "params": {"events": [{"start": {"value": V}}]}, "inputs": {"cycle": {"variable": "i"}}}
+    circuit = {"name": "circuit", "class": class_, "enabled": True, "integrator": integrator,
+        "params": params, "inputs": {"Vin": {"model": "sig", "variable": "current_value"}}}
+    for spec in [sig, circuit]:
+        with open(os.path.join(path, spec["name"] + ".json"), "w") as f:
+            json.dump(spec, f)
+
+def run():
+    for class_, params, variable, analytic in CIRCUITS:
+        print("{} step response, {} s, max error relative to the final value".format(class_, DURATION))
+        print("{:<16}".format("dt") + "".join("{:>18}".format(dt) for dt in STEPS))
+        for integrator in FIRST_ORDER_POLES:
+            errors = []
+            for dt in STEPS:
+                with tempfile.TemporaryDirectory() as path:
+                    write_scenario(path, class_, params, integrator)
+                    sim = Simulator(path, dt, DURATION)
+                    sim.record("circuit", variable)
+                    start = time.perf_counter()
+                    sim.run()
+                    elapsed = time.perf_counter() - start
+                x = np.asarray(getattr(sim.models["circuit"], variable))
+                expected = analytic(np.asarray(sim.t))
+                error = np.max(np.abs(x - expected))/expected[-1]
+                errors.append("{:>9.1e} {:>6.1f}ms".format(error, elapsed*1000))
+            print("{:<16}".format(integrator) + "".join("{:>18}".format(e) for e in errors))
+        print()
+
+if __name__ == "__main__":
+    run()
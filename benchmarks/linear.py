@@ -0,0 +1,33 @@
+import os
+import time
+import numpy as np
+from simulator.simulator import Simulator
+from simulator.settings import simulator_settings
+
+SCENARIOS = ["rl_plus_pid", "rl_series_with_rc", "rl_limited_vr_pid", "pid_limited_integral_rl", "pid_limited_with_rl", "motor_speed_pid"]
+DURATION = 100
+
+def simulate(path, dt, linear):
+    sim = Simulator(path, dt, DURATION, record = "all", linear = linear)
+    # count the cycles calculated one by one
+    calculated = []
+    sim.models["sig"].calculate = lambda cycle, calculate = sim.models["sig"].calculate: calculated.append(cycle) or calculate(cycle)
+    start = time.perf_counter()
+    sim.run()
+    return sim, len(calculated), time.perf_counter() - start
+
+def run():
+    dt = simulator_settings["dt"]
+    print("{} s at dt = {} s".format(DURATION, dt))
+    print("{:<24} {:>12} {:>10} {:>8} {:>12} {:>10}".format("scenario", "per cycle", "linear", "speedup", "propagated", "max error"))
+    for scenario in SCENARIOS:
+        path = os.path.join(simulator_settings["path_to_models"], "examples", scenario)
+        reference, _, per_cycle = simulate(path, dt, None)
+        sim, calculated, linear = simulate(path, dt, {"retry": 64})
+        error = max(np.nanmax(np.append(np.abs(np.asarray(getattr(model, variable)) - np.asarray(getattr(sim.models[name], variable))), 0.))
+            for name, model in reference.models.items() for variable in model.traces)
+        propagated = "{:.0%}".format(1 - calculated/sim.cycles)
+        print("{:<24} {:>10.2f} s {:>8.2f} s {:>7.1f}x {:>12} {:>10.1e}".format(scenario, per_cycle, linear, per_cycle/linear, propagated, error))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,26 @@
+import os
+import tracemalloc
+from simulator.simulator import Simulator
+from simulator.settings import simulator_settings
+
+def run_scenario(path, dt, duration, record):
+    """ Runs a scenario and returns the peak of memory allocated in MiB """
+    tracemalloc.start()
+    sim = Simulator(path, dt, duration, record = record)
+    sim.run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak/2**20
+
+def run():
+    duration = simulator_settings["duration"]
+    dt = simulator_settings["dt"]
+    path = os.path.join(simulator_settings["path_to_models"], "examples")
+    print("Shipped examples, {} s at dt = {} s, peak MiB".format(duration, dt))
+    print("{:<28} {:>8} {:>8}".format("", "all", "observed"))
+    for scenario in sorted(os.listdir(path)):
+        results = [run_scenario(os.path.join(path, scenario), dt, duration, record) for record in ["all", "observed"]]
+        print("{:<28} {:>8.2f} {:>8.2f}".format(scenario, *results))
+
+if __name__ == "__main__":
+    run()
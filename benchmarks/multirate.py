@@ -0,0 +1,39 @@
+import os
+import json
+import time
+import tempfile
+from simulator.simulator import Simulator
+from simulator.settings import simulator_settings
+from simulator.utils.performance_meter import PerformanceMeter
+
+SCENARIO = "pid_limited_integral_rl"
+
+def write_scenario(path, sample_time):
+    """ Copies the scenario, giving the PID its own sample time """
+    source = os.path.join(simulator_settings["path_to_models"], "examples", SCENARIO)
+    for f in os.listdir(source):
+        with open(os.path.join(source, f), "r") as rf:
+            spec = json.load(rf)
+        if spec["name"] == "pid":
+            spec["sample_time"] = sample_time
+        with open(os.path.join(path, f), "w") as wf:
+            json.dump(spec, wf)
+
+def run():
+    duration = simulator_settings["duration"]
+    dt = simulator_settings["dt"]
+    print("{}, {} s at dt = {} s".format(SCENARIO, duration, dt))
+    print("{:>12} {:>10} {:>10} {:>10}".format("sample time", "PID calcs", "measures", "cycles/s"))
+    for sample_time in [dt, 10*dt, 100*dt]:
+        with tempfile.TemporaryDirectory() as path:
+            write_scenario(path, sample_time)
+            sim = Simulator(path, dt, duration)
+            config = dict(simulator_settings["performance_meter"], sample_time = sample_time)
+            pf = PerformanceMeter(sim, config)
+            start = time.perf_counter()
+            sim.run(None, pf)
+            cycles_per_second = sim.cycles/(time.perf_counter() - start)
+            print("{:>12} {:>10} {:>10} {:>10.0f}".format(sample_time, len(sim.models["pid"].MV) - 1, (sim.cycles + pf.ticks - 1)//pf.ticks, cycles_per_second))
+
+if __name__ == "__main__":
+    run()
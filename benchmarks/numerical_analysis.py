@@ -0,0 +1,44 @@
+import time
+import numpy as np
+from simulator.utils.numerical_analysis import DumbIntegrator, DumbDifferentiator, FilteredDifferentiator, DeadBand, RateLimiter
+
+SAMPLES = 1000000
+DT = 0.001
+CHUNK = 65536
+
+def best_time(function, repeat = 3):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def run():
+    values = np.random.default_rng(0).normal(size = SAMPLES).cumsum()
+    floats = values.tolist()
+    cases = [
+        ("integrator", lambda: DumbIntegrator(), lambda m, v: m.calculate(DT, v), lambda m, v: m.calculate_array(DT, v)),
+        ("differentiator", lambda: DumbDifferentiator(), lambda m, v: m.calculate(DT, v), lambda m, v: m.calculate_array(DT, v)),
+        ("filtered diff.", lambda: FilteredDifferentiator(0.01), lambda m, v: m.calculate(DT, v), lambda m, v: m.calculate_array(DT, v)),
+        ("deadband", lambda: DeadBand(0.5), lambda m, v: m.calculate(v), lambda m, v: m.calculate_array(v)),
+        ("rate limiter", lambda: RateLimiter(100.), lambda m, v: m.calculate(DT, v), lambda m, v: m.calculate_array(DT, v)),
+    ]
+    print("{} samples, s".format(SAMPLES))
+    print("{:<16} {:>8} {:>8} {:>8} {:>9}".format("", "scalar", "array", "chunks", "speedup"))
+    for name, create, scalar, array in cases:
+        def per_value():
+            m = create()
+            for v in floats:
+                scalar(m, v)
+        def whole():
+            array(create(), values)
+        def chunked():
+            m = create()
+            for start in range(0, SAMPLES, CHUNK):
+                array(m, values[start:start + CHUNK])
+        times = [best_time(f) for f in [per_value, whole, chunked]]
+        print("{:<16} {:>8.3f} {:>8.3f} {:>8.3f} {:>8.1f}x".format(name, *times, times[0]/times[1]))
+
+if __name__ == "__main__":
+    run()
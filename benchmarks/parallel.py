@@ -0,0 +1,41 @@
+import os
+import json
+import time
+import tempfile
+from simulator.simulator import Simulator
+from simulator.settings import simulator_settings
+
+SCENARIO = "rl_plus_pid"
+LOOPS = 200
+
+def write_loops(path, loops):
+    """ Writes `loops` independent copies of the scenario's models """
+    source = os.path.join(simulator_settings["path_to_models"], "examples", SCENARIO)
+    for f in os.listdir(source):
+        with open(os.path.join(source, f), "r") as rf:
+            spec = json.load(rf)
+        names = [spec["name"]] + [i["model"] for i in spec["inputs"].values() if "model" in i]
+        for k in range(loops):
+            text = json.dumps(spec)
+            for name in names:
+                text = text.replace('"{}"'.format(name), '"{}_{}"'.format(name, k))
+            with open(os.path.join(path, "{}_{}".format(k, f)), "w") as wf:
+                wf.write(text)
+
+def run():
+    duration = 2
+    dt = simulator_settings["dt"]
+    with tempfile.TemporaryDirectory() as path:
+        write_loops(path, LOOPS)
+        print("{} copies of {}, {} s at dt = {} s, {} CPUs".format(LOOPS, SCENARIO, duration, dt, os.cpu_count()))
+        start = time.perf_counter()
+        Simulator(path, dt, duration).run()
+        serial = time.perf_counter() - start
+        print("{:<10} {:>8.2f} s".format("serial", serial))
+        start = time.perf_counter()
+        Simulator(path, dt, duration).run_parallel()
+        parallel = time.perf_counter() - start
+        print("{:<10} {:>8.2f} s ({:.1f}x)".format("parallel", parallel, serial/parallel))
+
+if __name__ == "__main__":
+    run()
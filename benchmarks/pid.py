@@ -0,0 +1,53 @@
+import os
+import time
+import numpy as np
+from simulator.simulator import Simulator
+from simulator.settings import simulator_settings
+from simulator.models.pid import PID, PIDLimitedMV, PIDLimitedIntegral
+from simulator.utils.history import Trace
+
+CALLS = 200000
+# best of several repeats, on fresh models
+REPEATS = 5
+SCENARIOS = ["rl_plus_pid", "pid_limited_with_rl", "pid_limited_integral_rl", "rl_limited_vr_pid"]
+
+def models():
+    """ PIDs as the simulator holds them, with their traces preallocated """
+    pids = {
+        "PID": PID(0.001, 2., 0.5, 0.01),
+        "PIDLimitedMV": PIDLimitedMV(0.001, 2., 0.5, 0.01, min_MV = -1., max_MV = 1.),
+        "PIDLimitedIntegral": PIDLimitedIntegral(0.001, 2., 0.5, 0.01, min_MV = -1., max_MV = 1., db_DG = 0.1),
+    }
+    for pid in pids.values():
+        pid.allocate(lambda name, values: Trace(CALLS + 1, values))
+    return pids
+
+def time_calculate(pid):
+    """ Time of a call to calculate in us, on an SP following a sine """
+    SP = np.sin(np.arange(CALLS)*1e-3).tolist()
+    calculate = pid.calculate
+    start = time.perf_counter()
+    for sp in SP:
+        calculate(sp, 0.5, 0.)
+    return (time.perf_counter() - start)/CALLS*1e6
+
+def time_scenario(path):
+    """ Cycles per second of a run of a scenario """
+    sim = Simulator(path, 0.001, 20)
+    start = time.perf_counter()
+    sim.run()
+    return sim.cycles/(time.perf_counter() - start)
+
+def run():
+    print("{} calls to calculate, us per call (best of {})".format(CALLS, REPEATS))
+    for name in models():
+        best = min(time_calculate(models()[name]) for _ in range(REPEATS))
+        print("{:<28} {:>8.3f}".format(name, best))
+    path = os.path.join(simulator_settings["path_to_models"], "examples")
+    print("Scenarios with PIDs, 20 s at dt = 0.001 s, cycles/s (best of {})".format(REPEATS))
+    for scenario in SCENARIOS:
+        best = max(time_scenario(os.path.join(path, scenario)) for _ in range(REPEATS))
+        print("{:<28} {:>8.0f}".format(scenario, best))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,47 @@
+import time
+import numpy as np
+from simulator.models.pid import PIDLimitedIntegral
+from simulator.models.pid_bank import PIDBank
+from simulator.utils.history import Trace
+
+CYCLES = 2000
+LOOP_COUNTS = [10, 100, 1000]
+
+def loops(count, seed = 0):
+    """ Settings of `count` loops with random gains and limits """
+    rng = np.random.default_rng(seed)
+    return [{"Kp": float(rng.uniform(0.5, 5)), "Ti": float(rng.uniform(0.1, 10)), "Td": float(rng.uniform(0, 0.1)),
+        "min_MV": 0., "max_MV": 10., "db_DG": 0.01} for _ in range(count)]
+
+def allocate(model):
+    model.allocate(lambda name, values: Trace(CYCLES + 1, values, np.shape(values[-1])))
+    return model
+
+def time_bank(settings, PV):
+    bank = allocate(PIDBank(0.001, settings))
+    start = time.perf_counter()
+    for cycle in range(CYCLES):
+        bank.calculate(5., PV[cycle], 0.)
+    return time.perf_counter() - start
+
+def time_pids(settings, PV):
+    pids = [allocate(PIDLimitedIntegral(0.001, **loop)) for loop in settings]
+    PV = PV.tolist()
+    start = time.perf_counter()
+    for cycle in range(CYCLES):
+        for pid, pv in zip(pids, PV[cycle]):
+            pid.calculate(5., pv, 0.)
+    return time.perf_counter() - start
+
+def run():
+    print("{} cycles of K loops, us per cycle".format(CYCLES))
+    print("{:>6} {:>10} {:>10} {:>8}".format("K", "PIDs", "PIDBank", "speedup"))
+    for count in LOOP_COUNTS:
+        settings = loops(count)
+        PV = np.random.default_rng(1).normal(5, 1, (CYCLES, count))
+        pids = time_pids(settings, PV)/CYCLES*1e6
+        bank = time_bank(settings, PV)/CYCLES*1e6
+        print("{:>6} {:>10.1f} {:>10.1f} {:>8.1f}".format(count, pids, bank, pids/bank))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,33 @@
+import time
+import numpy as np
+from simulator.models.signal_generator import SignalGenerator
+
+CYCLES = 200000
+EVENT_COUNTS = [4, 100, 1000, 10000]
+
+def events(count, seed = 0):
+    """ A test sequence of steps, ramps and pauses spread over the run """
+    rng = np.random.default_rng(seed)
+    cycles = np.sort(rng.choice(np.arange(1, CYCLES), count, replace = False))
+    kinds = rng.choice(["step", "ramp_up", "ramp_down", "pause"], count)
+    sequence = [{"start": {"value": 10}}]
+    for cycle, kind in zip(cycles.tolist(), kinds):
+        settings = {"cycle": cycle}
+        if kind != "pause":
+            settings["value"] = 5. if kind == "step" else 0.001
+        sequence.append({str(kind): settings})
+    return sequence
+
+def run():
+    print("{} cycles of a signal generator".format(CYCLES))
+    print("{:>8} {:>10} {:>14}".format("events", "time (s)", "per cycle (us)"))
+    for count in EVENT_COUNTS:
+        sig = SignalGenerator(events(count))
+        start = time.perf_counter()
+        for cycle in range(CYCLES):
+            sig.calculate(cycle)
+        elapsed = time.perf_counter() - start
+        print("{:>8} {:>10.3f} {:>14.2f}".format(count, elapsed, elapsed/CYCLES*1e6))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,49 @@
+import os
+import time
+import tempfile
+import tracemalloc
+import numpy as np
+from simulator.models.signal_replay import SignalReplay
+
+CYCLES = 200000
+SAMPLE_COUNTS = [10**4, 10**6, 10**7]
+
+def write_series(directory, count):
+    """ A random walk sampled every ms, as .npy and CSV files """
+    times = 0.001*np.arange(count)
+    values = np.cumsum(np.random.default_rng(0).normal(size = count))
+    paths = [os.path.join(directory, "series.npy"), os.path.join(directory, "series.csv")]
+    np.save(paths[0], np.column_stack((times, values)))
+    np.savetxt(paths[1], np.column_stack((times, values)), delimiter = ",", fmt = "%.6f")
+    return paths
+
+def replay(path, interpolation):
+    """ Returns the time to open the file and to replay it """
+    start = time.perf_counter()
+    model = SignalReplay(0.0004, path, interpolation)
+    opened = time.perf_counter()
+    for cycle in range(1, CYCLES):
+        model.calculate(cycle)
+    return opened - start, time.perf_counter() - opened
+
+def peak_memory(path, interpolation):
+    """ Peak of memory allocated by a replay in MiB """
+    tracemalloc.start()
+    replay(path, interpolation)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak/2**20
+
+def run():
+    print("{} cycles replaying series sampled every ms, at dt = 0.4 ms".format(CYCLES))
+    print("{:>9} {:>5} {:>7} {:>9} {:>14} {:>9}".format("samples", "file", "interp", "open (s)", "per cycle (us)", "peak MiB"))
+    for count in SAMPLE_COUNTS:
+        with tempfile.TemporaryDirectory() as directory:
+            for path in write_series(directory, count):
+                for interpolation in SignalReplay.interpolations:
+                    opened, elapsed = replay(path, interpolation)
+                    peak = peak_memory(path, interpolation)
+                    print("{:>9} {:>5} {:>7} {:>9.4f} {:>14.2f} {:>9.2f}".format(count, path[-3:], interpolation, opened, elapsed/CYCLES*1e6, peak))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,64 @@
+import os
+import json
+import time
+import tempfile
+from simulator.settings import simulator_settings
+from simulator.tuner.brute import BruteTuner, RecurringBruteTuner
+
+SCENARIO = "rl_plus_pid"
+DURATION = 2
+STEPS = 5
+ROUNDS = 4
+
+def write_settings(source, path, cache, **settings):
+    """ Tuner settings trying STEPS values of Kp and of Ti on each of ROUNDS rounds """
+    os.makedirs(os.path.join(path, "tuner"), exist_ok = True)
+    with open(os.path.join(source, "tuner", "brute.json"), "r") as rf:
+        tuner_settings = json.load(rf)
+    tuner_settings.update({"p_range": [1, 10], "p_steps": STEPS, "i_range": [0.1, 1], "i_steps": STEPS, "d_steps": 1,
+        "processes": 1, "quiet": True, "cache": {"enabled": True, "path": cache},
+        "recurring": {"divider": 2, "threshold": -1, "max_loop_runs": ROUNDS}})
+    tuner_settings.update(settings)
+    with open(os.path.join(path, "tuner", "brute.json"), "w") as wf:
+        json.dump(tuner_settings, wf)
+
+def tune(class_, label):
+    """ Runs a tuner, counting the candidates simulated """
+    tuner = class_()
+    simulated = []
+    run_sim = tuner.run_sim
+    def counted(p, i, d):
+        result = run_sim(p, i, d)
+        simulated.append(not result["cached"])
+        return result
+    tuner.run_sim = counted
+    start = time.perf_counter()
+    tuner.run()
+    elapsed = time.perf_counter() - start
+    tuner.cache.close()
+    print("{:<34} {:>6} {:>10} {:>8.2f} s".format(label, len(simulated), sum(simulated), elapsed))
+
+def run():
+    saved = dict(simulator_settings)
+    with tempfile.TemporaryDirectory() as path:
+        cache = os.path.join(path, "cache.sqlite")
+        simulator_settings.update({
+            "path_to_settings": path,
+            "path_to_models": os.path.join(saved["path_to_models"], "examples", SCENARIO),
+            "duration": DURATION
+        })
+        print("{}, {}x{} grids of {} s at dt = {} s".format(SCENARIO, STEPS, STEPS, DURATION, simulator_settings["dt"]))
+        print("{:<34} {:>6} {:>10} {:>10}".format("", "tried", "simulated", "time"))
+        write_settings(saved["path_to_settings"], path, cache)
+        tune(RecurringBruteTuner, "recurring, {} rounds".format(ROUNDS))
+        tune(RecurringBruteTuner, "same, run again")
+        write_settings(saved["path_to_settings"], path, cache, p_steps = 2*STEPS - 1)
+        tune(BruteTuner, "grid refined on Kp")
+        write_settings(saved["path_to_settings"], path, cache, cost = {"overshoot": {"weight": 2, "name": "overshoot"},
+            "settling_time": {"weight": 1, "name": "settling_time", "not_settled_penalty": 100}})
+        tune(RecurringBruteTuner, "cost weights changed")
+    simulator_settings.clear()
+    simulator_settings.update(saved)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,67 @@
+import os
+import json
+import time
+import tempfile
+from simulator.settings import simulator_settings
+from simulator.tuner.brute import BruteTuner, RecurringBruteTuner
+from simulator.tuner.optimizer import OptimizerTuner
+
+SCENARIO = "rl_plus_pid"
+DURATION = 5
+STEPS = 20
+BUDGET = 40
+BATCH = 4
+SEEDS = [0, 1, 2]
+
+def write_settings(source, path, class_, **settings):
+    """ Tuner settings searching Kp within [1, 3000] and Ti within [0.01, 2] """
+    os.makedirs(os.path.join(path, "tuner"), exist_ok = True)
+    with open(os.path.join(source, "tuner", "brute.json"), "r") as rf:
+        tuner_settings = json.load(rf)
+    tuner_settings.update({"p_range": [1, 3000], "i_range": [0.01, 2], "d_range": [0, 0], "d_steps": 1,
+        "processes": 1, "quiet": True, "cache": {"enabled": False}})
+    tuner_settings.update(settings)
+    with open(os.path.join(path, "tuner", class_.settings_file), "w") as wf:
+        json.dump(tuner_settings, wf)
+
+def tune(source, path, class_, label, **settings):
+    write_settings(source, path, class_, **settings)
+    tuner = class_()
+    # RecurringBruteTuner only keeps the results of its last round
+    simulations = []
+    run_sim = tuner.run_sim
+    def counted(*candidate):
+        simulations.append(candidate)
+        return run_sim(*candidate)
+    tuner.run_sim = counted
+    start = time.perf_counter()
+    tuner.run()
+    elapsed = time.perf_counter() - start
+    best = tuner.best_result
+    print("{:<28} {:>11} {:>10.4f} {:>8.2f} {:>8.4f} {:>8.2f} s".format(label, len(simulations), best["result"],
+        best["settings"]["p"], best["settings"]["i"], elapsed))
+    return best["result"]
+
+def run():
+    saved = dict(simulator_settings)
+    source = saved["path_to_settings"]
+    with tempfile.TemporaryDirectory() as path:
+        simulator_settings.update({
+            "path_to_settings": path,
+            "path_to_models": os.path.join(saved["path_to_models"], "examples", SCENARIO),
+            "duration": DURATION
+        })
+        print("{}, {} s at dt = {} s, batches of {}".format(SCENARIO, DURATION, simulator_settings["dt"], BATCH))
+        print("{:<28} {:>11} {:>10} {:>8} {:>8} {:>10}".format("", "simulations", "best cost", "Kp", "Ti", "time"))
+        grid = tune(source, path, BruteTuner, "grid {}x{}".format(STEPS, STEPS), p_steps = STEPS, i_steps = STEPS)
+        tune(source, path, RecurringBruteTuner, "recurring grid 5x5", p_steps = 5, i_steps = 5,
+            recurring = {"divider": 2, "threshold": 0.001, "max_loop_runs": 10})
+        for method in OptimizerTuner.methods:
+            costs = [tune(source, path, OptimizerTuner, "{}, seed {}".format(method, seed),
+                optimizer = {"method": method, "budget": BUDGET, "batch": BATCH, "seed": seed}) for seed in SEEDS]
+            print("{:<28} {} of {} seeds at or below the grid".format("", sum(c <= grid for c in costs), len(SEEDS)))
+    simulator_settings.clear()
+    simulator_settings.update(saved)
+
+if __name__ == "__main__":
+    run()
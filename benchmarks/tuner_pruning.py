@@ -0,0 +1,54 @@
+import os
+import json
+import time
+import tempfile
+from simulator.settings import simulator_settings
+from simulator.tuner.brute import BruteTuner
+
+SCENARIO = "rl_plus_pid"
+DURATION = 10
+STEPS = 10
+
+def write_settings(source, path, **settings):
+    """ Tuner settings trying STEPS values of Kp and of Ti """
+    os.makedirs(os.path.join(path, "tuner"), exist_ok = True)
+    with open(os.path.join(source, "tuner", "brute.json"), "r") as rf:
+        tuner_settings = json.load(rf)
+    tuner_settings.update({"p_range": [1, 20], "p_steps": STEPS, "i_range": [0.05, 2], "i_steps": STEPS, "d_steps": 1,
+        "processes": 1, "quiet": True, "cache": {"enabled": False}})
+    tuner_settings.update(settings)
+    with open(os.path.join(path, "tuner", "brute.json"), "w") as wf:
+        json.dump(tuner_settings, wf)
+
+def run():
+    saved = dict(simulator_settings)
+    cases = [
+        ("full runs", {}),
+        ("abandon", {"abandon": {"enabled": True, "period": 0.1}}),
+        ("halving", {"halving": {"enabled": True, "horizon": 3, "eta": 2}}),
+        ("halving + abandon", {"abandon": {"enabled": True, "period": 0.1}, "halving": {"enabled": True, "horizon": 3, "eta": 2}}),
+    ]
+    with tempfile.TemporaryDirectory() as path:
+        simulator_settings.update({
+            "path_to_settings": path,
+            "path_to_models": os.path.join(saved["path_to_models"], "examples", SCENARIO),
+            "duration": DURATION
+        })
+        print("{}, {} candidates of {} s at dt = {} s".format(SCENARIO, STEPS**2, DURATION, simulator_settings["dt"]))
+        print("{:<20} {:>9} {:>11} {:>14} {:>12} {:>9}".format("", "time (s)", "best cost", "simulated (s)", "stopped < 2s", "speedup"))
+        for name, settings in cases:
+            write_settings(saved["path_to_settings"], path, **settings)
+            tuner = BruteTuner()
+            start = time.perf_counter()
+            tuner.run()
+            elapsed = time.perf_counter() - start
+            # candidates carry on from where they stopped
+            simulated = sum(r["time"] for r in tuner.results)
+            early = sum(r["abandoned"] and r["time"] < 2 for r in tuner.results)
+            reference = reference if name != "full runs" else elapsed
+            print("{:<20} {:>9.2f} {:>11.4f} {:>14.0f} {:>12} {:>8.1f}x".format(name, elapsed, tuner.best_result["result"], simulated, early, reference/elapsed))
+    simulator_settings.clear()
+    simulator_settings.update(saved)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,8 @@
+from simulator.tuner.optimizer import OptimizerTuner
+
+def run():
+    optimizer = OptimizerTuner()
+    optimizer.run()
+    
+if __name__ == "__main__":
+    run()
\ No newline at end of file
@@ -8,7 +8,11 @@ from simulator.utils.performance_meter import PerformanceMeter
 def run():
     duration = simulator_settings["duration"]
     dt = simulator_settings["dt"]
-    sim = Simulator(simulator_settings["path_to_models"], dt, duration)
+    stream = simulator_settings["stream"] if simulator_settings["stream"]["enabled"] else None
+    fast_forward = simulator_settings["fast_forward"] if simulator_settings["fast_forward"]["enabled"] else None
+    adaptive = simulator_settings["adaptive"] if simulator_settings["adaptive"]["enabled"] else None
+    linear = simulator_settings["linear"] if simulator_settings["linear"]["enabled"] else None
+    sim = Simulator(simulator_settings["path_to_models"], dt, duration, stream, simulator_settings["record"], fast_forward = fast_forward, adaptive = adaptive, linear = linear)
     plot, pf = None, None
     if simulator_settings["show_plot"]:
         plot = Plot(simulator_settings["path_to_models"], sim)
@@ -1,15 +1,53 @@
+import numpy as np
+from ..utils.history import Trace
+
 class BaseModel:
+    # names of the attributes holding the history of a variable
+    traces = ()
+    # names of the attributes holding constants of the model
+    parameters = ()
+    # traces appended on every calculation, in the order of the
+    # arguments of `record_outputs`
+    outputs = ()
+    # outputs calculated only from the state of the model, before the
+    # inputs of the cycle are used. The simulator breaks feedback loops
+    # at models whose outputs read by the loop are all delayed.
+    delayed_outputs = ()
+    # if False, the values of the model are the same for every scenario
+    # of an ensemble and only one value per cycle is kept
+    ensemble_values = True
+    # models of continuous time take steps of any length `dt` on
+    # adaptive runs. While `estimate_error` is set, they keep an estimate
+    # of the error of their last step on `local_error`.
+    continuous = False
+    estimate_error = False
+    local_error = 0.
+
     def __init__(self):
         pass
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if "outputs" in cls.__dict__ and cls.outputs:
+            cls.record_outputs = record_outputs_method(cls.outputs)
+
+    def record_outputs(self, *values):
+        """ Appends the values of a calculation to the traces named on `outputs`
+
+        Generated for each class declaring its outputs, so that no type
+        is checked nor dict built on every cycle as `update_attributes`
+        does.
+        """
+        pass
+
     def update_attributes(self, **kwargs):
         """ Method to update the attributes from an instance
 
         If the type of the value equals the attribute, the value
         is copied to the attribute.
 
-        But if the attribute is a list and the value is not,
-        the value is appended to the list.
+        But if the attribute is a list (or a Trace) and the value
+        is not, the value is appended to it.
 
         """
         for attr in kwargs:
@@ -19,12 +57,132 @@ class BaseModel:
                 attr_type = type(instance_attr)
                 if value_type == attr_type:
                     setattr(self, attr, kwargs[attr])
-                elif attr_type == list:
+                elif attr_type == list or isinstance(instance_attr, Trace):
                     instance_attr.append(kwargs[attr])
                 else:
                     raise ValueError("Attribute exists but is not compatible with the given value", instance_attr, kwargs[attr])
             except AttributeError:
                 pass
 
+    def allocate(self, create_trace):
+        """ Replaces the lists named on `traces` by traces
+
+        Args:
+            create_trace (callable): receives the name of a variable
+                and its current values and returns the trace to be used
+        """
+        for name in self.traces:
+            setattr(self, name, create_trace(name, getattr(self, name)))
+
+    def reset_traces(self):
+        """ Keeps only the initial value of each trace """
+        for name in self.traces:
+            trace = getattr(self, name)
+            if type(trace) == list:
+                setattr(self, name, trace[0:1])
+            else:
+                trace.reset()
+
+    def vectorize(self, size):
+        """ Prepares the model to calculate `size` scenarios at once
+
+        Parameters given as sequences become arrays, which must hold one
+        value per scenario. Models whose calculation has branches
+        override `calculate_ensemble` to evaluate them with masks.
+        """
+        for name in self.parameters:
+            value = getattr(self, name)
+            if type(value) in (list, tuple, np.ndarray):
+                value = np.asarray(value, dtype = float)
+                if value.shape != (size,):
+                    raise ValueError("Parameter {} should have {} values".format(name, size), value.shape)
+                setattr(self, name, value)
+
+    def calculate_ensemble(self, *args):
+        """ Calculates the next values of every scenario of an ensemble
+
+        Models made only of arithmetic work with arrays as they are.
+        """
+        return self.calculate(*args)
+
+    def next_event(self, cycle):
+        """ First cycle, from `cycle` on, on which the model may change on its own
+
+        While its inputs and state hold, a model calculates the same
+        values cycle after cycle, which lets the simulator skip steady
+        states. Models that change with the cycle or the time (e.g. the
+        events of a signal generator) return the next cycle they do;
+        None means never.
+        """
+        return None
+
+    def hold(self, calculations):
+        """ Advances the state kept off the traces over calculations skipped
+
+        Called when the simulator skips a steady state, before it fills
+        the traces with their last values, with the number of
+        calculations of the model skipped. Models whose state goes on
+        changing while their inputs and outputs hold (e.g. the integral
+        of a PID with an error left) advance it as those calculations
+        would have.
+        """
+        pass
+
+    def held_until(self, cycle):
+        """ First cycle after `cycle` on which the outputs of the model may change
+
+        Called on adaptive runs before calculating the model on `cycle`.
+        Models of discrete time calculate new values on every cycle
+        they're due; models whose outputs hold for a while (e.g. the
+        segments of a signal generator) return the end of the hold,
+        None meaning forever.
+        """
+        return cycle + 1
+
+    def state_space(self):
+        """ Discrete state-space form of the model on its next cycles
+
+        Linear models return a `simulator.utils.linear.StateSpace`,
+        which lets the simulator propagate them over several cycles at
+        once on linear runs. It holds while the model stays within its
+        linear region (see `linear_region`) and may depend on the current
+        state, e.g. on the segment a signal generator is in. None means
+        the form can't be used from the current state.
+        """
+        return None
+
+    def linear_state(self):
+        """ Current state x of the state-space form, None if it can't be used """
+        return None
+
+    def set_linear_state(self, x):
+        """ Writes back the state reached on a linear run
+
+        The traces named as outputs of the state-space form are filled
+        by the simulator, only state held elsewhere needs to be set.
+        """
+        pass
+
+    def linear_region(self, x, u, y):
+        """ Tells, for each cycle, if the state-space form held on it
+
+        Args:
+            x, u, y (np.ndarray): states, inputs and outputs of the
+                state-space form, with one column per cycle
+
+        Returns:
+            np.ndarray: one bool per cycle
+        """
+        return np.ones(np.shape(y)[1], dtype = bool)
+
     def reset(self):
-        raise NotImplementedError("Class {} don't implement a reset method.".format(self.__class__.__name__))
\ No newline at end of file
+        raise NotImplementedError("Class {} don't implement a reset method.".format(self.__class__.__name__))
+
+def record_outputs_method(outputs):
+    """ Generates `record_outputs`, appending each argument to its trace """
+    source = "def record_outputs(self, {}):\n".format(", ".join(outputs))
+    source += "".join("    self.{0}.append({0})\n".format(name) for name in outputs)
+    namespace = {}
+    exec(compile(source, "<record_outputs {}>".format(", ".join(outputs)), "exec"), namespace)
+    namespace["record_outputs"].__doc__ = BaseModel.record_outputs.__doc__
+    return namespace["record_outputs"]
@@ -1,4 +1,10 @@
-class ElectricMotor:
+import numpy as np
+from scipy.linalg import expm
+from .base import BaseModel
+from ..utils.numerical_analysis import first_order_step, first_order_error
+from ..utils.linear import StateSpace
+
+class ElectricMotor(BaseModel):
     """A class used to model an electric motor
 
     Assumptions:
@@ -6,39 +12,198 @@ class ElectricMotor:
         - only viscous friction is assumed to be present (not considering Coulomb frictions)
         - stator is assumed to have a single coil
         - rotor is assumed to have a single coil
-    
+
     Source:
-        - Zaccarian, L. "DC motors: dynamic model and control techniques". Available at: http://homepages.laas.fr/lzaccari/seminars/DCmotors.pdf    
+        - Zaccarian, L. "DC motors: dynamic model and control techniques". Available at: http://homepages.laas.fr/lzaccari/seminars/DCmotors.pdf
+
+    Equations, with the flux constant K of the stator coil:
+        Le*die/dt = Ve - Re*ie
+        La*dia/dt = Va - Ra*ia - K*ie*w
+        J*dw/dt = K*ie*ia - F*w - Tl
+        domega/dt = w
+
+    The electrical time constants (te, ta) are usually orders of
+    magnitude shorter than the mechanical one (tm), so explicit Euler
+    ("euler") needs a step shorter than them to stay stable. The other
+    integrators step the stator current as a first order system and
+    then the rotor current and speed, linear for a given stator
+    current, as a whole: "backward_euler" and "trapezoidal" are
+    implicit and "zoh" (default) uses the exponential of the rotor's
+    matrix, exact for inputs held during the step. They stay stable
+    for any step, e.g. the cycle time of the PID driving the motor.
+
+    Args:
+        dt (float): cycle time
+        stator_voltage (float): Ve when it isn't given as an input, by
+            default the one holding the initial stator current
+        integrator (str): "zoh", "backward_euler", "trapezoidal" or "euler"
     """
-    def __init__(self,
+    traces = ("ie", "ia", "w", "omega", "Va", "Ve", "Tl", "speed", "Te")
+    parameters = ("Re", "Le", "Ra", "La", "J", "F")
+    # speed and torque at the start of the step, read by speed loops
+    delayed_outputs = ("speed", "Te")
+    continuous = True
+    integrators = ("zoh", "backward_euler", "trapezoidal", "euler")
+
+    def __init__(self, dt,
                 coil_turns, coil_size, magnetic_permea, solenoid_length, solenoid_area,
                 stator_induc, stator_resist,
                 rotor_induc, rotor_resist, rotor_inertia, viscous_friction,
                 load_torque,
-                stator_current, rotor_current, rotor_speed, rotor_position):
-        self.N = [coil_turns]
-        self.m = [magnetic_permea]
-        self.l = [solenoid_length]
-        self.A = [solenoid_area]
-        self.d = [coil_size]
-        self.K0 = self.m[-1]*self.A[-1]/self.l[-1]
-        self.Kphi = self.l[-1]*self.d[-1]/self.A[-1]
-        self.K = self.Kphi[-1]*self.K0[-1]*self.N[-1]
-        self.Le = [stator_induc]
-        self.Re = [stator_resist]
-        self.Ke = 1/self.Re[-1]             # stator gain
-        self.te = self.Le[-1]/self.Re[-1]   # stator time constant
-        self.La = [rotor_induc]
-        self.Ra = [rotor_resist]
-        self.Ka = 1/self.Ra[-1]             # rotor gain
-        self.ta = self.La[-1]/self.Ra[-1]   # rotor time constant
-        self.J = [rotor_inertia]
-        self.F = [viscous_friction]
-        self.Km = 1/self.F[-1]              # mechanical gain
-        self.tm = self.J[-1]/self.F[-1]     # mechanical time constant
-        self.Tl = [load_torque]             # load torque exerted on the motor
+                stator_current, rotor_current, rotor_speed, rotor_position,
+                stator_voltage = None, integrator = "zoh"):
+        if integrator not in self.integrators:
+            raise ValueError("Unknown integrator {}, expected one of {}".format(integrator, ", ".join(self.integrators)))
+        # constants
+        self.dt = dt
+        self.integrator = integrator
+        self.N = coil_turns
+        self.m = magnetic_permea
+        self.l = solenoid_length
+        self.A = solenoid_area
+        self.d = coil_size
+        self.K0 = self.m*self.A/self.l
+        self.Kphi = self.l*self.d/self.A
+        self.K = self.Kphi*self.K0*self.N
+        self.Le = stator_induc
+        self.Re = stator_resist
+        self.Ke = 1/self.Re             # stator gain
+        self.te = self.Le/self.Re       # stator time constant
+        self.La = rotor_induc
+        self.Ra = rotor_resist
+        self.Ka = 1/self.Ra             # rotor gain
+        self.ta = self.La/self.Ra       # rotor time constant
+        self.J = rotor_inertia
+        self.F = viscous_friction
+        self.Km = 1/self.F              # mechanical gain
+        self.tm = self.J/self.F         # mechanical time constant
+        self.load_torque = load_torque  # load torque exerted on the motor
+        self.stator_voltage = self.Re*stator_current if stator_voltage is None else stator_voltage
         # state variables
         self.ie = [stator_current]
         self.ia = [rotor_current]
         self.w = [rotor_speed]
         self.omega = [rotor_position]
+        # inputs
+        self.Va = [None]
+        self.Ve = [None]
+        self.Tl = [None]
+        # other
+        self.speed = [rotor_speed]
+        self.Te = [self.K*stator_current*rotor_current]
+        # rotor step of the last stator current and step length
+        self.rotor_key = None
+        self.rotor_step = None
+
+    def reset(self):
+        self.reset_traces()
+
+    def vectorize(self, size):
+        raise ValueError("Electric motors can't be simulated on ensembles")
+
+    def calculate(self, Va, Tl = None, Ve = None):
+        """ Calculates the next state and adds it to the memory
+
+        Args:
+            Va (float): rotor voltage
+            Tl (float): load torque, `load_torque` if not given
+            Ve (float): stator voltage, `stator_voltage` if not given
+        """
+        if Tl is None:
+            Tl = self.load_torque
+        if Ve is None:
+            Ve = self.stator_voltage
+        dt, K, Re, Ra, La, J, F = self.dt, self.K, self.Re, self.Ra, self.La, self.J, self.F
+        ie, ia, w, omega = self.ie[-1], self.ia[-1], self.w[-1], self.omega[-1]
+        self.speed.append(w)
+        self.Te.append(K*ie*ia)
+        ie1 = self.stator(ie, Ve)
+        if self.integrator == "euler":
+            ia1 = ia + dt*(Va - Ra*ia - K*ie*w)/La
+            w1 = w + dt*(K*ie*ia - F*w - Tl)/J
+            omega1 = omega + dt*w
+        else:
+            # x1 = P x + G b, with x = (ia, w) and b = (Va/La, -Tl/J)
+            P00, P01, P10, P11, G00, G01, G10, G11 = self.rotor(K*ie1)
+            b0, b1 = Va/La, -Tl/J
+            ia1 = P00*ia + P01*w + G00*b0 + G01*b1
+            w1 = P10*ia + P11*w + G10*b0 + G11*b1
+            omega1 = omega + dt*(w + w1)/2
+        if self.estimate_error:
+            # error of each state taken as a first order system
+            self.local_error = max(
+                first_order_error(self.integrator, ie, Ve/Re, self.Ve[-1]/Re, dt/self.te),
+                first_order_error(self.integrator, ia, (Va - K*ie*w)/Ra, (self.Va[-1] - K*ie*w)/Ra, dt/self.ta),
+                first_order_error(self.integrator, w, (K*ie*ia - Tl)/F, (K*ie*ia - self.Tl[-1])/F, dt/self.tm))
+        self.ie.append(ie1)
+        self.ia.append(ia1)
+        self.w.append(w1)
+        self.omega.append(omega1)
+        # save inputs just for recording
+        self.Va.append(Va)
+        self.Ve.append(Ve)
+        self.Tl.append(Tl)
+        return w1
+
+    def stator(self, ie, Ve):
+        """ Stator current after a step from ie """
+        if self.integrator == "euler":
+            return ie + self.dt*(Ve - self.Re*ie)/self.Le
+        return first_order_step(self.integrator, ie, Ve/self.Re, self.dt/self.te)
+
+    def state_space(self):
+        """ x = (ia, w, omega), u = (Va, Tl, Ve)
+
+        The rotor is linear for a given stator flux, so the form holds
+        while the stator current is settled and Ve holds the value
+        settling it (see `linear_region`).
+        """
+        ie, Ve = self.ie[-1], self.Ve[-1]
+        if Ve is None or self.stator(ie, Ve) != ie:
+            return None
+        dt, K, La, J = self.dt, self.K, self.La, self.J
+        if self.integrator == "euler":
+            A = [[1 - dt*self.Ra/La, -dt*K*ie/La, 0], [dt*K*ie/J, 1 - dt*self.F/J, 0], [0, dt, 1]]
+            B = [[dt/La, 0, 0], [0, -dt/J, 0], [0, 0, 0]]
+        else:
+            P00, P01, P10, P11, G00, G01, G10, G11 = self.rotor(K*ie)
+            # omega1 = omega + dt*(w + w1)/2
+            A = [[P00, P01, 0], [P10, P11, 0], [dt/2*P10, dt/2*(1 + P11), 1]]
+            B = [[G00/La, -G01/J, 0], [G10/La, -G11/J, 0], [dt/2*G10/La, -dt/2*G11/J, 0]]
+        zero = [0, 0, 0]
+        # traces ie, ia, w, omega, Va, Ve, Tl, speed and Te
+        C = [zero, A[0], A[1], A[2], zero, zero, zero, [0, 1, 0], [K*ie, 0, 0]]
+        D = [zero, B[0], B[1], B[2], [1, 0, 0], [0, 0, 1], [0, 1, 0], zero, zero]
+        return StateSpace(["Va", "Tl", "Ve"], self.traces, A, B, C, D, c = [ie] + [0]*8,
+            defaults = {"Tl": self.load_torque, "Ve": self.stator_voltage})
+
+    def linear_state(self):
+        return [self.ia[-1], self.w[-1], self.omega[-1]]
+
+    def linear_region(self, x, u, y):
+        # a change of Ve moves the stator current, and the flux
+        return u[2] == self.Ve[-1]
+
+    def rotor(self, flux):
+        """ Matrices P and G stepping the rotor, for a stator flux K*ie
+
+        They only change with the flux, the step and the constants, so
+        they're calculated again only when one of those does.
+        """
+        key = (flux, self.dt, self.Ra, self.La, self.J, self.F)
+        if key != self.rotor_key:
+            h = self.dt
+            A = np.array([[-self.Ra/self.La, -flux/self.La], [flux/self.J, -self.F/self.J]])
+            I = np.eye(2)
+            if self.integrator == "zoh":
+                P = expm(A*h)
+                G = np.linalg.solve(A, P - I)
+            elif self.integrator == "backward_euler":
+                inverse = np.linalg.inv(I - h*A)
+                P, G = inverse, h*inverse
+            else:
+                inverse = np.linalg.inv(I - h/2*A)
+                P, G = inverse @ (I + h/2*A), h*inverse
+            self.rotor_key = key
+            self.rotor_step = tuple(P.ravel().tolist() + G.ravel().tolist())
+        return self.rotor_step
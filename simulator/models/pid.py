@@ -1,5 +1,8 @@
+import numpy as np
 from .base import BaseModel
 from ..utils.numerical_analysis import DumbDifferentiator, DumbIntegrator, DeadBand
+from ..utils.numerical_analysis import EnsembleDifferentiator, EnsembleIntegrator, EnsembleDeadBand
+from ..utils.linear import StateSpace
 
 class PID(BaseModel):
     """A class used to model the most simple PID regulator possible.
@@ -12,12 +15,16 @@ class PID(BaseModel):
         error (float): initial value given to the
             state variable error
     """
+    traces = ("error", "PV", "SP", "PG", "IG", "DG", "MV")
+    parameters = ("Kp", "Ti", "Td")
+    outputs = ("error", "PG", "IG", "DG", "MV")
+
     def __init__(self, dt, Kp, Ti, Td, error = 0, **kwargs):
         # constants
         self.dt = dt
-        self.Kp = [Kp]
-        self.Ti = [Ti]
-        self.Td = [Td]
+        self.Kp = Kp
+        self.Ti = Ti
+        self.Td = Td
         # state variable
         self.error = [error]
         # inputs
@@ -34,9 +41,9 @@ class PID(BaseModel):
 
     def calculate(self, SP, PV, FWD):
         """Calculates the next value and adds it to the memory."""
-        Kp = self.Kp[-1]
-        Ti = self.Ti[-1]
-        Td = self.Td[-1]
+        Kp = self.Kp
+        Ti = self.Ti
+        Td = self.Td
         # error
         error = SP - PV
         # gains
@@ -46,29 +53,62 @@ class PID(BaseModel):
         # output
         MV = PG + IG + DG + FWD
         # update attributes
-        self.update_attributes(**{
-            "error": error,
-            "PG": PG,
-            "IG": IG,
-            "DG": DG,
-            "MV": MV
-        })
+        self.record_outputs(error, PG, IG, DG, MV)
         return MV
 
+    def hold(self, calculations):
+        # the error held goes on being integrated, the values
+        # differentiated are the ones held
+        self.I.hold(self.dt, calculations)
+
     def reset(self):
-        # state variable
-        self.error = self.error[0:1]
-        # inputs
-        self.PV = self.PV[0:1]
-        self.SP = self.SP[0:1]
-        # other
+        self.reset_traces()
         self.I.reset(0.)
+        # the first error is integrated on its own again
+        self.I.y0 = None
         self.D.reset(0.)
-        self.PG = self.PG[0:1]
-        self.IG = self.IG[0:1]
-        self.DG = self.DG[0:1]
-        # output
-        self.MV = self.MV[0:1]
+
+    def vectorize(self, size):
+        super().vectorize(size)
+        self.I = EnsembleIntegrator(self.I.m0)
+        self.D = EnsembleDifferentiator()
+
+    def state_space(self):
+        """ x = (integral, previous error, previous error differentiated), u = (SP, PV, FWD) """
+        A, B, C, D, c = self.pid_state_space("error")
+        return StateSpace(["SP", "PV", "FWD"], ["error", "PG", "IG", "DG", "MV"], A, B, C, D, c = c)
+
+    def pid_state_space(self, differentiated, gain = 1., offset = 0.):
+        """ Matrices of the PID, outputs error, PG, IG, DG and MV
+
+        The derivative action is taken on the error or on the PV, as
+        given by `differentiated`, and DG = gain*derivative + offset.
+        """
+        Kp, Ti, Td, dt = self.Kp, self.Ti, self.Td, self.dt
+        zero = np.zeros(3)
+        e = np.array([1., -1., 0.])
+        d = e if differentiated == "error" else np.array([0., 1., 0.])
+        A = [[1, dt/2, 0], [0, 0, 0], [0, 0, 0]]
+        B = [dt/2*e, e, d]
+        C = [zero, zero, Kp/Ti*np.array([1, dt/2, 0]), gain*np.array([0, 0, -Kp*Td/dt])]
+        D = [e, Kp*e, Kp/Ti*dt/2*e, gain*Kp*Td/dt*d]
+        # MV = PG + IG + DG + FWD
+        C.append(C[1] + C[2] + C[3])
+        D.append(D[1] + D[2] + D[3] + np.array([0., 0., 1.]))
+        return A, B, C, D, [0, 0, 0, offset, offset]
+
+    def linear_state(self):
+        # a first value to integrate or differentiate is taken differently
+        if not self.I.y0 or not self.D.y0:
+            return None
+        return [self.I.m0, self.I.y0, self.D.y0]
+
+    def set_linear_state(self, x):
+        self.I.m0, self.I.y0, self.D.y0 = x
+
+    def linear_region(self, x, u, y):
+        # previous values of 0 are taken as missing (see DumbIntegrator)
+        return (x[1] != 0) & (x[2] != 0)
         
 class PIDLimitedMV(PID):
     """PID regulator with limited MV
@@ -84,17 +124,19 @@ class PIDLimitedMV(PID):
         max_MV (float): upper limit value for calculated MV.
             If None is given, no limit is applied.
     """
+    parameters = PID.parameters + ("min_MV", "max_MV")
+
     def __init__(self, dt, Kp, Ti, Td, error = 0, 
                  min_MV = None, max_MV = None):
         super().__init__(dt, Kp, Ti, Td, error)
         # settings
-        self.min_MV = [min_MV]
-        self.max_MV = [max_MV]
+        self.min_MV = min_MV
+        self.max_MV = max_MV
 
     def calculate(self, SP, PV, FWD):
         MV = super().calculate(SP, PV, FWD)
-        max_MV = self.max_MV[-1]
-        min_MV = self.min_MV[-1]
+        max_MV = self.max_MV
+        min_MV = self.min_MV
         # limit MV
         if max_MV is not None and MV > max_MV:
             self.MV[-1] = max_MV
@@ -104,26 +146,49 @@ class PIDLimitedMV(PID):
             return min_MV
         return MV
 
+    def calculate_ensemble(self, SP, PV, FWD):
+        MV = super().calculate(SP, PV, FWD)
+        max_MV = self.max_MV
+        min_MV = self.min_MV
+        # limit MV
+        if max_MV is not None:
+            MV = np.where(MV > max_MV, max_MV, MV)
+        if min_MV is not None:
+            MV = np.where(MV < min_MV, min_MV, MV)
+        self.MV[-1] = MV
+        return MV
+
+    def linear_region(self, x, u, y):
+        linear = super().linear_region(x, u, y)
+        MV = y[4]
+        if self.max_MV is not None:
+            linear &= ~(MV > self.max_MV)
+        if self.min_MV is not None:
+            linear &= ~(MV < self.min_MV)
+        return linear
+
 class PIDLimitedIntegral(PIDLimitedMV):
     """Improved PID implementation 
 
     Args:
         db_DG (bool): deadband applied to the derivative action.
     """
+    outputs = PID.outputs + ("SP", "PV")
+
     def __init__(self, dt, Kp, Ti, Td, error = 0, 
                  min_MV = None, max_MV = None, 
                  db_DG = 0, differ_on_PV = True):
         super().__init__(dt, Kp, Ti, Td, error, min_MV, max_MV)
         # settings
-        self.differ_on_PV = [differ_on_PV]
+        self.differ_on_PV = differ_on_PV
         self.db = DeadBand(db_DG)
 
     def calculate(self, SP, PV, FWD):
-        Kp = self.Kp[-1]
-        Ti = self.Ti[-1]
-        Td = self.Td[-1]
-        max_MV = self.max_MV[-1]
-        min_MV = self.min_MV[-1]
+        Kp = self.Kp
+        Ti = self.Ti
+        Td = self.Td
+        max_MV = self.max_MV
+        min_MV = self.min_MV
         # error
         error = SP - PV
         # gains
@@ -147,12 +212,89 @@ class PIDLimitedIntegral(PIDLimitedMV):
             IG = MV - PG - DG - FWD
             self.I.reset(IG*Ti/Kp)
         # update attributes
-        self.update_attributes(**{
-            "error": error,
-            "PG": PG,
-            "IG": IG,
-            "DG": DG,
-            "MV": MV,
-            "SP": SP,
-            "PV": PV
-        })
\ No newline at end of file
+        self.record_outputs(error, PG, IG, DG, MV, SP, PV)
+
+    def vectorize(self, size):
+        super().vectorize(size)
+        self.db = EnsembleDeadBand(self.db.db, self.db.offset)
+
+    def hold(self, calculations):
+        # winded up, the integral is reset to the same value every time
+        if self.MV[-1] != self.max_MV and self.MV[-1] != self.min_MV:
+            super().hold(calculations)
+
+    def band(self):
+        """ Part of the deadband DG was last in: -1 below, 0 within, 1 above
+
+        None if there is no deadband.
+        """
+        if not self.db.db:
+            return None
+        DG, offset = self.DG[-1], self.db.offset
+        return 0 if DG == offset else 1 if DG > offset else -1
+
+    def state_space(self):
+        """ x = (integral, previous error, previous value differentiated), u = (SP, PV, FWD)
+
+        Within the deadband, DG holds the offset, outside of it DG
+        follows the derivative shifted by the deadband.
+        """
+        band = self.band()
+        if band is None:
+            gain, offset = 1., 0.
+        elif band == 0:
+            gain, offset = 0., self.db.offset
+        else:
+            gain, offset = 1., -band*self.db.db
+        A, B, C, D, c = self.pid_state_space("PV" if self.differ_on_PV else "error", gain, offset)
+        # SP and PV are recorded too
+        C += [np.zeros(3), np.zeros(3)]
+        D += [[1., 0., 0.], [0., 1., 0.]]
+        return StateSpace(["SP", "PV", "FWD"], ["error", "PG", "IG", "DG", "MV", "SP", "PV"], A, B, C, D, c = c + [0, 0])
+
+    def linear_region(self, x, u, y):
+        # MV within its limits doesn't wind up
+        linear = super().linear_region(x, u, y)
+        band = self.band()
+        if band is not None:
+            differentiated = u[1] if self.differ_on_PV else u[0] - u[1]
+            derivative = (differentiated - x[2])/self.dt*self.Kp*self.Td
+            high, low = self.db.offset + self.db.db, self.db.offset - self.db.db
+            if band == 1:
+                linear &= derivative > high
+            elif band == -1:
+                linear &= derivative < low
+            else:
+                linear &= ~(derivative > high) & ~(derivative < low)
+        return linear
+
+    def calculate_ensemble(self, SP, PV, FWD):
+        Kp = self.Kp
+        Ti = self.Ti
+        Td = self.Td
+        max_MV = self.max_MV
+        min_MV = self.min_MV
+        # error
+        error = SP - PV
+        # gains
+        PG = Kp*error
+        IG = self.I.calculate(self.dt, error)*Kp/Ti
+        if self.differ_on_PV:
+            DG = self.db.calculate(self.D.calculate(self.dt, PV)*Kp*Td)
+        else:
+            DG = self.db.calculate(self.D.calculate(self.dt, error)*Kp*Td)
+        # output
+        MV = PG + IG + DG + FWD
+        # anti-windup logic, applied only to the scenarios winded up
+        winded_up = np.zeros(np.shape(MV), dtype = bool)
+        if max_MV is not None:
+            winded_up |= MV > max_MV
+            MV = np.where(MV > max_MV, max_MV, MV)
+        if min_MV is not None:
+            winded_up |= MV < min_MV
+            MV = np.where(MV < min_MV, min_MV, MV)
+        IG = np.where(winded_up, MV - PG - DG - FWD, IG)
+        self.I.m0 = np.where(winded_up, IG*Ti/Kp, self.I.m0)
+        # update attributes
+        self.record_outputs(error, PG, IG, DG, MV, SP, PV)
+        return MV
@@ -0,0 +1,141 @@
+import re
+import numpy as np
+from .base import BaseModel
+from .pid import PIDLimitedIntegral
+from ..utils.numerical_analysis import EnsembleDifferentiator, EnsembleIntegrator, EnsembleDeadBand
+from ..utils.history import ColumnTrace
+
+class PIDBank(BaseModel):
+    """ Bank of K PID loops calculated at once
+
+    Each loop behaves as a `PIDLimitedIntegral`: same anti-windup,
+    derivative on the PV (or on the error) and deadband applied to
+    the derivative action. Gains, limits and states of every loop are
+    held in arrays, so all the MVs are calculated by a single call.
+
+    Each input takes one value per loop: on the spec, an input given
+    as a list of input specs, one per loop, passes an array, and an
+    input given as usual is the same for every loop. Traces hold one
+    value per loop; the values of one loop are addressed, e.g. by plots
+    and performance meters, as "MV[name]" or "MV[index]".
+
+    Example of the params of a spec:
+    {
+        "loops": [
+            {"name": "fic101", "Kp": 2, "Ti": 0.5, "Td": 0.01, "max_MV": 100},
+            {"name": "tic102", "Kp": 1, "Ti": 20, "Td": 0, "db_DG": 0.1}
+        ]
+    }
+
+    Args:
+        dt (float): cycle time
+        loops (list): settings of each loop, the arguments of
+            `PIDLimitedIntegral` ("Kp", "Ti", "Td", optionally "error",
+            "min_MV", "max_MV", "db_DG" and "differ_on_PV") and an
+            optional "name", the index of the loop by default
+    """
+    traces = PIDLimitedIntegral.traces
+    parameters = ("Kp", "Ti", "Td", "min_MV", "max_MV")
+    outputs = PIDLimitedIntegral.outputs
+    defaults = {"error": 0., "min_MV": None, "max_MV": None, "db_DG": 0., "differ_on_PV": True}
+    # "MV[fic101]", "MV[0]"
+    column = re.compile(r"(\w+)\[(\w+)\]")
+
+    def __init__(self, dt, loops, **kwargs):
+        loops = [dict(self.defaults, **loop) for loop in loops]
+        self.dt = dt
+        self.names = [str(loop.get("name", k)) for k, loop in enumerate(loops)]
+        if len(set(self.names)) != len(self.names):
+            raise ValueError("Loops of a PID bank must have different names")
+        setting = lambda key, default = None: np.array([default if loop[key] is None else loop[key] for loop in loops], dtype = float)
+        # constants
+        self.Kp = setting("Kp")
+        self.Ti = setting("Ti")
+        self.Td = setting("Td")
+        # no limit is an infinite one
+        self.min_MV = setting("min_MV", -np.inf)
+        self.max_MV = setting("max_MV", np.inf)
+        self.differ_on_PV = np.array([bool(loop["differ_on_PV"]) for loop in loops])
+        size = len(loops)
+        # state variable
+        self.error = [setting("error")]
+        # inputs
+        self.PV = [np.full(size, np.nan)]
+        self.SP = [np.full(size, np.nan)]
+        # other
+        self.I = EnsembleIntegrator(np.zeros(size))
+        self.D = EnsembleDifferentiator()
+        self.db = EnsembleDeadBand(setting("db_DG"), np.zeros(size))
+        self.PG = [np.zeros(size)]
+        self.IG = [np.zeros(size)]
+        self.DG = [np.zeros(size)]
+        # output
+        self.MV = [np.zeros(size)]
+
+    def __getattr__(self, name):
+        # values of one loop
+        match = self.column.fullmatch(name)
+        if match is None or match.group(1) not in self.traces:
+            raise AttributeError("{} has no attribute {}".format(type(self).__name__, name))
+        return ColumnTrace(self, match.group(1), self.loop_index(match.group(2)))
+
+    def loop_index(self, loop):
+        """ Index of a loop given by name or by index """
+        if loop in self.names:
+            return self.names.index(loop)
+        if loop.isdigit() and int(loop) < len(self.names):
+            return int(loop)
+        raise AttributeError("PID bank has no loop {}".format(loop))
+
+    def calculate(self, SP, PV, FWD):
+        """ Calculates the next MV of every loop and adds them to the memory """
+        Kp = self.Kp
+        Ti = self.Ti
+        Td = self.Td
+        max_MV = self.max_MV
+        min_MV = self.min_MV
+        # inputs the same for every loop are recorded for each one
+        if np.ndim(SP) == 0:
+            SP = np.full(Kp.shape, SP)
+        if np.ndim(PV) == 0:
+            PV = np.full(Kp.shape, PV)
+        # error
+        error = SP - PV
+        # gains
+        PG = Kp*error
+        IG = self.I.calculate(self.dt, error)*Kp/Ti
+        DG = self.db.calculate(self.D.calculate(self.dt, np.where(self.differ_on_PV, PV, error))*Kp*Td)
+        # output
+        MV = PG + IG + DG + FWD
+        # anti-windup logic, applied only to the loops winded up
+        winded_up = MV > max_MV
+        MV = np.minimum(MV, max_MV)
+        winded_up |= MV < min_MV
+        MV = np.maximum(MV, min_MV)
+        if winded_up.any():
+            IG = np.where(winded_up, MV - PG - DG - FWD, IG)
+            self.I.m0 = np.where(winded_up, IG*Ti/Kp, self.I.m0)
+        # update attributes
+        self.record_outputs(error, PG, IG, DG, MV, SP, PV)
+        return MV
+
+    def hold(self, calculations):
+        # the integrals of the loops winded up are reset to the same
+        # value every time, the others go on integrating their error
+        # (see `DumbIntegrator.hold`)
+        I, MV = self.I, self.MV[-1]
+        if I.y0 is None:
+            return
+        area = self.dt*I.y0
+        advanced = (I.m0 + area != I.m0) & (MV != self.max_MV) & (MV != self.min_MV)
+        I.m0 = np.where(advanced, I.m0 + calculations*area, I.m0)
+
+    def vectorize(self, size):
+        raise ValueError("PID banks can't be simulated on ensembles")
+
+    def reset(self):
+        self.reset_traces()
+        size = len(self.names)
+        self.I.reset(np.zeros(size))
+        self.I.y0 = None
+        self.D.reset(np.zeros(size))
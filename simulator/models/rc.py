@@ -1,10 +1,26 @@
-class RC:
-    """ A class used to model an RC (resistor-capacitor) circuit """
-    def __init__(self, dt, resistance, capacitance, charge):
+from .base import BaseModel
+from ..utils.numerical_analysis import FIRST_ORDER_POLES, check_integrator, first_order_step, first_order_error
+from ..utils.linear import StateSpace
+
+class RC(BaseModel):
+    """ A class used to model an RC (resistor-capacitor) circuit
+
+    The charge is integrated with forward Euler unless another
+    `integrator` is given: "rk4", "backward_euler", "trapezoidal" or
+    "zoh" (exact for an input held during the step).
+    """
+    traces = ("Q", "Q1", "Vin", "Vr", "Vc", "i")
+    parameters = ("R", "C")
+    delayed_outputs = ("Vc",)
+    continuous = True
+
+    def __init__(self, dt, resistance, capacitance, charge, integrator = "euler"):
+        check_integrator(integrator)
         # constants
         self.dt = dt
-        self.R = [resistance]
-        self.C = [capacitance]
+        self.integrator = integrator
+        self.R = resistance
+        self.C = capacitance
         # state variable
         self.Q = [charge]
         self.Q1 = [charge]
@@ -13,17 +29,42 @@ class RC:
         # other
         self.Vr = [None]
         self.Vc = [None]
-        self.i = [None]        
+        self.i = [None]
+
+    def reset(self):
+        self.reset_traces()
 
     def calculate(self, Vin):
         """ Calculates the next value and adds it to the memory """
-        self.Vc.append(self.Q[-1]/self.C[-1])
-        self.Vr.append(Vin - self.Vc[-1])
-        self.i.append(self.Vr[-1]/self.R[-1])
+        R, C = self.R, self.C
+        Q1 = self.Q1[-1]
+        Vc = self.Q[-1]/C
+        Vr = Vin - Vc
+        self.Vc.append(Vc)
+        self.Vr.append(Vr)
+        self.i.append(Vr/R)
         # update state variables
-        self.Q.append(self.dt*((1/self.R[-1])*(Vin-(1/self.C[-1])*self.Q1[-1]))+self.Q1[-1])
-        self.Q1.append(self.Q[-1])
+        if self.integrator == "euler":
+            Q = self.dt*((1/R)*(Vin-(1/C)*Q1))+Q1
+        else:
+            Q = first_order_step(self.integrator, Q1, C*Vin, self.dt/(R*C))
+        if self.estimate_error:
+            self.local_error = first_order_error(self.integrator, Q1, C*Vin, C*self.Vin[-1], self.dt/(R*C))
+        self.Q.append(Q)
+        self.Q1.append(Q)
         # save input just for recording
         self.Vin.append(Vin)
         # return the charge
-        return self.Q[-1]
\ No newline at end of file
+        return Q
+
+    def state_space(self):
+        """ x = (Q,), u = (Vin,) """
+        R, C = self.R, self.C
+        pole = FIRST_ORDER_POLES[self.integrator](self.dt/(R*C))
+        A, B = pole, (1 - pole)*C
+        return StateSpace(["Vin"], self.traces, [[A]], [[B]],
+            [[A], [A], [0], [-1/C], [1/C], [-1/(R*C)]],
+            [[B], [B], [1], [1], [0], [1/R]])
+
+    def linear_state(self):
+        return [self.Q[-1]]
@@ -1,10 +1,27 @@
-class RL:
-    """ A class used to model an RL (resistor-inductor) circuit """
-    def __init__(self, dt, resistance, inductance, current):
+import numpy as np
+from .base import BaseModel
+from ..utils.numerical_analysis import FIRST_ORDER_POLES, check_integrator, first_order_step, first_order_error
+from ..utils.linear import StateSpace
+
+class RL(BaseModel):
+    """ A class used to model an RL (resistor-inductor) circuit
+
+    The current is integrated with forward Euler unless another
+    `integrator` is given: "rk4", "backward_euler", "trapezoidal" or
+    "zoh" (exact for an input held during the step).
+    """
+    traces = ("i", "i1", "Vin", "Vr", "Vl")
+    parameters = ("R", "L")
+    delayed_outputs = ("Vr",)
+    continuous = True
+
+    def __init__(self, dt, resistance, inductance, current, integrator = "euler"):
+        check_integrator(integrator)
         # constants
         self.dt = dt
-        self.R = [resistance]
-        self.L = [inductance]
+        self.integrator = integrator
+        self.R = resistance
+        self.L = inductance
         # state variable
         self.i = [current]
         self.i1 = [current]
@@ -15,45 +32,57 @@ class RL:
         self.Vl = [None]
 
     def reset(self):
-        # state variable
-        self.i = self.i[0:1]
-        self.i1 = self.i1[0:1]
-        # inputs
-        self.Vin = self.Vin[0:1]
-        # other
-        self.Vr = self.Vr[0:1]
-        self.Vl = self.Vl[0:1]
+        self.reset_traces()
 
     def calculate(self, Vin):
         """ Calculates the next value and adds it to the memory """
-        self.Vr.append(self.i[-1]*self.R[-1])
-        self.Vl.append(Vin - self.Vr[-1])
+        Vr = self.i[-1]*self.R
+        Vl = Vin - Vr
+        self.Vr.append(Vr)
+        self.Vl.append(Vl)
         # update state variables
-        self.i.append(self.dt*self.Vl[-1]/self.L[-1] + self.i1[-1])
-        self.i1.append(self.i[-1])
+        i1 = self.i1[-1]
+        if self.integrator == "euler":
+            i = self.dt*Vl/self.L + i1
+        else:
+            i = first_order_step(self.integrator, i1, Vin/self.R, self.dt*self.R/self.L)
+        if self.estimate_error:
+            R = self.R
+            self.local_error = first_order_error(self.integrator, i1, Vin/R, self.Vin[-1]/R, self.dt*R/self.L)
+        self.i.append(i)
+        self.i1.append(i)
         # save input just for recording
         self.Vin.append(Vin)
         # return the current
-        return self.i[-1]
+        return i
+
+    def state_space(self):
+        """ x = (i,), u = (Vin,) """
+        R = self.R
+        pole = FIRST_ORDER_POLES[self.integrator](self.dt*R/self.L)
+        A, B = pole, (1 - pole)/R
+        return StateSpace(["Vin"], RL.traces, [[A]], [[B]],
+            [[A], [A], [0], [R], [-R]],
+            [[B], [B], [1], [0], [1]])
+
+    def linear_state(self):
+        return [self.i[-1]]
 
 class RLLimitedVr(RL):
     """ A RL class that limits the value of Vr to a maximum value 
         by adding a dynamic resistance (Rd) in series with R.
     """
-    def __init__(self, dt, resistance, inductance, current, max_Vr):
-        super().__init__(dt, resistance, inductance, current)
+    traces = RL.traces + ("Rd", "Vrd")
+    parameters = RL.parameters + ("max_Vr",)
+
+    def __init__(self, dt, resistance, inductance, current, max_Vr, integrator = "euler"):
+        super().__init__(dt, resistance, inductance, current, integrator)
         # constants
-        self.max_Vr = [max_Vr]
+        self.max_Vr = max_Vr
         # others
         self.Rd = [None]        
         self.Vrd = [None]
 
-    def reset(self):
-        super().reset()
-        # others
-        self.Rd = self.Rd[0:1]        
-        self.Vrd = self.Vrd[0:1]
-
     def calculate(self, Vin):
         i = super().calculate(Vin)
         # values for Vr < max_Vr
@@ -61,7 +90,7 @@ class RLLimitedVr(RL):
         Vrd = 0.
         Vr = self.Vr[-1]
         # values if Vr > max_Vr
-        max_Vr = self.max_Vr[-1]
+        max_Vr = self.max_Vr
         if Vr > max_Vr:
             Vrd = Vr - max_Vr
             Rd = Vrd/i
@@ -72,6 +101,25 @@ class RLLimitedVr(RL):
         self.Vrd.append(Vrd)
         return i
 
-        
+    def state_space(self):
+        """ The one of RL, with Rd = Vrd = 0 while Vr isn't limited """
+        ss = super().state_space()
+        return StateSpace(ss.inputs, self.traces, ss.A, ss.B,
+            np.vstack((ss.C, np.zeros((2, 1)))), np.vstack((ss.D, np.zeros((2, 1)))))
 
+    def linear_region(self, x, u, y):
+        return ~(y[self.traces.index("Vr")] > self.max_Vr)
 
+    def calculate_ensemble(self, Vin):
+        i = super().calculate(Vin)
+        Vr = self.Vr[-1]
+        max_Vr = self.max_Vr
+        limited = Vr > max_Vr
+        Vrd = np.where(limited, Vr - max_Vr, 0.)
+        Rd = np.divide(Vrd, i, out = np.zeros(np.shape(limited)), where = limited)
+        # update Vr
+        self.Vr[-1] = np.where(limited, max_Vr, Vr)
+        # save values and return
+        self.Rd.append(Rd)
+        self.Vrd.append(Vrd)
+        return i
@@ -1,4 +1,9 @@
-class SignalGenerator:
+from bisect import bisect_left, bisect_right
+import numpy as np
+from .base import BaseModel
+from ..utils.linear import StateSpace
+
+class SignalGenerator(BaseModel):
     """ Signal generator class
 
     It creates different signals depending on the events it's given.
@@ -34,7 +39,20 @@ class SignalGenerator:
             }
         }
     ]
+
+    The events are compiled once into a table of segments and the
+    values are calculated a chunk of cycles at a time, so that each
+    cycle only reads a list, however many events there are.
     """
+    traces = ("current_value",)
+    ensemble_values = False
+    delayed_outputs = ("current_value",)
+    # cycles whose values are calculated at once
+    chunk = 65536
+    # value added on every cycle by each kind of event, None for a step
+    # to the event's value
+    slopes = {"step": None, "ramp_up": 1, "ramp_down": -1, "pause": 0}
+
     def __init__(self, events, **kwargs):
         self.events = events
         self.current_value = [0]
@@ -44,10 +62,32 @@ class SignalGenerator:
         for el in events:
             if "start" in el:
                 self.current_value[0] = el["start"]["value"]
+        self.initial_value = self.current_value[0]
+        # first event of each cycle, in the order of the list
+        self.events_by_cycle = {}
+        for el in events:
+            for key in el:
+                if type(el[key]) == dict and "cycle" in el[key]:
+                    self.events_by_cycle.setdefault(el[key]["cycle"], el)
+        for el in self.events_by_cycle.values():
+            if list(el)[0] not in self.slopes:
+                raise ValueError("Unknown event {}".format(list(el)[0]))
+        self.event_cycles = sorted(self.events_by_cycle)
+        # values of the cycles from `first` on
+        self.first = 0
+        self.trajectory = []
 
     def reset(self):
-        self.current_value = self.current_value[0:1]
+        self.reset_traces()
         self.current_event = None
+        self.first = 0
+        self.trajectory = []
+
+    def __getstate__(self):
+        # the values are calculated again when needed
+        state = self.__dict__.copy()
+        state["trajectory"] = []
+        return state
 
     def get_cycles_with_events(self):
         """ Return a list with which cycles an event change will occur. """
@@ -57,53 +97,105 @@ class SignalGenerator:
                 if type(el[key]) == dict and "cycle" in el[key]:
                     cycles.append(el[key]["cycle"])
         return cycles if  len(cycles) > 0 else None
-    
+
     def calculate(self, cycle):
         """ Calculates the next value and adds it to the memory """
-        # at first cycle just return the initial value
-        if cycle == 0:
-            self.current_value.append(self.current_value[0])
-            return self.current_value[0]
-        # update current event
-        if self.cycles_with_events:
-            if cycle in self.cycles_with_events:
-                self.current_event = self.get_event_by_cycle(cycle)
-        # run current event
-        if self.current_event:
-            key = list(self.current_event)[0]
-            updater = getattr(self, key, None)
-            if callable(updater):
-                updater()
+        k = cycle - self.first
+        if not 0 <= k < len(self.trajectory):
+            self.precompute(cycle)
+            k = cycle - self.first
+        # update current event, events aren't taken on the first cycle
+        if cycle in self.events_by_cycle and cycle != 0:
+            self.current_event = self.events_by_cycle[cycle]
+        value = self.trajectory[k]
+        self.current_value.append(value)
+        return value
+
+    def precompute(self, cycle):
+        """ Calculates the values of the chunks up to the one holding `cycle` """
+        if cycle < self.first or not self.trajectory:
+            self.first = 0
+            self.trajectory = self.values(0, self.chunk, None)
+        while cycle >= self.first + len(self.trajectory):
+            start = self.first + len(self.trajectory)
+            self.trajectory = self.values(start, start + self.chunk, self.trajectory[-1])
+            self.first = start
+
+    def values(self, start, stop, previous):
+        """ Values of the cycles from `start` to `stop` - 1
+
+        Args:
+            previous: value of cycle `start` - 1, ignored if `start` is 0
+        """
+        values = np.empty(stop - start)
+        k = start
+        if start == 0:
+            # at first cycle just keep the initial value
+            values[0] = previous = self.initial_value
+            k = 1
+        # events from the first cycle on
+        position = bisect_right(self.event_cycles, k)
+        while k < stop:
+            event = self.event_of(k)
+            end = stop
+            if position < len(self.event_cycles):
+                end = min(stop, self.event_cycles[position])
+            position += 1
+            segment = values[k - start:end - start]
+            key = list(event)[0] if event else "pause"
+            slope = self.slopes[key]
+            if slope is None:
+                segment[:] = event[key]["value"]
+            elif slope == 0:
+                segment[:] = previous
+            else:
+                # accumulated one cycle after the other, as a ramp does
+                increment = slope*event[key]["value"]
+                segment[:] = np.cumsum(np.concatenate(([previous], np.full(end - k, float(increment)))))[1:]
+            previous = segment[-1]
+            k = end
+        return values.tolist()
+
+    def event_of(self, cycle):
+        """ Event in force on `cycle`: the last one up to it, after the first cycle """
+        position = bisect_right(self.event_cycles, cycle)
+        if position == 0 or self.event_cycles[position - 1] <= 0:
+            return None
+        return self.events_by_cycle[self.event_cycles[position - 1]]
+
+    def next_event(self, cycle):
+        """ First cycle, from `cycle` on, on which an event starts """
+        position = bisect_left(self.event_cycles, cycle)
+        if position == len(self.event_cycles):
+            return None
+        return self.event_cycles[position]
+
+    def held_until(self, cycle):
+        event = self.events_by_cycle.get(cycle, self.current_event)
+        # ramps change the value on every cycle
+        if event and ("ramp_up" in event or "ramp_down" in event):
+            return cycle + 1
+        return self.next_event(cycle + 1)
+
+    def state_space(self):
+        """ x = (latest value,), without inputs, on the segment of the current event """
+        event = self.current_event
+        key = list(event)[0] if event else "pause"
+        if key == "step":
+            value = event[key]["value"]
+            A, a, C, c = 0, value, 0, value
+        elif key in ("ramp_up", "ramp_down"):
+            value = event[key]["value"] if key == "ramp_up" else -event[key]["value"]
+            A, a, C, c = 1, value, 1, value
+        elif key == "pause":
+            A, a, C, c = 1, 0, 1, 0
         else:
-            self.current_value.append(self.current_value[-1])
-        return self.current_value[-1]
+            return None
+        return StateSpace([], self.traces, [[A]], [], [[C]], [], [a], [c])
+
+    def linear_state(self):
+        return [self.current_value[-1]]
 
     def get_event_by_cycle(self, cycle):
         """ Find the type of event based on a given cycle """
-        for el in self.events:
-            for key in el:
-                if type(el[key]) == dict and "cycle" in el[key]:
-                    if el[key]["cycle"] == cycle:
-                        return el
-    
-    # event functions
-    def step(self):
-        """ Create a step as the next value and adds it to the memory """
-        value = self.current_event["step"]["value"]
-        self.current_value.append(value)
-
-    def ramp_up(self):
-        """ Ramps up the next value and adds it to the memory """
-        value = self.current_event["ramp_up"]["value"]
-        self.current_value.append(self.current_value[-1] + value)
-
-    def ramp_down(self):
-        """ Ramps down the next value and adds it to the memory """
-        value = self.current_event["ramp_down"]["value"]
-        self.current_value.append(self.current_value[-1] - value)
-
-    def pause(self):
-        """ Maintain the current value and adds it to the memory """
-        # no need to update the current value
-        self.current_value.append(self.current_value[-1])
-        pass
+        return self.events_by_cycle.get(cycle)
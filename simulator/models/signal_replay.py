@@ -0,0 +1,85 @@
+import numpy as np
+from .base import BaseModel
+from ..utils.series import open_series
+
+class SignalReplay(BaseModel):
+    """ Replays a series of values recorded on a file
+
+    The series is sampled at the times of the cycles, t = cycle*dt
+    from `start`, holding the latest sample or interpolating linearly
+    between samples. Before its first sample the series holds its first
+    value, and after the last one its last value.
+
+    The file is memory-mapped and only the part of it covering a chunk
+    of cycles is read at once, so opening it doesn't depend on its size
+    and the memory used stays bounded however long the series is.
+
+    Args:
+        dt (float): cycle time of the model
+        path (str): file of the series (see `simulator.utils.series.open_series`)
+        interpolation (str): "hold" or "linear"
+        cycle_time (float): time between the cycles given to `calculate`,
+            `dt` by default. The simulator sets it to its own cycle time,
+            as models with a sample time are given its cycles.
+        start (float): time of the series replayed on cycle 0, its first
+            time by default
+        time_column, value_column (int or str): columns of the file
+        period (float): time between samples of a series without times
+        columns (int): number of float64 columns of a binary file
+    """
+    traces = ("current_value",)
+    ensemble_values = False
+    delayed_outputs = ("current_value",)
+    # cycles whose values are calculated at once
+    chunk = 65536
+    interpolations = ("hold", "linear")
+
+    def __init__(self, dt, path, interpolation = "hold", cycle_time = None, start = None, time_column = 0, value_column = 1, period = None, columns = 2, **kwargs):
+        if interpolation not in self.interpolations:
+            raise ValueError("Unknown interpolation {}".format(interpolation))
+        self.dt = dt if cycle_time is None else cycle_time
+        self.path = path
+        self.interpolation = interpolation
+        self.options = {"time_column": time_column, "value_column": value_column, "period": period, "columns": columns}
+        self.series = open_series(path, **self.options)
+        self.start = self.series.first_time() if start is None else start
+        # values of the cycles from `first` on
+        self.first = 0
+        self.trajectory = self.values(0, self.chunk)
+        self.current_value = [self.trajectory[0]]
+
+    def reset(self):
+        self.reset_traces()
+
+    def __getstate__(self):
+        # the file is mapped again and the values calculated again when needed
+        state = self.__dict__.copy()
+        state["series"] = None
+        state["trajectory"] = []
+        return state
+
+    def calculate(self, cycle):
+        """ Calculates the next value and adds it to the memory """
+        k = cycle - self.first
+        if not 0 <= k < len(self.trajectory):
+            self.first = cycle - cycle % self.chunk
+            self.trajectory = self.values(self.first, self.first + self.chunk)
+            k = cycle - self.first
+        value = self.trajectory[k]
+        self.current_value.append(value)
+        return value
+
+    def values(self, start, stop):
+        """ Values of the cycles from `start` to `stop` - 1 """
+        if self.series is None:
+            self.series = open_series(self.path, **self.options)
+        t = self.start + np.arange(start, stop)*self.dt
+        times, values = self.series.window(t[0], t[-1])
+        if self.interpolation == "linear":
+            return np.interp(t, times, values).tolist()
+        k = np.searchsorted(times, t, side = "right") - 1
+        return values[np.maximum(k, 0)].tolist()
+
+    def next_event(self, cycle):
+        """ The value may change on every cycle """
+        return cycle
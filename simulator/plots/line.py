@@ -1,4 +1,5 @@
 import itertools
+from ..utils.history import Trace
 
 class Line():
     def __init__(self, model, variable, spec):
@@ -20,6 +21,9 @@ class Line():
         model_values = getattr(self.model, self.variable)
         if not self.multiplier:
             return model_values
+        elif isinstance(model_values, Trace):
+            # traces are arrays, so there is no need to save anything
+            return model_values.values()*self.multiplier
         else:
             """ For additional values on the returned values 
             from the model transform and save it """
@@ -50,17 +50,19 @@ class Plot:
         plots = {}
         if "plot" in spec:
             for i in spec["plot"]:
+                self.sim.record(spec["name"], i)
                 model = self.sim.models[spec["name"]]
                 line = Line(model, i, spec["plot"][i])
                 # creating key to avoid moels with the same variable name to overide each other
                 key = spec["name"] + "_" + i
                 label = self.create_legend(spec, i)
                 # fill plot with first values
-                plot, = self.ax.plot(self.sim.t, line.get_values(), label=label)
+                plot, = self.ax.plot(self.sim.get_time(spec["name"], i), line.get_values(), label=label)
                 plots.update({
                     key: {
                         "plot": plot,
-                        "line": line
+                        "line": line,
+                        "model_name": spec["name"]
                     }
                 })
         return plots
@@ -74,7 +76,7 @@ class Plot:
     def plot(self):
         # Update values
         for i in self.plots:
-            self.plots[i]["plot"].set_xdata(self.sim.t)
+            self.plots[i]["plot"].set_xdata(self.sim.get_time(self.plots[i]["model_name"], self.plots[i]["line"].variable))
             self.plots[i]["plot"].set_ydata(self.plots[i]["line"].get_values())
         # Update plot
         self.ax.relim()
@@ -8,6 +8,28 @@ simulator_settings = {
     "show_plot": True,
     "plot_update_frequency": 1.0,
     "quiet": True,
+    "record": "observed",
+    "stream": {
+        "enabled": False,
+        "path": os.path.join(os.getcwd(), "recording"),
+        "window": 10000,
+        "chunk": 10000
+    },
+    "fast_forward": {
+        "enabled": False,
+        "tolerance": 1e-9,
+        "cycles": 100
+    },
+    "adaptive": {
+        "enabled": False,
+        "tolerance": 1e-6,
+        "min_step": 0.001,
+        "max_step": 0.1
+    },
+    "linear": {
+        "enabled": False,
+        "retry": 64
+    },
     "performance_meter": {
         "enabled": True,
         "quiet": True,
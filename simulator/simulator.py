@@ -3,26 +3,167 @@ import sys
 import inspect
 import json
 import warnings
+import itertools
+import functools
+import operator
+import copy
+import multiprocessing
+import numpy as np
 from .models.signal_generator import SignalGenerator
+from .models.signal_replay import SignalReplay
 from .models.electric_motor import ElectricMotor
 from .models.rc import RC
 from .models.rl import RL, RLLimitedVr
 from .models.pid import PID, PIDLimitedMV, PIDLimitedIntegral
+from .models.pid_bank import PIDBank
 from .settings import simulator_settings
+from .utils.history import Trace, LatestValue, ColumnTrace
+from .utils.recording import Recorder
+from .utils.snapshot import Snapshot
+from .utils.adaptive import AdaptiveStep
+from .utils.codegen import step_function
+from .utils.linear import LinearPath
+from .utils.scheduling import strongly_connected_components, levelize, connected_components
+from .utils.performance_meter import PerformanceMeter
+
+# cycles filled at once when skipping a steady state
+HOLD_CHUNK = 65536
+# cycles run by each call to a compiled step function, and between
+# two calls of the stop hook of a compiled run
+COMPILED_CHUNK = 65536
+COMPILED_STOP_CHUNK = 32
 
 class Simulator:
-    def __init__(self, path_to_models, dt, duration):
+    """ Runs the models loaded from the JSON files on a path
+
+    Args:
+        path_to_models (str): directory with the models' specifications.
+            If None, no model is loaded.
+        dt (float): cycle time
+        duration (float): simulated time
+        stream (dict): if given, each trace only keeps a window of its
+            latest values in memory and the whole history is streamed
+            to disk (see `simulator.utils.recording.Recorder`). Keys:
+            "path", "window" and "chunk".
+        record (str): "observed" to keep the history only of the
+            variables that are observed (listed on the "record" section
+            of the specs, used as inputs by other models, plotted,
+            measured or passed to `record`), "all" to keep every history.
+        ensemble (int): if given, that many scenarios are simulated at
+            once. States and parameters become arrays with one value per
+            scenario; parameters are set with `set_parameter` or given
+            as lists on the specs.
+        fast_forward (dict): if given, once the values of every model
+            have held for some cycles, the simulator skips cycles up to
+            the next event of a model (see `skip_steady_state`). Keys:
+            "tolerance", the change still taken as held (see `unchanged`), and
+            "cycles", how many cycles the values must hold.
+        adaptive (dict): if given, continuous models take steps of
+            several cycles, as long as their estimated error allows (see
+            `simulator.utils.adaptive.AdaptiveStep`), and `t` holds the
+            end of each step. Keys: "tolerance", the error allowed on a
+            step, "max_step" and, optionally, "min_step" (dt by default).
+        linear (dict): if given, while the models are linear they are
+            propagated over several cycles at once with their
+            state-space forms (see `simulator.utils.linear.LinearPath`).
+            Keys: "retry", the cycles calculated one by one after a
+            model leaves its linear region before trying again.
+            Scenarios with a model that has a sample time or no
+            state-space form are calculated cycle by cycle, with a
+            warning.
+    """
+    def __init__(self, path_to_models, dt, duration, stream = None, record = "observed", ensemble = None, fast_forward = None, adaptive = None, linear = None):
+        if ensemble and fast_forward:
+            raise ValueError("Steady states of an ensemble can't be skipped")
+        if adaptive and (ensemble or fast_forward):
+            raise ValueError("Adaptive steps can't be combined with ensembles or fast-forwarding")
+        if linear and (ensemble or fast_forward or adaptive):
+            raise ValueError("Linear runs can't be combined with ensembles, fast-forwarding or adaptive steps")
         self.models = {}
         self.execution_list = []
-        self.t = [0]
+        self.execution_levels = []
+        self.scheduled = False
+        # cycles between two calculations of each model
+        self.ticks = {}
+        self.ensemble = ensemble
+        self.fast_forward = fast_forward
+        self.adaptive = adaptive
+        self.linear = linear
+        # if set, runs without plot nor meters use a compiled step function
+        self.compiled = False
+        # the step function and the plan it was compiled for (see `compile`)
+        self.compiled_step = None
+        self.record_mode = record
+        self.recorded = {}
         self.dt = dt
         self.duration = duration
         self.cycles = int(duration/dt)
+        self.recorder = None
+        if stream:
+            self.recorder = Recorder(stream["path"], stream["window"], stream["chunk"], {
+                "dt": dt,
+                "duration": duration
+            })
+        self.t = self.create_trace(None, "t", [0])
         self.i = 0  # current cycle
         self.running = True
         self.path_to_models = path_to_models
         # add models from settings/models JSON files
-        self.models.update(self.load_models(path_to_models))        
+        if path_to_models is not None:
+            self.models.update(self.load_models(path_to_models))
+        self.schedule()
+        self.allocate()
+
+    def allocate(self):
+        """ Creates the traces of the loaded models
+
+        Variables listed on the "record" section of a spec and variables
+        used as input by other models get a full history, every other
+        variable only keeps its latest value.
+        """
+        for spec in self.execution_list:
+            for variable in spec.get("record", []):
+                self.recorded.setdefault(spec["name"], set()).add(self.trace_name(spec["name"], variable))
+            for input_spec in input_specs(spec):
+                if "model" in input_spec:
+                    self.recorded.setdefault(input_spec["model"], set()).add(self.trace_name(input_spec["model"], input_spec["variable"]))
+        for name in self.models:
+            if self.ensemble:
+                self.models[name].vectorize(self.ensemble)
+            self.models[name].allocate(functools.partial(self.create_trace, name))
+
+    def set_parameter(self, model_name, parameter, value):
+        """ Sets a parameter of a model
+
+        On an ensemble, `value` may hold one value per scenario.
+        """
+        if self.ensemble and np.ndim(value) > 0:
+            value = np.asarray(value, dtype = float)
+            if value.shape != (self.ensemble,):
+                raise ValueError("Parameter {} should have {} values".format(parameter, self.ensemble), value.shape)
+        setattr(self.models[model_name], parameter, value)
+        self.compiled_step = None
+
+    def record(self, model_name, *variables):
+        """ Keeps the whole history of the given variables of a model
+
+        Should be called before running, otherwise the values
+        calculated so far are lost.
+        """
+        model = self.models[model_name]
+        for variable in variables:
+            variable = self.trace_name(model_name, variable)
+            self.recorded.setdefault(model_name, set()).add(variable)
+            trace = getattr(model, variable, None)
+            if type(trace) == LatestValue:
+                if len(self.t) > 1:
+                    warnings.warn("History of {}.{} before cycle {} is lost".format(model_name, variable, self.i))
+                setattr(model, variable, self.create_trace(model_name, variable, [trace.last]))
+
+    def trace_name(self, model_name, variable):
+        """ Name of the trace holding a variable, which may be a column of it (see `ColumnTrace`) """
+        trace = getattr(self.models.get(model_name), variable, None)
+        return trace.variable if isinstance(trace, ColumnTrace) else variable
 
     def load_models(self, path):
         """ Loads a model for each file on path """
@@ -45,52 +186,252 @@ class Simulator:
         if not ("enabled" in spec and spec["enabled"]):
             return None
         model = {}
-        spec["params"]["dt"] = self.dt
+        ticks = self.get_ticks(spec.get("sample_time"))
+        spec["params"]["dt"] = self.dt*ticks
+        if "integrator" in spec:
+            spec["params"]["integrator"] = spec["integrator"]
         try:
             class_ = getattr(sys.modules[__name__], spec["class"])
+            # models calculated on the cycles of the simulator need its
+            # cycle time, which differs from theirs with a sample time
+            if "cycle_time" in inspect.signature(class_).parameters:
+                spec["params"].setdefault("cycle_time", self.dt)
             model = class_(**spec["params"])
         except NameError:
             warnings.warn("Couldn't instantiate a class named {}".format(spec["class"]))
             return
+        self.ticks[spec["name"]] = ticks
         self.update_execution_list(spec)
         return {spec["name"]: model}
+
+    def get_ticks(self, sample_time):
+        """ Number of cycles within a sample time (one cycle if None is given) """
+        if sample_time is None:
+            return 1
+        ticks = int(round(sample_time/self.dt))
+        if ticks < 1 or abs(ticks*self.dt - sample_time) > 1e-9*sample_time:
+            raise ValueError("Sample time {} isn't a multiple of dt = {}".format(sample_time, self.dt))
+        return ticks
+
+    def get_time(self, model_name, variable):
+        """ Returns the instants of the values held by a trace of a model
+
+        The initial value is at t = 0 and the value calculated on cycle i
+        is at t = (i + 1)*dt, as for `t`. Models with a longer sample
+        time only hold values for the cycles they were calculated on.
+        """
+        ticks = self.ticks.get(model_name, 1)
+        if ticks == 1:
+            return self.t
+        trace = getattr(self.models[model_name], variable)
+        total = getattr(trace, "total", len(trace))
+        t = (np.arange(total - len(trace), total)*ticks - ticks + 1)*self.dt
+        if total == len(trace):
+            t[0] = 0.
+        return t
         
-    def update_execution_list(self, spec):
-        """ Update the execution list after loading a new model """
-        if len(self.execution_list) == 0:
-            self.execution_list.append(spec)
-            return
+    def create_trace(self, model_name, variable, values):
+        """ Creates the trace holding the history of a variable
+
+        Args:
+            model_name (str): None for variables of the simulator
+            variable (str): name of the variable
+            values (iterable): initial values
+        """
+        shape = ()
+        if model_name is None:
+            name = variable
         else:
-            for idx, i in enumerate(self.execution_list):
-                if spec["order"] <= i["order"]:
-                    self.execution_list.insert(idx, spec)
-                    return
-            self.execution_list.append(spec)
+            if self.record_mode != "all" and variable not in self.recorded.get(model_name, ()):
+                return LatestValue(values)
+            name = model_name + "." + variable
+            if self.ensemble and self.models[model_name].ensemble_values:
+                shape = (self.ensemble,)
+            elif len(values):
+                # variables holding arrays, e.g. one value per loop of a PID bank
+                shape = np.shape(values[-1])
+        if self.recorder:
+            return self.recorder.trace(name, values, shape)
+        # one value per calculation plus the initial value
+        ticks = self.ticks.get(model_name, 1)
+        return Trace((self.cycles + ticks - 1)//ticks + 1, values, shape)
+
+    def update_execution_list(self, spec):
+        """ Update the execution list after loading a new model
+
+        The order of execution is derived later, by `schedule`.
+        """
+        self.execution_list.append(spec)
+        self.scheduled = False
+
+    def schedule(self):
+        """ Derives the order of execution from the inputs of the models
+
+        A model runs after the models it reads from. A feedback loop is
+        broken at a model whose variables read by the rest of the loop
+        are all `delayed_outputs` (calculated from its state only): that
+        model runs first and reads the rest of the loop as left by the
+        previous cycle. A loop without such a model is an algebraic loop
+        and raises a ValueError.
+
+        Models are grouped in levels whose models don't depend on each
+        other. Within a level, models are sorted by their optional
+        "order" field and then by name.
+        """
+        specs = {spec["name"]: spec for spec in self.execution_list}
+        # edges go from the model read to the model reading it
+        edges = {name: set() for name in specs}
+        reads = {}
+        for name in specs:
+            for input_spec in input_specs(specs[name]):
+                if not "model" in input_spec:
+                    continue
+                source = input_spec["model"]
+                if source not in specs:
+                    raise ValueError("Model {} reads from {}, which isn't loaded".format(name, source))
+                edges[source].add(name)
+                reads.setdefault((source, name), set()).add(input_spec["variable"])
+        key = lambda name: (specs[name].get("order", 0), name)
+        nodes = sorted(specs, key = key)
+        loops = self.find_loops(nodes, edges)
+        while loops:
+            for loop in loops:
+                breaker = None
+                for name in sorted(loop, key = key):
+                    delayed = set(self.models[name].delayed_outputs)
+                    readers = edges[name] & set(loop)
+                    if all(reads.get((name, reader), set()) <= delayed for reader in readers):
+                        breaker = name
+                        break
+                if breaker is None:
+                    raise ValueError("Algebraic loop between models {}".format(", ".join(sorted(loop))))
+                # the breaker runs before the models of the loop it reads from
+                for name in loop:
+                    if breaker in edges[name]:
+                        edges[name].discard(breaker)
+                        edges[breaker].add(name)
+                edges[breaker].discard(breaker)
+            loops = self.find_loops(nodes, edges)
+        self.execution_levels = [[specs[name] for name in level] for level in levelize(nodes, edges, key)]
+        self.execution_list[:] = [spec for level in self.execution_levels for spec in level]
+        self.scheduled = True
+
+    @staticmethod
+    def find_loops(nodes, edges):
+        """ Returns the strongly connected components that hold a loop """
+        return [c for c in strongly_connected_components(nodes, edges) if len(c) > 1 or c[0] in edges[c[0]]]
             
     def stop_running(self, *args):
         self.running = False
-    
-    def run(self, plot = None, pf = None):
+
+    @property
+    def completed(self):
+        """ Number of cycles calculated so far """
+        if self.adaptive:
+            # steps last several cycles
+            return int(round(self.t[-1]/self.dt))
+        return getattr(self.t, "total", len(self.t)) - 1
+
+    def run(self, plot = None, pf = None, until = None, stop = None):
+        """ Runs the cycles left, from the last one calculated
+
+        Args:
+            plot (Plot): optional live plot
+            pf (PerformanceMeter): optional performance meter
+            until (float): if given, stops at that simulated time
+                instead of at the end of the duration. A later call
+                carries on from there.
+            stop (callable): if given, called with the simulator after
+                each step (after the performance meter). Returning True
+                stops the run as `stop_running` does, e.g. to abandon a
+                simulation whose result is known to be useless. Compiled
+                runs call it every `COMPILED_STOP_CHUNK` cycles instead,
+                stepping a cycle at a time being slower than interpreting.
+        """
         pf_enabled = pf is not None and simulator_settings["performance_meter"]["enabled"]
-        for i in range(self.cycles):
+        last_cycle = self.cycles if until is None else min(self.cycles, int(round(until/self.dt)))
+        if not self.scheduled:
+            self.schedule()
+        plan = self.compile_plan()
+        # models with longer sample times only run on some cycles, so
+        # there is one plan for each combination of models due
+        rates = [self.ticks[spec["name"]] for spec in self.execution_list]
+        distinct_rates = sorted(set(rates))
+        multirate = distinct_rates != [1]
+        plans = {}
+        pf_ticks = pf.ticks if pf_enabled else 1
+        if self.fast_forward:
+            held = [getattr(model, name) for model in self.models.values() for name in model.traces]
+            tolerance = self.fast_forward["tolerance"]
+            # models with longer sample times must have been calculated twice
+            steady_cycles = max([self.fast_forward["cycles"]] + [2*ticks for ticks in rates])
+            previous = None
+            steady = 0
+        i = self.completed
+        if self.compiled and (plot or pf_enabled):
+            warnings.warn("Compiled runs don't support plots nor performance meters, running interpreted")
+        elif self.compiled:
+            step = self.compile()
+            chunk = COMPILED_CHUNK if stop is None else COMPILED_STOP_CHUNK
+            for start in range(i, last_cycle, chunk):
+                if not self.running:
+                    break
+                step(self, start, min(last_cycle, start + chunk))
+                if stop is not None and stop(self):
+                    self.stop_running()
+            i = last_cycle
+        # cycles of the step
+        cycles = 1
+        if self.adaptive:
+            stepper = AdaptiveStep(self, plan, i)
+        linear_path = None
+        unsupported = LinearPath.unsupported(self) if self.linear else None
+        if self.linear and pf_enabled:
+            warnings.warn("Performance meters need every cycle, linear path disabled")
+        elif unsupported:
+            warnings.warn(unsupported + ", linear path disabled")
+        elif self.linear:
+            linear_path = LinearPath(self)
+        while i < last_cycle:
             if not self.running:
                 break
+            if linear_path:
+                done = linear_path.advance(i, last_cycle)
+                if done:
+                    i += done
+                    if stop is not None and stop(self):
+                        self.stop_running()
+                    continue
             self.i = i
+            cycle_plan = plan
+            if self.adaptive:
+                cycle_plan, cycles = stepper.next(i, last_cycle)
+            elif multirate:
+                due = tuple(i % ticks == 0 for ticks in distinct_rates)
+                cycle_plan = plans.get(due)
+                if cycle_plan is None:
+                    cycle_plan = [entry for entry, ticks in zip(plan, rates) if i % ticks == 0]
+                    plans[due] = cycle_plan
             # run models according to position on execution list
-            for model_definition in self.execution_list:
-                model_inputs = self.get_model_inputs(model_definition)
-                self.models[model_definition["name"]].calculate(**model_inputs)
+            for calculate, resolvers in cycle_plan:
+                calculate(*[resolve() for resolve in resolvers])
+            if self.adaptive:
+                cycles = stepper.control(cycles)
+                stepper.hold(i, cycles)
             # update time
-            self.t.append(self.t[-1] + self.dt)
-            # Performance meter
-            if pf_enabled:
+            self.t.append(self.t[-1] + self.dt*cycles)
+            # Performance meter, after every step on adaptive runs
+            if pf_enabled and (self.adaptive or i % pf_ticks == 0):
                 pf.calculate()
+            if stop is not None and stop(self):
+                self.stop_running()
             # ploting
             if plot and simulator_settings["show_plot"]:
                 cycles_to_update = simulator_settings["plot_update_frequency"]/self.dt
                 if cycles_to_update > 0.0:
                     cycles_to_update = int(cycles_to_update)
-                    if i % (cycles_to_update) == 0.0:
+                    # a multiple of cycles_to_update within the step
+                    if (i + cycles - 1)//cycles_to_update != (i - 1)//cycles_to_update:
                         plot.plot()
                         if pf_enabled:
                             plot.plot_performance(pf)
@@ -101,6 +442,17 @@ class Simulator:
                     plot.plot()
                     if pf_enabled:
                         plot.plot_performance(pf)
+            # skip steady states
+            if self.fast_forward:
+                state = [trace.last for trace in held]
+                steady = steady + 1 if previous is not None and self.unchanged(previous, state, tolerance) else 0
+                previous = state
+                if steady >= steady_cycles:
+                    i = self.skip_steady_state(i + 1, last_cycle, pf if pf_enabled else None) - 1
+            i += cycles
+        # Write what is left of the streamed traces
+        if self.recorder:
+            self.recorder.flush()
         # Print performance if calculated
         if pf_enabled and not simulator_settings["performance_meter"]["quiet"]:
             print(pf.result_to_string())
@@ -110,12 +462,305 @@ class Simulator:
         if not simulator_settings["quiet"]:
             print("Finished")
    
+    @staticmethod
+    def unchanged(previous, state, tolerance):
+        """ Tells if every value of `state` is within tolerance of `previous`
+
+        The tolerance is relative to the value, or absolute for values
+        smaller than one, which lets variables decaying to zero settle.
+        """
+        for a, b in zip(previous, state):
+            if np.ndim(b):
+                # variables holding arrays, e.g. of a PID bank
+                if not np.all((a == b) | (np.abs(a - b) <= tolerance*(1 + np.abs(b))) | ((a != a) & (b != b))):
+                    return False
+            elif not (a == b or abs(a - b) <= tolerance*(1 + abs(b)) or (a != a and b != b)):
+                return False
+        return True
+
+    def skip_steady_state(self, start, stop, pf = None):
+        """ Skips cycles from `start` on, while the models hold their values
+
+        Called by `run` once the values of every model have held for a
+        while. Cycles are skipped up to the next event of a model (see
+        `BaseModel.next_event`), up to `stop` or up to the cycle a
+        measurement of `pf` would change on, the traces are filled
+        with the values held and the state the models keep off their
+        traces is advanced over the calculations skipped (see
+        `BaseModel.hold`), e.g. the integral of a PID with an error left.
+
+        With a tolerance of 0 the values skipped are the ones the cycles
+        would have calculated. Above it, they're an approximation: the
+        values changing within the tolerance are held while skipped, and
+        the hidden state advanced as if they held, so after the skip the
+        run carries on from about where calculating every cycle leads.
+
+        Returns:
+            int: first cycle left to calculate
+        """
+        target = stop
+        for model in self.models.values():
+            event = model.next_event(start)
+            if event is not None:
+                target = min(target, event)
+        calls = 0
+        if pf is not None:
+            first = -(-start//pf.ticks)*pf.ticks
+            calls = max(0, -(-(target - first)//pf.ticks))
+            for mea in pf.measurements.values():
+                allowed = mea.steady_calls(self)
+                if allowed is not None and allowed < calls:
+                    calls = allowed
+                    target = first + calls*pf.ticks
+        if target <= start:
+            return start
+        for mea in pf.measurements.values() if pf is not None else ():
+            mea.hold(self, calls)
+        for name, model in self.models.items():
+            ticks = self.ticks[name]
+            model.hold((target - 1)//ticks - (start - 1)//ticks)
+        for begin in range(start, target, HOLD_CHUNK):
+            end = min(target, begin + HOLD_CHUNK)
+            for name, model in self.models.items():
+                ticks = self.ticks[name]
+                count = (end - 1)//ticks - (begin - 1)//ticks
+                for variable in model.traces:
+                    trace = getattr(model, variable)
+                    trace.extend(np.full((count,) + np.shape(trace.last), trace.last))
+            # time is accumulated as on every cycle
+            t = np.cumsum(np.concatenate(([self.t.last], np.full(end - begin, self.dt))))
+            self.t.extend(t[1:])
+        self.i = target - 1
+        return target
+
+    def snapshot(self, pf = None):
+        """ Copies the state of the simulation (and of `pf`, if given)
+
+        The snapshot can be given back to `restore`, on this simulator
+        or on one with the same models, or written to disk with
+        `Snapshot.save`.
+        """
+        if self.recorder:
+            raise ValueError("Snapshots of streamed runs aren't supported")
+        return Snapshot(self, pf)
+
+    def restore(self, snapshot, pf = None):
+        """ Goes back to the state held by a snapshot
+
+        The next call to `run` carries on from the cycle the snapshot
+        was taken at. The measurements of `pf` are restored too, if the
+        snapshot holds them.
+        """
+        if self.recorder:
+            raise ValueError("Snapshots of streamed runs aren't supported")
+        classes = lambda models: {name: type(model) for name, model in models.items()}
+        if snapshot.dt != self.dt or snapshot.ensemble != self.ensemble or classes(snapshot.models) != classes(self.models):
+            raise ValueError("Snapshot was taken from a different simulation")
+        state = copy.deepcopy((snapshot.models, snapshot.t, snapshot.measurements))
+        self.models, self.t, measurements = state
+        self.i = snapshot.i
+        self.running = True
+        if pf is not None and measurements is not None:
+            pf.measurements = measurements
+
+    def fork(self):
+        """ Returns a simulator carrying on from the current state
+
+        The models and their traces are copied, so the fork and this
+        simulator can be run apart, but the specs aren't read again.
+        Use `PerformanceMeter.fork` to carry a meter along.
+        """
+        if self.recorder:
+            raise ValueError("Streamed runs can't be forked")
+        sim = copy.copy(self)
+        sim.execution_list = list(self.execution_list)
+        sim.execution_levels = [list(level) for level in self.execution_levels]
+        sim.ticks = dict(self.ticks)
+        sim.recorded = {name: set(variables) for name, variables in self.recorded.items()}
+        sim.models, sim.t = copy.deepcopy((self.models, self.t))
+        return sim
+
+    def run_parallel(self, pf = None, processes = None):
+        """ Runs independent groups of models in separate processes
+
+        Models are split in groups that don't exchange any value (see
+        `components`) and each group is simulated by a worker process.
+        Afterwards the models, with their traces, and the measurements
+        of `pf` are replaced by the ones calculated by the workers.
+        With a single group or a single process, it's the same as `run`.
+
+        Args:
+            pf (PerformanceMeter): optional performance meter
+            processes (int): number of worker processes, defaults to
+                the number of CPUs
+        """
+        if self.recorder:
+            raise ValueError("Streamed runs can't be split across processes")
+        groups = self.components(pf)
+        if processes == 1 or len(groups) == 1:
+            return self.run(None, pf)
+        tasks = [(self.subset(group), self.meter_config(pf, group)) for group in groups]
+        chunksize = max(1, len(tasks)//(4*(processes or os.cpu_count() or 1)))
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.starmap(run_subset, tasks, chunksize)
+        for sim, measurements in results:
+            self.models.update(sim.models)
+            self.t = sim.t
+            self.i = sim.i
+            if measurements:
+                pf.measurements.update(measurements)
+
+    def components(self, pf = None):
+        """ Groups the models in lists that don't exchange any value
+
+        Models measured together by a performance meter are kept in the
+        same group.
+        """
+        links = []
+        for spec in self.execution_list:
+            for input_spec in input_specs(spec):
+                if "model" in input_spec:
+                    links.append((spec["name"], input_spec["model"]))
+        if pf:
+            for mea in pf.config["measurements"]:
+                names = self.measured_models(mea)
+                links.extend(zip(names, names[1:]))
+        return connected_components([spec["name"] for spec in self.execution_list], links)
+
+    @staticmethod
+    def measured_models(measurement):
+        """ Names of the models read by the settings of a measurement """
+        return [s["object_name"] for s in measurement["settings"].values() if type(s) == dict and "object_name" in s]
+
+    def meter_config(self, pf, names):
+        """ Configuration of `pf` restricted to the measurements of some models """
+        if not pf:
+            return None
+        config = copy.deepcopy(pf.config)
+        config["measurements"] = [m for m in config["measurements"] if set(self.measured_models(m)) <= set(names)]
+        return config
+
+    def subset(self, names):
+        """ Returns a simulator running only the given models
+
+        The models are the same instances, therefore the subset should
+        not read from models left out of it.
+        """
+        sim = Simulator(None, self.dt, self.duration, record = self.record_mode, ensemble = self.ensemble, fast_forward = self.fast_forward, adaptive = self.adaptive, linear = self.linear)
+        sim.recorded = self.recorded
+        sim.ticks = self.ticks
+        sim.compiled = self.compiled
+        for spec in self.execution_list:
+            if spec["name"] in names:
+                sim.models[spec["name"]] = self.models[spec["name"]]
+                sim.update_execution_list(spec)
+        sim.schedule()
+        return sim
+
+    def compile(self):
+        """ Generates a step function fusing the calculations of every model
+
+        The function (see `simulator.utils.codegen.StepWriter`) runs a
+        whole range of cycles within a single loop, with the models'
+        equations written inline, and gives the same traces as the
+        interpreted run, which stays the reference. Once compiled, `run`
+        uses it on runs without plot nor performance meter. Functions
+        are cached per scenario, so compiling the same scenario again
+        doesn't generate a new one, and the simulator keeps its own
+        function until its plan changes (see `plan_key`), so runs don't
+        even write its source again.
+
+        Raises:
+            ValueError: if a model or an input can't be compiled, or
+                on ensembles, adaptive runs and fast-forwarded runs
+
+        Returns:
+            function: the step function, step(sim, start, stop)
+        """
+        if self.ensemble or self.adaptive or self.fast_forward or self.linear:
+            raise ValueError("Ensembles, adaptive, fast-forwarded and linear runs can't be compiled")
+        if not self.scheduled:
+            self.schedule()
+        key = self.plan_key()
+        if self.compiled_step is None or self.compiled_step[0] != key:
+            self.compiled_step = (key, step_function(self))
+        self.compiled = True
+        return self.compiled_step[1]
+
+    def plan_key(self):
+        """ What the step function of the simulator is written from
+
+        The models in execution order, with their sample times and
+        inputs, and whether each of their traces is recorded. Parameters
+        are read by the function when it's called, except the ones
+        setting its branches (e.g. a limit of None), so `set_parameter`
+        discards the function.
+        """
+        return tuple((spec["name"], self.models[spec["name"]], self.ticks[spec["name"]], repr(spec["inputs"]),
+            tuple(type(getattr(self.models[spec["name"]], variable)) for variable in self.models[spec["name"]].traces))
+            for spec in self.execution_list)
+
+    def compile_plan(self):
+        """ Compiles the execution list into a flat list of pre-bound calls
+
+        Each entry holds the model's calculate method and one resolver
+        per positional argument of it, so the loop doesn't need to walk
+        the specs on every cycle. Constants are baked into the resolvers
+        and references to other models are captured once.
+
+        The plan binds the traces held by the models, therefore it has to
+        be compiled again if those are replaced.
+        """
+        plan = []
+        for model_definition in self.execution_list:
+            model = self.models[model_definition["name"]]
+            inputs = model_definition["inputs"]
+            arguments = list(inspect.signature(model.calculate).parameters)
+            unknown = set(inputs) - set(arguments)
+            if unknown:
+                raise ValueError("Model {} got unexpected inputs".format(model_definition["name"]), unknown)
+            if arguments[:len(inputs)] != [a for a in arguments if a in inputs]:
+                raise ValueError("Inputs of model {} can't be passed positionally".format(model_definition["name"]))
+            resolvers = tuple(self.compile_input(inputs[a]) for a in arguments[:len(inputs)])
+            plan.append((model.calculate_ensemble if self.ensemble else model.calculate, resolvers))
+        return plan
+
+    def compile_input(self, input_spec):
+        """ Returns a callable without arguments that resolves an input
+
+        An input given as a list of input specs resolves to an array
+        holding the value of each of them.
+        """
+        if type(input_spec) == list:
+            if all("value" in entry for entry in input_spec):
+                return itertools.repeat(np.array([entry["value"] for entry in input_spec], dtype = float)).__next__
+            resolvers = [self.compile_input(entry) for entry in input_spec]
+            return lambda: np.array([resolve() for resolve in resolvers], dtype = float)
+        if "value" in input_spec:
+            # Input to the model is a constant defined on the specification
+            return itertools.repeat(input_spec["value"]).__next__
+        if not "model" in input_spec:
+            # Variable is to be taken from simulator module
+            source = self
+        else:
+            # Variable to be taken from a different model
+            source = self.models[input_spec["model"]]
+        value = getattr(source, input_spec["variable"])
+        if isinstance(value, Trace):
+            return functools.partial(getattr, value, "last")
+        if type(value) == list:
+            return functools.partial(operator.getitem, value, -1)
+        return functools.partial(getattr, source, input_spec["variable"])
+
     def get_model_inputs(self, model_definition):
         """ Retrieves the necessary inputs for a model to calculate its next value """
         inputs = model_definition["inputs"]
         inputs_values = {}
         for i in inputs:
-            if "value" in inputs[i]:
+            if type(inputs[i]) == list:
+                # an array holding the value of each input spec
+                inputs_values[i] = self.compile_input(inputs[i])()
+            elif "value" in inputs[i]:
                 # Input to the model is a constant defined on the specification
                 inputs_values[i] = inputs[i]["value"]
             elif not "model" in inputs[i]:
@@ -132,15 +777,30 @@ class Simulator:
 
     @staticmethod
     def get_single_value(value):
-        """ Returns the last value of a list if a list is given """
-        if type(value) == list:
+        """ Returns the last value of a list if a list (or a Trace) is given """
+        if type(value) == list or isinstance(value, Trace):
             return value[-1]
         return value
 
     def reset(self):
+        # Discard streamed traces
+        if self.recorder:
+            self.recorder.reset()
         # Reset models
         for model in self.models:
             self.models[model].reset()
         # Reset simulator
-        self.t = [0]
-        self.i = 0  # current cycle
\ No newline at end of file
+        self.t.reset()
+        self.i = 0  # current cycle
+        self.running = True
+
+def input_specs(spec):
+    """ Every input spec of a model spec, including the entries of inputs given as lists """
+    for input_spec in spec["inputs"].values():
+        yield from input_spec if type(input_spec) == list else (input_spec,)
+
+def run_subset(sim, pf_config):
+    """ Runs a simulator on a worker process of `Simulator.run_parallel` """
+    pf = PerformanceMeter(sim, pf_config) if pf_config else None
+    sim.run(None, pf)
+    return sim, pf.measurements if pf else None
@@ -1,13 +1,18 @@
 import os
 import json
 import time
+import multiprocessing
 import numpy as np
-from multiprocessing.dummy import Pool
 from functools import reduce
 from simulator.settings import simulator_settings
 from simulator.simulator import Simulator
 from simulator.utils.performance_meter import PerformanceMeter
+from simulator.tuner.cache import ResultCache
+from simulator.tuner.journal import TuningJournal
 
+# tuner of a worker process, whose simulator is reused for each of
+# its candidates (see `init_worker`)
+worker = {}
 
 class BruteTuner:
     """Brute force algorithm to try to find the best PID settings
@@ -15,6 +20,9 @@ class BruteTuner:
     This class runs multiple simulations with different PID settings
     and returns the best result found.
     """
+    # settings file, on the tuner folder of the settings
+    settings_file = "brute.json"
+
     def __init__(self):
         self.settings = self.read_settings()
         self.cost_settings = self.settings["cost"]
@@ -27,18 +35,42 @@ class BruteTuner:
         self.d_steps = self.settings.get("d_steps")
         self.steps = self.settings.get("steps")
         self.max_combinations = self.settings.get("max_combinations", 1000)
+        # worker processes, the number of CPUs by default
+        self.processes = self.settings.get("processes") or os.cpu_count() or 1
         self.p_attr_name = "Kp"
         self.i_attr_name = "Ti"
         self.d_attr_name = "Td"
         self.results = []
         self.best_result = {}
+        # simulator of the scenario, loaded once and reset for each run
+        self.template = None
+        # results of previous simulations, kept on disk
+        cache = self.settings.get("cache", {})
+        self.cache = ResultCache(cache["path"], cache.get("max_entries", 100000)) if cache.get("enabled") else None
+        # description of the simulation keying the cached results
+        self.simulation = None
+        # simulated time between two checks of a candidate's lower bound,
+        # if candidates that can't beat the best one are abandoned
+        abandon = self.settings.get("abandon", {})
+        self.abandon_period = abandon.get("period", 0.1) if abandon.get("enabled") else None
+        # screening of the candidates on short runs (successive halving)
+        halving = self.settings.get("halving", {})
+        self.halving = halving if halving.get("enabled") else None
+        # best cost of a complete simulation on the current run, shared
+        # by the worker processes
+        self.best = multiprocessing.Value("d", np.inf)
+        # results streamed to disk, from which a stopped job resumes
+        journal = self.settings.get("journal", {})
+        self.journal = TuningJournal(journal["path"], journal.get("resume", True), journal.get("period", 5.)) if journal.get("enabled") else None
+        # batches of candidates run by the job, numbered for the journal
+        self.batches = 0
 
         self.review_steps()
 
     def read_settings(self):
-        path = os.path.join(simulator_settings["path_to_settings"], "tuner", "brute.json")
+        path = os.path.join(simulator_settings["path_to_settings"], "tuner", self.settings_file)
         if not os.path.exists(path):
-            raise FileNotFoundError("Settings for the BruteTuner not found at {}".format(path))
+            raise FileNotFoundError("Settings for the {} not found at {}".format(type(self).__name__, path))
         with open(path, "r") as rf:
             settings = json.load(rf)
         return settings
@@ -71,7 +103,14 @@ class BruteTuner:
                 value_to_set = value_to_try if value_to_try >= 1 else 1
                 setattr(self, s, value_to_set)
 
-    def run(self):
+    def run(self, pool = None):
+        """ Simulates every combination of gains and keeps the best one
+
+        Args:
+            pool (multiprocessing.Pool): workers to use, created with
+                `create_pool`. If not given, workers are created for
+                this run only.
+        """
         # Check PerformanceMeter is enabled on the simulator.
         if not simulator_settings["performance_meter"]["enabled"]:
             raise ValueError("PerformanceMeter is not enabled.")
@@ -83,11 +122,16 @@ class BruteTuner:
             for i in i_to_test:
                 for d in d_to_test:
                     pid_possibilities.append([p, i, d])
-        # Adding simple parallelism
-        pool = Pool()
-        self.results = pool.starmap(self.run_sim, pid_possibilities)
-        pool.close()
-        pool.join()
+        self.best.value = np.inf
+        if self.processes > 1 and pool is None:
+            with self.create_pool() as pool:
+                self.results = self.evaluate(pool, pid_possibilities)
+        else:
+            self.results = self.evaluate(pool, pid_possibilities)
+        if self.cache is not None:
+            self.cache.evict()
+        if self.journal is not None:
+            self.journal.flush()
         # Set best result
         self.find_best()
         # Printing results
@@ -105,59 +149,269 @@ class BruteTuner:
             ))
 
     def find_best(self):
-        self.best_result = self.results[0]
-        for r in self.results:
+        # abandoned candidates only hold a lower bound of their cost
+        results = [r for r in self.results if not r["abandoned"]]
+        self.best_result = results[0]
+        for r in results:
             if r["result"] < self.best_result["result"]:
                 self.best_result = r
 
-    def run_sim(self, p, i, d):
-        # Create simulation environment.
-        duration = simulator_settings["duration"]
-        dt = simulator_settings["dt"]
-        sim = Simulator(simulator_settings["path_to_models"], dt, duration)
-        pf = PerformanceMeter(sim, simulator_settings["performance_meter"])
-        # Update PID settings.
-        for tup in [(self.p_attr_name, p), (self.i_attr_name, i), (self.d_attr_name, d)]:
-            setattr(sim.models[self.pid_name], tup[0], [tup[1]])
-        # Run simulator.
-        sim.run(None, pf)
+    def evaluate(self, pool, candidates):
+        """ Results of the candidates
+
+        With successive halving, the candidates are first simulated up
+        to the `horizon` and only the `1/eta` of them with the lowest
+        cost bounds are kept. Those carry on from where they stopped up
+        to the horizon multiplied by `eta`, and so on until it reaches
+        the duration: only the candidates left are simulated for the
+        whole duration. The others are returned as abandoned.
+
+        Args:
+            pool (multiprocessing.Pool): workers, None to run here
+            candidates (list): gains of each candidate
+        """
+        results = []
+        if self.halving:
+            horizon, eta = self.halving["horizon"], self.halving.get("eta", 3)
+            # NaN costs are the worst ones
+            score = lambda r: r["result"] if r["result"] == r["result"] else np.inf
+            while horizon < simulator_settings["duration"] and len(candidates) > 1:
+                screened = self.run_candidates(pool, [c[:3] + [horizon] + c[4:] for c in candidates])
+                ranked = sorted(range(len(candidates)), key = lambda k: score(screened[k]))
+                kept = sorted(ranked[:-(-len(candidates)//eta)])
+                # the others are left with the bound of their cost
+                for k in set(ranked) - set(kept):
+                    screened[k].pop("snapshot", None)
+                    results.append(dict(screened[k], abandoned = True))
+                candidates = [candidates[k][:3] + [None, screened[k].pop("snapshot", None)] for k in kept]
+                horizon *= eta
+        return results + self.run_candidates(pool, candidates)
+
+    def run_candidates(self, pool, candidates):
+        """ Results of the candidates, simulated here if no pool is given
+
+        With a journal, results are written as soon as they're known,
+        and those journaled by a previous run of the job are read back
+        instead of simulated again (see `TuningJournal`).
+        """
+        if self.journal is None:
+            return [r for results in self.run_chunks(pool, candidates) for r in results]
+        if self.journal.job is None:
+            self.journal.open(self.job_description())
+        batch = self.batches
+        self.batches += 1
+        records = self.journal.replay(batch, candidates)
+        # the best cost is shared as when they were simulated
+        for r in records:
+            if r["complete"]:
+                self.best.value = min(self.best.value, r["result"])
+        results = [TuningJournal.result(r) for r in records]
+        for chunk in self.run_chunks(pool, candidates[len(results):]):
+            self.journal.append(batch, len(results), chunk, self.search_state())
+            results += chunk
+        return results
+
+    def create_pool(self):
+        """ Worker processes, each one loading the scenario once (see `init_worker`) """
+        settings = {name: simulator_settings[name] for name in ["path_to_models", "dt", "duration", "performance_meter"]}
+        return multiprocessing.Pool(self.processes, init_worker, (self, settings))
+
+    def run_chunks(self, pool, candidates):
+        """ Results of the candidates, chunk by chunk and in order, as they're simulated
+
+        Without a pool each candidate is a chunk, with one the
+        candidates are sent to the workers in chunks.
+        """
+        if pool is None:
+            for c in candidates:
+                yield [self.run_sim(*c)]
+            return
+        # a few chunks per worker balance the load
+        size = max(1, -(-len(candidates)//(4*self.processes)))
+        chunks = [candidates[k:k + size] for k in range(0, len(candidates), size)]
+        yield from pool.imap(run_chunk, chunks)
+
+    def simulator(self):
+        """ Simulator of the scenario, reset to its initial state
+
+        The specs are only read the first time, later runs reuse it.
+        """
+        if self.template is None:
+            self.template = Simulator(simulator_settings["path_to_models"], simulator_settings["dt"], simulator_settings["duration"])
+        else:
+            self.template.reset()
+        return self.template
+
+    def run_sim(self, p, i, d, until = None, snapshot = None):
+        """ Result of a candidate
+
+        Simulated for the whole duration, unless `until` is given or the
+        candidate is abandoned, in which case the result is only a lower
+        bound of its cost (see `lower_bound`). A run stopped at `until`
+        returns a snapshot of its state as well, from which a later
+        call carries on if given it.
+        """
+        # Results of the same simulation run before
+        key = None if self.cache is None else self.cache.key(self.simulation_description(), [p, i, d])
+        results = None if key is None else self.cache.get(key)
+        cached = results is not None
+        abandoned = False
+        t = simulator_settings["duration"]
+        if not cached:
+            # Create simulation environment.
+            sim = self.simulator()
+            pf = PerformanceMeter(sim, simulator_settings["performance_meter"])
+            if snapshot is not None:
+                # Carry on from a previous run
+                sim.restore(snapshot, pf)
+            # Update PID settings.
+            for tup in [(self.p_attr_name, p), (self.i_attr_name, i), (self.d_attr_name, d)]:
+                setattr(sim.models[self.pid_name], tup[0], tup[1])
+            # Run simulator.
+            sim.run(None, pf, until, self.abandon_hook(pf))
+            results = pf.results()
+            abandoned = not sim.running
+            t = sim.t[-1]
+            if until is not None and not abandoned:
+                snapshot = sim.snapshot(pf)
+        complete = cached or (until is None and not abandoned)
+        if complete:
+            result = self.calculate_result(results)
+            if key is not None and not cached:
+                self.cache.put(key, results)
+            # Share the best cost with the other workers
+            with self.best.get_lock():
+                if result < self.best.value:
+                    self.best.value = result
+        else:
+            result = self.lower_bound(results, t)
         # Process result
-        return {
-            "result": self.calculate_result(pf),
+        result = {
+            "result": result,
             "settings": {
                 "p": p,
                 "i": i,
                 "d": d
-            }
+            },
+            "cached": cached,
+            "abandoned": abandoned,
+            "time": t
         }
+        if not complete and not abandoned:
+            result["snapshot"] = snapshot
+        return result
+
+    def abandon_hook(self, pf):
+        """ Stop hook of `Simulator.run` abandoning a candidate that can't beat the best one
+
+        Every `abandon_period` of simulated time, the lower bound of
+        the candidate's cost is compared to the best cost found so far,
+        by any worker.
+        """
+        if self.abandon_period is None:
+            return None
+        ticks = max(1, int(round(self.abandon_period/simulator_settings["dt"])))
+        best = self.best
+        def stop(sim):
+            return sim.i % ticks == 0 and self.lower_bound(pf.results(), sim.t[-1]) > best.value
+        return stop
+
+    def simulation_description(self):
+        """ What the results depend on besides the gains (see `ResultCache.simulation`) """
+        if self.simulation is None:
+            self.simulation = ResultCache.simulation(simulator_settings["path_to_models"],
+                simulator_settings["dt"], simulator_settings["duration"], simulator_settings["performance_meter"],
+                regulator = self.pid_name, gains = [self.p_attr_name, self.i_attr_name, self.d_attr_name])
+        return self.simulation
 
-    def calculate_result(self, pf):
-        # Getting references to the instances of performance meters
-        _overshoot = pf.measurements[self.cost_settings["overshoot"]["name"]]
-        _settling_time = pf.measurements[self.cost_settings["settling_time"]["name"]]
+    def job_description(self):
+        """ What the results of the job depend on, resuming it needs the same """
+        settings = {k: v for k, v in self.settings.items() if k not in ("quiet", "processes", "cache", "journal")}
+        return {"tuner": type(self).__name__, "settings": settings, "simulation": self.simulation_description()}
+
+    def search_state(self):
+        """ State of the search, kept on the checkpoints of the journal """
+        return {"p_range": list(self.p_range), "i_range": list(self.i_range), "d_range": list(self.d_range)}
+
+    def __getstate__(self):
+        # workers load their own simulator, and don't write the journal
+        state = self.__dict__.copy()
+        state["template"] = None
+        state["journal"] = None
+        return state
+
+    def calculate_result(self, results):
+        """ Cost of the results of the performance meters (see `PerformanceMeter.results`) """
+        # Getting results of the performance meters
+        _overshoot = results[self.cost_settings["overshoot"]["name"]]
+        _settling_time = results[self.cost_settings["settling_time"]["name"]]
         # Getting weights and penalty settings
         overshoot_weight = self.cost_settings["overshoot"]["weight"]
         settling_time_weight = self.cost_settings["settling_time"]["weight"]
         settling_time_penalty = self.cost_settings["settling_time"]["not_settled_penalty"]
         # Calculate result
-        overshoot_cost = _overshoot.max * overshoot_weight
-        settling_time_cost = _settling_time.settle_time * settling_time_weight if _settling_time.settled else settling_time_penalty
+        overshoot_cost = _overshoot["max"] * overshoot_weight
+        settling_time_cost = _settling_time["settle_time"] * settling_time_weight if _settling_time["settled"] else settling_time_penalty
         return overshoot_cost + settling_time_cost
 
+    def lower_bound(self, results, t):
+        """ Lowest cost a candidate may end with, from its results at time t
+
+        The maximum overshoot can only grow, and a loop that didn't
+        settle by t pays the penalty or settles later, once its value
+        has held for the cycles it still needs. Weights are expected to
+        be positive.
+        """
+        _overshoot = results[self.cost_settings["overshoot"]["name"]]
+        _settling_time = results[self.cost_settings["settling_time"]["name"]]
+        overshoot_weight = self.cost_settings["overshoot"]["weight"]
+        settling_time_weight = self.cost_settings["settling_time"]["weight"]
+        settling_time_penalty = self.cost_settings["settling_time"]["not_settled_penalty"]
+        overshoot_cost = _overshoot["max"] * overshoot_weight
+        if _settling_time["settled"]:
+            return overshoot_cost + _settling_time["settle_time"] * settling_time_weight
+        cycles_left = max(0, _settling_time["dx_cycles_hold"] + 1 - _settling_time["cycles_held"])
+        settle_time = t + cycles_left*simulator_settings["dt"]
+        return overshoot_cost + min(settle_time * settling_time_weight, settling_time_penalty)
+
 class RecurringBruteTuner(BruteTuner):
     def __init__(self):
         super().__init__()
         self.divider = self.settings["recurring"]["divider"]
         self.threshold = self.settings["recurring"]["threshold"]
         self.max_loop_runs = self.settings["recurring"]["max_loop_runs"]
+        # rounds run, the ranges shrinking around the best result on each
+        self.round = 0
 
     def run(self):
+        # the same workers are used on every run
+        if self.processes == 1:
+            self.run_loop(None)
+        else:
+            with self.create_pool() as pool:
+                self.run_loop(pool)
+        # Printing results
+        if not self.settings["quiet"]:
+            print("""RecurringBruteTuner finished.
+            Best result = {} with the following configuration:
+            Kp = {}
+            Ti = {}
+            Td = {}
+            """.format(
+                self.best_result["result"],
+                self.best_result["settings"]["p"],
+                self.best_result["settings"]["i"],
+                self.best_result["settings"]["d"]
+            ))
+
+    def run_loop(self, pool):
         improvement = self.threshold + 1
         runs = 0
         while improvement > self.threshold and runs < self.max_loop_runs:
+            self.round = runs
             if runs == 0:
                 # only run it once and don't calculate improvement
-                super().run()
+                super().run(pool)
                 runs += 1
             else:
                 # define new range
@@ -169,19 +423,25 @@ class RecurringBruteTuner(BruteTuner):
                     setattr(self, s[0], [new_center - new_range/2, new_center + new_range/2])
                 # calculate new best
                 old_best = self.best_result
-                super().run()
+                super().run(pool)
                 improvement = (old_best["result"] - self.best_result["result"])/old_best["result"]
-                runs += 1            
-        # Printing results
-        if not self.settings["quiet"]:
-            print("""RecurringBruteTuner finished.
-            Best result = {} with the following configuration:
-            Kp = {}
-            Ti = {}
-            Td = {}
-            """.format(
-                self.best_result["result"],
-                self.best_result["settings"]["p"],
-                self.best_result["settings"]["i"],
-                self.best_result["settings"]["d"]
-            ))
\ No newline at end of file
+                runs += 1
+
+    def search_state(self):
+        return dict(super().search_state(), round = self.round)
+
+def init_worker(tuner, settings):
+    """ Prepares a worker process of the tuner
+
+    Settings of the simulation are given by the parent, as a worker
+    may not inherit them. The scenario is loaded once, here, and reset
+    for each candidate.
+    """
+    simulator_settings.update(settings)
+    tuner.simulator()
+    worker["tuner"] = tuner
+
+def run_chunk(candidates):
+    """ Results of a chunk of candidates, on a worker process """
+    tuner = worker["tuner"]
+    return [tuner.run_sim(*c) for c in candidates]
\ No newline at end of file
@@ -0,0 +1,129 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+
+class ResultCache:
+    """ Results of the simulations of a tuner, kept on disk
+
+    Results are stored on a SQLite database, under a key made of the
+    simulation (see `key`) and the gains tried, so a simulation run once
+    is never run again, even by a later run of the tuner. Worker
+    processes may share a cache: each one opens its own connection and
+    every write is a transaction of its own, waiting up to `timeout`
+    seconds for the others.
+
+    The least recently used results are evicted once there are more
+    than `max_entries`.
+
+    Args:
+        path (str): database file, created if it doesn't exist
+        max_entries (int): results kept at most, None for no limit
+        timeout (float): seconds to wait for the database to be unlocked
+    """
+    # inserts between two checks of the number of results
+    eviction_period = 1000
+
+    def __init__(self, path, max_entries = 100000, timeout = 60.):
+        self.path = path
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.connection = None
+        # process the connection was opened by
+        self.pid = None
+        self.inserts = 0
+        with self.connect() as connection:
+            connection.execute("""CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY, value TEXT NOT NULL, used REAL NOT NULL)""")
+            connection.execute("CREATE INDEX IF NOT EXISTS results_used ON results (used)")
+
+    def connect(self):
+        """ Connection of the current process, opened on first use
+
+        A process forked from one holding a connection opens its own.
+        """
+        if self.connection is None or self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.connection = sqlite3.connect(self.path, timeout = self.timeout)
+            # readers don't wait for writers, and writers only sync the
+            # log at checkpoints (a result lost on a power cut is simulated again)
+            self.connection.execute("PRAGMA journal_mode = WAL")
+            self.connection.execute("PRAGMA synchronous = NORMAL")
+        return self.connection
+
+    @staticmethod
+    def key(simulation, gains):
+        """ Key of the result of a simulation with some gains
+
+        Args:
+            simulation (dict): everything the result depends on besides
+                the gains (see `simulation`), serializable to JSON
+            gains (list): gains tried. They're rounded to 12 significant
+                digits, so that a gain calculated twice, in a slightly
+                different way, is found again.
+        """
+        gains = [float("{:.12g}".format(g)) for g in gains]
+        text = json.dumps([simulation, gains], sort_keys = True)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    @staticmethod
+    def simulation(path_to_models, dt, duration, meter_config, **others):
+        """ Description of a simulation, used to build keys
+
+        The models are described by the contents of their spec files,
+        so editing a spec invalidates the results calculated before.
+        """
+        digest = hashlib.sha256()
+        if os.path.isdir(path_to_models):
+            for f in sorted(os.listdir(path_to_models)):
+                if f.endswith(".json"):
+                    with open(os.path.join(path_to_models, f), "rb") as rf:
+                        digest.update(f.encode() + b"\0" + rf.read() + b"\0")
+        return dict(others, models = digest.hexdigest(), dt = dt, duration = duration, meter = meter_config)
+
+    def get(self, key):
+        """ Result stored under a key, None if there is none """
+        connection = self.connect()
+        row = connection.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        with connection:
+            connection.execute("UPDATE results SET used = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        """ Stores a result, any value serializable to JSON """
+        connection = self.connect()
+        with connection:
+            connection.execute("INSERT OR REPLACE INTO results (key, value, used) VALUES (?, ?, ?)", (key, json.dumps(value), time.time()))
+        self.inserts += 1
+        if self.inserts % self.eviction_period == 0:
+            self.evict()
+
+    def evict(self):
+        """ Deletes the least recently used results beyond `max_entries` """
+        if self.max_entries is None:
+            return
+        with self.connect() as connection:
+            connection.execute("""DELETE FROM results WHERE key IN (
+                SELECT key FROM results ORDER BY used DESC LIMIT -1 OFFSET ?)""", (self.max_entries,))
+
+    def __len__(self):
+        return self.connect().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def clear(self):
+        with self.connect() as connection:
+            connection.execute("DELETE FROM results")
+
+    def close(self):
+        if self.connection is not None and self.pid == os.getpid():
+            self.evict()
+            self.connection.close()
+        self.connection = None
+
+    def __getstate__(self):
+        # connections aren't shared between processes
+        state = self.__dict__.copy()
+        state["connection"] = None
+        return state
@@ -0,0 +1,188 @@
+import os
+import sys
+import json
+import time
+import random
+
+class TuningJournal:
+    """ Results of a tuning job, streamed to disk as they're calculated
+
+    Each result is appended to a JSON Lines file as soon as it's known,
+    tagged with the batch of candidates it belongs to (each call of
+    `BruteTuner.run_candidates` is a batch) and its index in it, and a
+    checkpoint next to it (same name, ending in `.checkpoint.json`)
+    holds the state of the search and the best result so far, written
+    every `period` seconds at most. Both are safe to read while the job
+    runs (see `best`).
+
+    A job stopped before the end is resumed by running it again: the
+    batches journaled are given back in the same order instead of
+    being simulated, and the searches being deterministic (optimizers
+    use a seed), they propose the same candidates and reach the state
+    they were in, where the simulations carry on. Searches given no
+    seed use `seed`, drawn by the first run of the job and kept on its
+    checkpoint.
+
+    Args:
+        path (str): results file, created if it doesn't exist
+        resume (bool): if false, the results of a previous job on the
+            same file are deleted instead of resumed
+        period (float): seconds between two checkpoints at least, the
+            results themselves are always written at once
+    """
+    def __init__(self, path, resume = True, period = 5.):
+        self.path = path
+        self.resume = resume
+        self.period = period
+        # state of the search at the last results written, time of
+        # the last checkpoint, and whether results came after it
+        self.state = None
+        self.saved = None
+        self.unsaved = False
+        # results of the previous run of the job, by batch
+        self.batches = None
+        self.best_result = None
+        self.job = None
+        self.seed = None
+        self.simulations = 0
+
+    @property
+    def checkpoint_path(self):
+        return os.path.splitext(self.path)[0] + ".checkpoint.json"
+
+    def open(self, job):
+        """ Loads the results of a previous run of the job
+
+        Args:
+            job (dict): what the results depend on (settings of the
+                tuner and of the simulation), serializable to JSON. A
+                journal left by another job isn't resumed.
+        """
+        self.job = json.loads(json.dumps(job))
+        self.batches = {}
+        self.best_result = None
+        self.simulations = 0
+        self.seed = None
+        if self.resume and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, "r") as rf:
+                checkpoint = json.load(rf)
+            if checkpoint["job"] != self.job:
+                raise ValueError("The journal at {} belongs to another tuning job, change its path or disable resume.".format(self.path))
+            self.seed = checkpoint.get("seed")
+            for record in self.read(self.path):
+                self.batches.setdefault(record["batch"], []).append(record)
+                self.track(record)
+            self.repair()
+        else:
+            for path in [self.path, self.checkpoint_path]:
+                if os.path.exists(path):
+                    os.remove(path)
+        if self.seed is None:
+            self.seed = random.SystemRandom().getrandbits(63)
+
+    def repair(self):
+        """ Cuts a last line left half written, so that new lines start on their own """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+
+    def replay(self, batch, candidates):
+        """ Records journaled for the first candidates of a batch (see `result`) """
+        records = sorted(self.batches.pop(batch, []), key = lambda r: r["index"])[:len(candidates)]
+        for k, (record, candidate) in enumerate(zip(records, candidates)):
+            gains = [record["settings"][g] for g in "pid"]
+            if record["index"] != k or gains != [float(g) for g in candidate[:3]]:
+                raise ValueError("The journal at {} doesn't follow the search at batch {}, candidate {}.".format(self.path, batch, k))
+        return records
+
+    @staticmethod
+    def result(record):
+        """ Result of a candidate, as `BruteTuner.run_sim` returned it, from its record """
+        return {key: value for key, value in record.items() if key not in ("batch", "index", "complete")}
+
+    def append(self, batch, start, results, state):
+        """ Writes the results of candidates of a batch, from index `start`, and a checkpoint
+
+        Args:
+            state (dict): state of the search, kept on the checkpoint
+        """
+        lines = []
+        for k, result in enumerate(results):
+            # snapshots are only kept in memory
+            record = {key: value for key, value in result.items() if key != "snapshot"}
+            record.update(batch = batch, index = start + k, complete = not result["abandoned"] and "snapshot" not in result)
+            self.track(record)
+            lines.append(json.dumps(record) + "\n")
+        with open(self.path, "a") as wf:
+            wf.writelines(lines)
+            wf.flush()
+            os.fsync(wf.fileno())
+        self.unsaved = True
+        self.state = dict(state, batch = batch, done = start + len(results))
+        # the job is checked against the first one
+        if self.saved is None or time.time() - self.saved >= self.period:
+            self.checkpoint()
+
+    def flush(self):
+        """ Writes a checkpoint if results were written since the last one """
+        if self.unsaved:
+            self.checkpoint()
+
+    def checkpoint(self):
+        checkpoint = {
+            "job": self.job,
+            "seed": self.seed,
+            "state": self.state,
+            "simulations": self.simulations,
+            "best": self.best_result,
+            "updated": time.time()
+        }
+        # replaced at once, a reader never sees half a checkpoint
+        path = self.checkpoint_path + ".tmp"
+        with open(path, "w") as wf:
+            json.dump(checkpoint, wf)
+            wf.flush()
+            os.fsync(wf.fileno())
+        os.replace(path, self.checkpoint_path)
+        self.saved = time.time()
+        self.unsaved = False
+
+    def track(self, record):
+        self.simulations += 1
+        if record["complete"] and (self.best_result is None or record["result"] < self.best_result["result"]):
+            self.best_result = record
+
+    @staticmethod
+    def read(path):
+        """ Records of a results file, except a last one cut by a stopped job """
+        records = []
+        if not os.path.exists(path):
+            return records
+        with open(path, "r") as rf:
+            for line in rf:
+                if not line.endswith("\n"):
+                    break
+                records.append(json.loads(line))
+        return records
+
+    @classmethod
+    def best(cls, path):
+        """ Best complete result of a results file, None if there is none yet """
+        best = None
+        for record in cls.read(path):
+            if record["complete"] and (best is None or record["result"] < best["result"]):
+                best = record
+        return best
+
+if __name__ == "__main__":
+    # best result so far of the job journaled on the file given
+    records = TuningJournal.read(sys.argv[1])
+    best = TuningJournal.best(sys.argv[1])
+    if best is None:
+        print("{} results, none complete yet".format(len(records)))
+    else:
+        print("{} results, best = {} with Kp = {}, Ti = {}, Td = {}".format(len(records), best["result"],
+            best["settings"]["p"], best["settings"]["i"], best["settings"]["d"]))
@@ -0,0 +1,409 @@
+import numpy as np
+from scipy.special import erf
+from simulator.settings import simulator_settings
+from simulator.tuner.brute import BruteTuner
+
+class NelderMead:
+    """ Nelder-Mead simplex search on the unit cube
+
+    The four points an iteration may need (reflection, expansion and
+    both contractions) are proposed together, so that they're simulated
+    in parallel, and the one the usual rules pick replaces the worst
+    vertex. A shrink proposes the n points of the shrunk simplex.
+
+    Args:
+        x0 (np.ndarray): first vertex
+        rng (np.random.Generator): not used, the search is deterministic
+        step (float): size of the initial simplex
+        tolerance (float): the search is done once every vertex is that
+            close to the best one
+    """
+    def __init__(self, x0, rng = None, step = 0.25, tolerance = 1e-3):
+        n = len(x0)
+        # vertices that would be out of the cube are taken on the other side
+        vertices = [x0]
+        for k in range(n):
+            x = x0.copy()
+            x[k] = x[k] + step if x[k] + step <= 1 else x[k] - step
+            vertices.append(x)
+        self.tolerance = tolerance
+        self.vertices = np.array(vertices)
+        self.costs = None
+        self.proposed = "initial"
+
+    @property
+    def done(self):
+        if self.costs is None:
+            return False
+        return np.max(np.abs(self.vertices - self.vertices[0])) < self.tolerance
+
+    def ask(self):
+        if self.proposed == "initial":
+            return self.vertices.copy()
+        if self.proposed == "shrink":
+            return self.vertices[0] + 0.5*(self.vertices[1:] - self.vertices[0])
+        centroid = self.vertices[:-1].mean(axis = 0)
+        worst = self.vertices[-1]
+        steps = np.array([1., 2., 0.5, -0.5])[:, np.newaxis]
+        return np.clip(centroid + steps*(centroid - worst), 0, 1)
+
+    def tell(self, x, costs):
+        costs = np.asarray(costs, dtype = float)
+        if self.proposed == "initial":
+            self.vertices, self.costs = np.array(x), costs
+            self.proposed = None
+        elif self.proposed == "shrink":
+            self.vertices[1:], self.costs[1:] = x, costs
+            self.proposed = None
+        else:
+            reflected, expanded, outside, inside = costs
+            best, second, worst = self.costs[0], self.costs[-2], self.costs[-1]
+            if reflected < best:
+                k = 1 if expanded < reflected else 0
+            elif reflected < second:
+                k = 0
+            elif reflected < worst:
+                k = 2 if outside <= reflected else None
+            else:
+                k = 3 if inside < worst else None
+            if k is None:
+                self.proposed = "shrink"
+            else:
+                self.vertices[-1], self.costs[-1] = x[k], costs[k]
+        order = np.argsort(self.costs, kind = "stable")
+        self.vertices, self.costs = self.vertices[order], self.costs[order]
+
+class CMAES:
+    """ Covariance matrix adaptation evolution strategy on the unit cube
+
+    Each generation is a batch of `population` points, sampled around
+    the mean with the adapted covariance. Points out of the cube are
+    brought back onto its faces and taken as sampled there.
+
+    Args:
+        x0 (np.ndarray): initial mean
+        rng (np.random.Generator): source of the samples
+        sigma (float): initial step size
+        tolerance (float): the search is done once the step size along
+            the longest axis is below it
+        population (int): points by generation, at least the default
+            4 + 3 ln(n)
+    """
+    def __init__(self, x0, rng, sigma = 0.3, tolerance = 1e-3, population = None):
+        n = len(x0)
+        self.rng = rng
+        self.tolerance = tolerance
+        self.mean = np.array(x0, dtype = float)
+        self.sigma = sigma
+        self.population = max(4 + int(3*np.log(n)), population or 0)
+        mu = self.population//2
+        weights = np.log(mu + 0.5) - np.log(np.arange(1, mu + 1))
+        self.weights = weights/weights.sum()
+        self.mueff = 1/np.sum(self.weights**2)
+        self.cc = (4 + self.mueff/n)/(n + 4 + 2*self.mueff/n)
+        self.cs = (self.mueff + 2)/(n + self.mueff + 5)
+        self.c1 = 2/((n + 1.3)**2 + self.mueff)
+        self.cmu = min(1 - self.c1, 2*(self.mueff - 2 + 1/self.mueff)/((n + 2)**2 + self.mueff))
+        self.damps = 1 + 2*max(0, np.sqrt((self.mueff - 1)/(n + 1)) - 1) + self.cs
+        # expected length of a normal vector
+        self.chi = np.sqrt(n)*(1 - 1/(4*n) + 1/(21*n**2))
+        self.pc = np.zeros(n)
+        self.ps = np.zeros(n)
+        self.C = np.eye(n)
+        self.generation = 0
+
+    @property
+    def done(self):
+        return self.sigma*np.sqrt(np.max(np.linalg.eigvalsh(self.C))) < self.tolerance
+
+    def ask(self):
+        samples = self.rng.multivariate_normal(self.mean, self.sigma**2*self.C, self.population)
+        return np.clip(samples, 0, 1)
+
+    def tell(self, x, costs):
+        n = len(self.mean)
+        mu = len(self.weights)
+        order = np.argsort(costs, kind = "stable")[:mu]
+        y = (x[order] - self.mean)/self.sigma
+        step = self.weights @ y
+        self.mean = self.mean + self.sigma*step
+        self.generation += 1
+        # evolution paths
+        values, vectors = np.linalg.eigh(self.C)
+        invsqrt = vectors @ np.diag(1/np.sqrt(np.maximum(values, 1e-20))) @ vectors.T
+        self.ps = (1 - self.cs)*self.ps + np.sqrt(self.cs*(2 - self.cs)*self.mueff)*invsqrt @ step
+        hsig = np.linalg.norm(self.ps)/np.sqrt(1 - (1 - self.cs)**(2*self.generation)) < (1.4 + 2/(n + 1))*self.chi
+        self.pc = (1 - self.cc)*self.pc + hsig*np.sqrt(self.cc*(2 - self.cc)*self.mueff)*step
+        # rank one and rank mu updates of the covariance
+        rank_mu = (self.weights[:, np.newaxis]*y).T @ y
+        self.C = ((1 - self.c1 - self.cmu)*self.C + self.c1*(np.outer(self.pc, self.pc) + (1 - hsig)*self.cc*(2 - self.cc)*self.C)
+            + self.cmu*rank_mu)
+        self.C = (self.C + self.C.T)/2
+        self.sigma *= np.exp(self.cs/self.damps*(np.linalg.norm(self.ps)/self.chi - 1))
+
+class BayesianOptimization:
+    """ Bayesian optimization on the unit cube, with a Gaussian process surrogate
+
+    A Latin hypercube of `initial` points is simulated first. Then each
+    batch is made of the points of highest expected improvement under a
+    Gaussian process (Matérn 5/2 kernel) fitted to the costs simulated:
+    after each point picked, the process is told its predicted cost as
+    if it had been simulated, so the next one is picked elsewhere.
+
+    Costs are taken on a log scale above the best one, and the outliers
+    (the costs of diverging loops) are clipped, so that they don't
+    flatten the rest of the surrogate.
+
+    Args:
+        x0 (np.ndarray): first point of the initial design
+        rng (np.random.Generator): source of the samples
+        batch (int): points by batch
+        initial (int): points of the initial design, 2n + 1 by default
+        samples (int): random points the expected improvement is
+            maximized on
+    """
+    # length scales and noise levels the process is fitted with
+    length_scales = (0.05, 0.1, 0.2, 0.3, 0.5, 0.8)
+    noises = (1e-6, 1e-3, 1e-2)
+
+    def __init__(self, x0, rng, batch = 1, initial = None, samples = 2000):
+        n = len(x0)
+        self.rng = rng
+        self.batch = batch
+        self.samples = samples
+        initial = max(initial or 2*n + 1, batch)
+        # one point in each of the `initial` slices of every dimension
+        design = (np.array([rng.permutation(initial) for _ in range(n)]).T + rng.random((initial, n)))/initial
+        design[0] = x0
+        self.design = design
+        self.x = np.zeros((0, n))
+        self.costs = np.zeros(0)
+        self.done = False
+
+    def ask(self):
+        if len(self.x) == 0:
+            return self.design
+        y = self.transform(self.costs)
+        length, noise = self.fit(self.x, y)
+        x, y = self.x, y
+        picked = []
+        for _ in range(self.batch):
+            candidates = self.candidates(x, y)
+            mean, std = self.predict(x, y, candidates, length, noise)
+            k = np.argmax(self.expected_improvement(mean, std, y.min()))
+            picked.append(candidates[k])
+            # believed to cost what it's predicted to
+            x, y = np.vstack([x, candidates[k]]), np.append(y, mean[k])
+        return np.array(picked)
+
+    def tell(self, x, costs):
+        self.x = np.vstack([self.x, x])
+        self.costs = np.append(self.costs, costs)
+
+    @staticmethod
+    def transform(costs):
+        costs = np.where(np.isfinite(costs), costs, np.nan)
+        finite = costs[~np.isnan(costs)]
+        if len(finite) == 0:
+            return np.zeros(len(costs))
+        # costs that couldn't be calculated are the worst ones
+        costs = np.where(np.isnan(costs), finite.max(), costs)
+        y = np.log1p(costs - finite.min())
+        # and those of diverging loops aren't told apart
+        q1, q3 = np.percentile(y, [25, 75])
+        y = np.minimum(y, q3 + 1.5*(q3 - q1))
+        return (y - y.mean())/(y.std() or 1)
+
+    def candidates(self, x, y):
+        """ Random points of the cube, and around the best points found """
+        n = x.shape[1]
+        best = x[np.argsort(y)[:5]]
+        local = best[self.rng.integers(len(best), size = self.samples//4)] + 0.05*self.rng.standard_normal((self.samples//4, n))
+        return np.clip(np.vstack([self.rng.random((self.samples, n)), local]), 0, 1)
+
+    @staticmethod
+    def kernel(a, b, length):
+        r = np.sqrt(np.sum(((a[:, np.newaxis] - b[np.newaxis])/length)**2, axis = -1))*np.sqrt(5)
+        return (1 + r + r**2/3)*np.exp(-r)
+
+    def likelihood(self, x, y, length, noise):
+        """ Log marginal likelihood of the costs, up to a constant """
+        try:
+            L = np.linalg.cholesky(self.kernel(x, x, length) + noise*np.eye(len(x)))
+        except np.linalg.LinAlgError:
+            return -np.inf
+        alpha = np.linalg.solve(L.T, np.linalg.solve(L, y))
+        return -y @ alpha/2 - np.sum(np.log(np.diag(L)))
+
+    def fit(self, x, y):
+        """ Length scales and noise of highest marginal likelihood
+
+        The same length scale is fitted to every dimension first, then
+        the length scale of each dimension on its own, as the cost is
+        usually more sensitive to some gains than to others.
+        """
+        n = x.shape[1]
+        trials = [(np.full(n, length), noise) for length in self.length_scales for noise in self.noises]
+        best = max(trials, key = lambda t: self.likelihood(x, y, *t))
+        for k in range(n):
+            trials = []
+            for length in self.length_scales:
+                lengths = best[0].copy()
+                lengths[k] = length
+                trials.append((lengths, best[1]))
+            best = max(trials, key = lambda t: self.likelihood(x, y, *t))
+        return best
+
+    def predict(self, x, y, points, length, noise):
+        K = self.kernel(x, x, length) + noise*np.eye(len(x))
+        L = np.linalg.cholesky(K)
+        Ks = self.kernel(points, x, length)
+        alpha = np.linalg.solve(L.T, np.linalg.solve(L, y))
+        v = np.linalg.solve(L, Ks.T)
+        variance = np.maximum(1 - np.sum(v**2, axis = 0), 1e-12)
+        return Ks @ alpha, np.sqrt(variance)
+
+    @staticmethod
+    def expected_improvement(mean, std, best, xi = 0.01):
+        z = (best - xi - mean)/std
+        cdf = (1 + erf(z/np.sqrt(2)))/2
+        pdf = np.exp(-z**2/2)/np.sqrt(2*np.pi)
+        return (best - xi - mean)*cdf + std*pdf
+
+class OptimizerTuner(BruteTuner):
+    """ Searches the best PID settings with a derivative-free optimizer
+
+    Instead of a grid, the gains are searched within their ranges by
+    Nelder-Mead, CMA-ES or Bayesian optimization (see the `optimizer`
+    settings), which propose batches of candidates, simulated in
+    parallel like those of the BruteTuner, until the `budget` of
+    simulations is spent or the search converges. Gains whose range
+    is a single value aren't searched.
+    """
+    settings_file = "optimizer.json"
+    methods = {
+        "nelder_mead": NelderMead,
+        "cmaes": CMAES,
+        "bayesian": BayesianOptimization
+    }
+
+    def __init__(self):
+        super().__init__()
+        optimizer = self.settings.get("optimizer", {})
+        self.method = optimizer.get("method", "bayesian")
+        if self.method not in self.methods:
+            raise ValueError("Unknown optimizer {}, use one of {}".format(self.method, ", ".join(self.methods)))
+        self.budget = optimizer.get("budget", 50)
+        if self.budget < 1:
+            raise ValueError("The budget of the OptimizerTuner must allow one simulation at least.")
+        # candidates proposed together, one by worker by default
+        self.batch = optimizer.get("batch") or self.processes
+        self.seed = optimizer.get("seed")
+        self.initial = optimizer.get("initial")
+        self.options = optimizer.get("options", {})
+        self.ranges = [self.p_range, self.i_range, self.d_range]
+        # searched gains, the others stay at the start of their range
+        self.free = [k for k, r in enumerate(self.ranges) if r[0] != r[1]]
+        if not self.free:
+            raise ValueError("The ranges of the gains leave nothing to search.")
+        self.evaluations = 0
+
+    def gains(self, x):
+        """ Gains of a point of the unit cube """
+        gains = [float(r[0]) for r in self.ranges]
+        for k, u in zip(self.free, x):
+            gains[k] = self.ranges[k][0] + u*(self.ranges[k][1] - self.ranges[k][0])
+        return gains
+
+    def start(self):
+        """ Point of the unit cube search starts from, the middle of the ranges by default """
+        if self.initial is None:
+            return np.full(len(self.free), 0.5)
+        return np.clip([(self.initial[k] - self.ranges[k][0])/(self.ranges[k][1] - self.ranges[k][0]) for k in self.free], 0, 1)
+
+    @staticmethod
+    def cost(result):
+        """ Cost of a result told to the search
+
+        Abandoned candidates only hold a lower bound of their cost, and
+        were abandoned for being worse than the best one: they're told
+        to cost the most, as are those whose cost couldn't be
+        calculated (the Bayesian optimization takes them as the worst
+        cost simulated).
+        """
+        if result["abandoned"] or result["result"] != result["result"]:
+            return np.inf
+        return result["result"]
+
+    def job_description(self):
+        # the batch size changes the candidates proposed
+        return dict(super().job_description(), batch = self.batch)
+
+    def search_state(self):
+        return dict(super().search_state(), method = self.method, evaluations = self.evaluations, budget = self.budget)
+
+    def search(self):
+        """ Optimizer of the chosen method """
+        seed = self.seed
+        if seed is None and self.journal is not None:
+            # a resumed job proposes the candidates of its first run
+            if self.journal.job is None:
+                self.journal.open(self.job_description())
+            seed = self.journal.seed
+        rng = np.random.default_rng(seed)
+        options = dict(self.options)
+        if self.method == "cmaes":
+            options.setdefault("population", self.batch)
+        elif self.method == "bayesian":
+            options.setdefault("batch", self.batch)
+        return self.methods[self.method](self.start(), rng, **options)
+
+    def run(self, pool = None):
+        """ Simulates the candidates proposed by the optimizer and keeps the best one
+
+        Args:
+            pool (multiprocessing.Pool): workers to use, created with
+                `create_pool`. If not given, workers are created for
+                this run only.
+        """
+        if not simulator_settings["performance_meter"]["enabled"]:
+            raise ValueError("PerformanceMeter is not enabled.")
+        self.best.value = np.inf
+        if self.processes > 1 and pool is None:
+            with self.create_pool() as pool:
+                self.optimize(pool)
+        else:
+            self.optimize(pool)
+        if self.cache is not None:
+            self.cache.evict()
+        if self.journal is not None:
+            self.journal.flush()
+        self.find_best()
+        if not self.settings["quiet"]:
+            print("""OptimizerTuner ({}) finished after {} simulations.
+            Best result = {} with the following configuration:
+            Kp = {}
+            Ti = {}
+            Td = {}
+            """.format(
+                self.method,
+                self.evaluations,
+                self.best_result["result"],
+                self.best_result["settings"]["p"],
+                self.best_result["settings"]["i"],
+                self.best_result["settings"]["d"]
+            ))
+
+    def optimize(self, pool):
+        self.results = []
+        self.evaluations = 0
+        search = self.search()
+        while self.evaluations < self.budget and not search.done:
+            x = search.ask()
+            # a batch over the budget is cut, and ends the search
+            x = x[:self.budget - self.evaluations]
+            results = self.run_candidates(pool, [self.gains(u) for u in x])
+            self.results += results
+            self.evaluations += len(x)
+            if self.evaluations < self.budget:
+                search.tell(x, [self.cost(r) for r in results])
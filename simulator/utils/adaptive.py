@@ -0,0 +1,206 @@
+import copy
+import warnings
+import numpy as np
+from ..models.base import BaseModel
+
+class AdaptiveStep:
+    """ Chooses the steps of an adaptive run
+
+    Steps last a whole number of cycles. Continuous models (see
+    `BaseModel.continuous`) are calculated on every step, with a step
+    length grown or shrunk so that their estimated error stays within
+    tolerance. Other models are calculated on the cycles they're due,
+    which end the step before: every multiple of their sample time,
+    unless their outputs hold longer (see `BaseModel.held_until`). On
+    the steps they aren't calculated, their traces hold their values.
+    Calculated after continuous models reading them, e.g. a PID closing
+    a loop, they only feed them on the next step, so the step they're
+    calculated on is the shortest one.
+
+    A step whose estimated error exceeds the tolerance is rejected: the
+    continuous models, and the models reading what they calculate on
+    the step, go back to their state before it and calculate it again
+    with a shorter length, down to the minimum step.
+
+    The tolerance bounds the error of each step, estimated by the models
+    with step doubling (see `first_order_error`), and the errors of the
+    steps add up. Steps pay off on continuous models driven by inputs
+    that hold, e.g. the segments of a signal generator. Chains of
+    continuous models read one another's outputs as inputs held during
+    the step, and loops closed by a discrete model cut the steps where
+    it's calculated, so they gain little over fixed steps, if anything.
+    A model calculated on every cycle keeps every step to one cycle,
+    which is warned about.
+
+    Args:
+        sim (Simulator): simulator being run
+        plan (list): compiled plan of the simulator
+        start (int): first cycle to run
+    """
+    # bounds of the change of the step length from a step to the next
+    max_growth = 2.
+    max_shrink = 0.2
+    safety = 0.9
+
+    def __init__(self, sim, plan, start):
+        settings = sim.adaptive
+        self.sim = sim
+        self.tolerance = settings["tolerance"]
+        self.min_cycles = max(1, int(round(settings.get("min_step", sim.dt)/sim.dt)))
+        self.max_cycles = max(self.min_cycles, int(settings["max_step"]/sim.dt))
+        self.names = [spec["name"] for spec in sim.execution_list]
+        self.plan = plan
+        self.continuous = []
+        self.discrete = []
+        for name in self.names:
+            model = sim.models[name]
+            if model.continuous:
+                if sim.ticks[name] != 1:
+                    raise ValueError("Continuous model {} can't have a sample time on adaptive runs".format(name))
+                model.estimate_error = True
+                self.continuous.append(model)
+            else:
+                self.discrete.append(name)
+                if sim.ticks[name] == 1 and type(model).held_until is BaseModel.held_until:
+                    warnings.warn("Model {} is calculated on every cycle, adaptive steps won't last longer, give it a sample time".format(name))
+        # models calculated again when a step is redone: the continuous
+        # ones and the ones reading values they calculate on the step.
+        # Discrete models calculated after continuous ones reading them
+        # feed them back only on the next step.
+        self.redone = set()
+        self.fed_back = set()
+        read = set()
+        for spec in sim.execution_list:
+            name = spec["name"]
+            inputs = [entry for value in spec["inputs"].values() for entry in (value if type(value) == list else [value])]
+            if sim.models[name].continuous:
+                read.update(entry.get("model") for entry in inputs)
+            if sim.models[name].continuous or any(entry.get("model") in self.redone
+                    and entry["variable"] not in sim.models[entry["model"]].delayed_outputs for entry in inputs):
+                self.redone.add(name)
+            elif name in read:
+                self.fed_back.add(name)
+        self.traces = {name: [getattr(sim.models[name], v) for v in sim.models[name].traces] for name in self.discrete}
+        # cycle each discrete model has to be calculated on next
+        self.due = {name: self.align(start, sim.ticks[name]) for name in self.discrete}
+        self.calculated = set()
+        self.plans = {}
+        # part of the plan of the step calculated again if it's redone,
+        # and the state of those models before the step: their traces
+        # and the objects they hold (e.g. integrators), which are copied
+        self.redo_plan = []
+        self.saved = []
+        self.state = {}
+        for name in self.redone:
+            model = sim.models[name]
+            self.state[name] = (model, [getattr(model, variable) for variable in model.traces],
+                [key for key, value in vars(model).items() if key not in model.traces and hasattr(value, "__dict__")])
+        self.step = self.min_cycles
+
+    @staticmethod
+    def align(cycle, ticks):
+        """ First multiple of `ticks` from `cycle` on """
+        return -(-cycle//ticks)*ticks
+
+    def next(self, i, stop):
+        """ Returns the plan of the step starting on cycle `i` and its number of cycles """
+        models = self.sim.models
+        calculated = []
+        for name in self.discrete:
+            if self.due[name] == i:
+                calculated.append(name)
+                model = models[name]
+                # events are taken with the shortest step, as the error
+                # estimated so far doesn't account for them
+                if model.next_event(i) == i:
+                    self.step = self.min_cycles
+                until = model.held_until(i)
+                self.due[name] = float("inf") if until is None else self.align(until, self.sim.ticks[name])
+        self.calculated = set(calculated)
+        cycles = min(self.step, stop - i, min(self.due.values(), default = stop) - i)
+        # the continuous models read the new values of a model fed back
+        # on the cycle after, as on fixed steps, not a whole step after
+        if self.fed_back.intersection(calculated):
+            cycles = min(cycles, self.min_cycles)
+        cycles = max(1, int(cycles))
+        for model in self.continuous:
+            model.dt = cycles*self.sim.dt
+        key = tuple(calculated)
+        plans = self.plans.get(key)
+        if plans is None:
+            names = [name for name in self.names if name in self.calculated or models[name].continuous]
+            step_plan = [entry for entry, name in zip(self.plan, self.names) if name in names]
+            redone = [name for name in names if name in self.redone]
+            redo_plan = [entry for entry, name in zip(self.plan, self.names) if name in redone]
+            plans = self.plans[key] = (step_plan, redo_plan, redone)
+        step_plan, self.redo_plan, redone = plans
+        # the shortest steps are never redone
+        if cycles > self.min_cycles:
+            self.save(redone)
+        return step_plan, cycles
+
+    def save(self, names):
+        """ Keeps the state of the models before the step, to redo it (see `restore`) """
+        self.saved = []
+        for name in names:
+            model, traces, held = self.state[name]
+            attributes = vars(model).copy()
+            for key in held:
+                attributes[key] = copy.copy(attributes[key])
+            self.saved.append((name, attributes, [trace.mark() for trace in traces]))
+
+    def restore(self):
+        """ Brings the models saved back to their state before the step """
+        for name, attributes, marks in self.saved:
+            model, traces, held = self.state[name]
+            for trace, mark in zip(traces, marks):
+                trace.rewind(mark)
+            vars(model).update(attributes)
+            # copies, as the step may change the objects again
+            for key in held:
+                setattr(model, key, copy.copy(attributes[key]))
+
+    def hold(self, i, cycles):
+        """ Appends the values held by the discrete models not calculated on the step """
+        for name in self.discrete:
+            ticks = self.sim.ticks[name]
+            # values are kept for every step or, with a sample time, for
+            # every multiple of it
+            count = 1 if ticks == 1 else (i + cycles - 1)//ticks - (i - 1)//ticks
+            if name in self.calculated:
+                count -= 1
+            if count == 1:
+                for trace in self.traces[name]:
+                    trace.append(trace.last)
+            elif count > 1:
+                for trace in self.traces[name]:
+                    trace.extend(np.full((count,) + np.shape(trace.last), trace.last))
+
+    def control(self, cycles):
+        """ Accepts the last step or redoes it shorter, and chooses the length of the next one
+
+        Returns:
+            int: cycles of the step accepted
+        """
+        while True:
+            error = max([model.local_error for model in self.continuous], default = 0.)
+            if error > 0:
+                # the error grows with the square of the step
+                factor = min(self.max_growth, max(self.max_shrink, self.safety*(self.tolerance/error)**0.5))
+            else:
+                factor = self.max_growth
+            step = int(cycles*factor) if factor < 1 else max(cycles + 1, int(cycles*factor))
+            if error <= self.tolerance or cycles <= self.min_cycles:
+                break
+            # rejected, the next step starts from the length redone
+            self.restore()
+            cycles = self.step = max(self.min_cycles, min(step, cycles - 1))
+            for model in self.continuous:
+                model.dt = cycles*self.sim.dt
+            for calculate, resolvers in self.redo_plan:
+                calculate(*[resolve() for resolve in resolvers])
+        # a step shortened to hit a due model doesn't shrink the next one
+        if error <= self.tolerance:
+            step = max(step, self.step)
+        self.step = min(max(step, self.min_cycles), self.max_cycles)
+        return cycles
@@ -0,0 +1,337 @@
+import hashlib
+import numpy as np
+from ..models.signal_generator import SignalGenerator
+from ..models.rc import RC
+from ..models.rl import RL, RLLimitedVr
+from ..models.pid import PID, PIDLimitedMV, PIDLimitedIntegral
+from .history import LatestValue
+from .numerical_analysis import FIRST_ORDER_POLES
+
+# step functions already compiled, by hash of their source
+_cache = {}
+
+# segments of a signal generator: what each cycle does to the value
+HOLD, SET, ADD, SUBTRACT = 0, 1, 2, 3
+SEGMENTS = {"pause": HOLD, "step": SET, "ramp_up": ADD, "ramp_down": SUBTRACT}
+
+def step_function(sim):
+    """ Returns the step function of the models loaded on a simulator
+
+    The function runs the cycles `start` to `stop - 1` of the simulator:
+    `step(sim, start, stop)`. See `StepWriter` for how it's built.
+    Functions are cached, so simulators of the same scenario share them.
+    """
+    source = StepWriter(sim).source()
+    key = hashlib.sha1(source.encode()).hexdigest()
+    function = _cache.get(key)
+    if function is None:
+        namespace = {"store": store, "signal_events": signal_events, "signal_segment": signal_segment, "FIRST_ORDER_POLES": FIRST_ORDER_POLES}
+        exec(compile(source, "<step {}>".format(key[:8]), "exec"), namespace)
+        function = namespace["step"]
+        function.source = source
+        _cache[key] = function
+    return function
+
+def store(trace, values, last):
+    """ Appends the values calculated by a step function to a trace """
+    trace.extend(np.array(values, dtype = float))
+    trace.last = np.nan if last is None else last
+
+def signal_segment(event):
+    """ Segment started by an event of a signal generator: (event, kind, value) """
+    if not event:
+        return event, HOLD, None
+    key = list(event)[0]
+    return event, SEGMENTS[key], event[key].get("value")
+
+def signal_events(model):
+    """ Segments of a signal generator by the cycle they start on """
+    return {cycle: signal_segment(event) for cycle, event in model.events_by_cycle.items()}
+
+class StepWriter:
+    """ Writes the source of a fused step function for a simulator
+
+    The calculations of the models, in the order of the execution list,
+    are written inline within a single loop over the cycles: values are
+    kept on local variables and the values of the recorded traces are
+    collected on lists, which are appended to the traces at the end.
+    The models' parameters and state are read at the start and the
+    state is written back at the end, so the models can be run either
+    way afterwards.
+
+    Each class has an emitter method (see `EMITTERS`) reproducing the
+    operations of its `calculate` one by one, so both ways give the
+    same values. Subclasses of those classes, which may override the
+    calculation, aren't compiled.
+
+    Raises:
+        ValueError: if a model or an input can't be compiled
+    """
+    EMITTERS = {
+        SignalGenerator: "signal_generator",
+        RC: "rc",
+        RL: "rl",
+        RLLimitedVr: "rl_limited_vr",
+        PID: "pid",
+        PIDLimitedMV: "pid_limited_mv",
+        PIDLimitedIntegral: "pid_limited_integral",
+    }
+
+    def __init__(self, sim):
+        self.sim = sim
+        self.prefixes = {name: "m{}".format(k) for k, name in enumerate(sim.models)}
+        self.prologue = []
+        self.body = []
+        self.epilogue = []
+        # traces loaded on locals: (prefix, variable) -> recorded
+        self.loaded = {}
+        for name, p in self.prefixes.items():
+            self.prologue.append("{} = models[{!r}]".format(p, name))
+        for spec in sim.execution_list:
+            name = spec["name"]
+            model = sim.models[name]
+            emitter = self.EMITTERS.get(type(model))
+            if emitter is None:
+                raise ValueError("Model {} of class {} can't be compiled".format(name, type(model).__name__))
+            p = self.prefixes[name]
+            self.prologue.append("# {}".format(name))
+            self.indent = 1
+            self.line("# {}".format(name))
+            ticks = sim.ticks[name]
+            if ticks != 1:
+                self.line("if i % {} == 0:".format(ticks))
+                self.indent = 2
+            inputs = {}
+            for argument, input_spec in spec["inputs"].items():
+                inputs[argument] = "{}_in_{}".format(p, argument)
+                self.line("{} = {}".format(inputs[argument], self.input(input_spec)))
+            getattr(self, "emit_" + emitter)(p, model, inputs)
+
+    def source(self):
+        lines = ["def step(sim, start, stop):",
+            "    models = sim.models",
+            "    dt = sim.dt",
+            "    t = sim.t.last",
+            "    t_values = []",
+            "    t_append = t_values.append"]
+        lines += ["    " + line for line in self.prologue]
+        lines.append("    for i in range(start, stop):")
+        lines += ["    " + line for line in self.body]
+        lines += ["        t = t + dt", "        t_append(t)",
+            "    store(sim.t, t_values, t)"]
+        lines += ["    " + line for line in self.epilogue]
+        lines.append("    sim.i = stop - 1")
+        return "\n".join(lines) + "\n"
+
+    def line(self, code):
+        """ Adds a line to the body of the loop, within the current block """
+        self.body.append("    "*self.indent + code)
+
+    def input(self, input_spec):
+        """ Expression of the value of an input """
+        if "value" in input_spec:
+            value = input_spec["value"]
+            if type(value) not in (int, float) or value != value or value in (float("inf"), float("-inf")):
+                raise ValueError("Constant input {!r} can't be compiled".format(value))
+            return repr(value)
+        variable = input_spec["variable"]
+        if not "model" in input_spec:
+            if variable not in ("i", "t"):
+                raise ValueError("Input {} of the simulator can't be compiled".format(variable))
+            return variable
+        model = self.sim.models[input_spec["model"]]
+        if variable not in model.traces:
+            raise ValueError("Input {}.{} isn't a trace".format(input_spec["model"], variable))
+        return self.load(self.prefixes[input_spec["model"]], variable)
+
+    def load(self, p, variable):
+        """ Keeps a trace on a local variable, returns its name """
+        local = "{}_{}".format(p, variable)
+        if (p, variable) not in self.loaded:
+            recorded = type(getattr(self.sim.models[self.name(p)], variable)) != LatestValue
+            self.loaded[(p, variable)] = recorded
+            self.prologue.append("{} = {}.{}.last".format(local, p, variable))
+            if recorded:
+                self.prologue.append("{0}_values = []".format(local))
+                self.prologue.append("{0}_append = {0}_values.append".format(local))
+                self.epilogue.append("store({}.{}, {}_values, {})".format(p, variable, local, local))
+            else:
+                self.epilogue.append("{}.{}.append({})".format(p, variable, local))
+        return local
+
+    def name(self, p):
+        return next(name for name, prefix in self.prefixes.items() if prefix == p)
+
+    def append(self, p, variable, expression = None):
+        """ Appends a value to a trace, by default the one on its local variable """
+        local = self.load(p, variable)
+        if expression is not None:
+            self.line("{} = {}".format(local, expression))
+        if self.loaded[(p, variable)]:
+            self.line("{}_append({})".format(local, local))
+
+    def replace(self, p, variable, expression):
+        """ Replaces the latest value of a trace, as trace[-1] = value """
+        local = self.load(p, variable)
+        self.line("{} = {}".format(local, expression))
+        if self.loaded[(p, variable)]:
+            self.line("{}_values[-1] = {}".format(local, local))
+
+    def parameter(self, p, attribute):
+        """ Reads an attribute of a model on the prologue, returns its local """
+        local = "{}_{}".format(p, attribute.replace(".", "_"))
+        self.prologue.append("{} = {}.{}".format(local, p, attribute))
+        return local
+
+    def state(self, p, attribute):
+        """ Like `parameter`, also writing the attribute back at the end """
+        local = self.parameter(p, attribute)
+        self.epilogue.append("{}.{} = {}".format(p, attribute, local))
+        return local
+
+    # emitters, one per class
+    def emit_signal_generator(self, p, model, inputs):
+        for el in model.events:
+            for key, settings in el.items():
+                if type(settings) == dict and "cycle" in settings and list(el)[0] not in SEGMENTS:
+                    raise ValueError("Event {} can't be compiled".format(key))
+        if model.current_event and list(model.current_event)[0] not in SEGMENTS:
+            raise ValueError("Event {} can't be compiled".format(list(model.current_event)[0]))
+        cycle = inputs["cycle"]
+        value = self.load(p, "current_value")
+        self.prologue.append("{0}_initial = {0}.initial_value".format(p))
+        self.prologue.append("{0}_events = signal_events({0})".format(p))
+        self.prologue.append("{0}_event, {0}_kind, {0}_value = signal_segment({0}.current_event)".format(p))
+        self.epilogue.append("{0}.current_event = {0}_event".format(p))
+        self.line("if {} == 0:".format(cycle))
+        self.line("    {} = {}_initial".format(value, p))
+        self.line("else:")
+        self.line("    if {} in {}_events:".format(cycle, p))
+        self.line("        {0}_event, {0}_kind, {0}_value = {0}_events[{1}]".format(p, cycle))
+        self.line("    if {}_kind == {}:".format(p, SET))
+        self.line("        {} = {}_value".format(value, p))
+        self.line("    elif {}_kind == {}:".format(p, ADD))
+        self.line("        {0} = {0} + {1}_value".format(value, p))
+        self.line("    elif {}_kind == {}:".format(p, SUBTRACT))
+        self.line("        {0} = {0} - {1}_value".format(value, p))
+        self.append(p, "current_value")
+
+    def emit_rc(self, p, model, inputs):
+        Vin = inputs["Vin"]
+        dt, R, C = (self.parameter(p, a) for a in ("dt", "R", "C"))
+        Q, Q1 = self.load(p, "Q"), self.load(p, "Q1")
+        self.append(p, "Vc", "{}/{}".format(Q, C))
+        self.append(p, "Vr", "{} - {}_Vc".format(Vin, p))
+        self.append(p, "i", "{}_Vr/{}".format(p, R))
+        if model.integrator == "euler":
+            self.append(p, "Q", "{dt}*((1/{R})*({Vin}-(1/{C})*{Q1}))+{Q1}".format(dt = dt, R = R, C = C, Vin = Vin, Q1 = Q1))
+        else:
+            self.first_order_step(p, model, "Q", Q1, "{}*{}".format(C, Vin), "{}/({}*{})".format(dt, R, C))
+        self.append(p, "Q1", Q)
+        self.append(p, "Vin", Vin)
+
+    def emit_rl(self, p, model, inputs):
+        Vin = inputs["Vin"]
+        dt, R, L = (self.parameter(p, a) for a in ("dt", "R", "L"))
+        i, i1 = self.load(p, "i"), self.load(p, "i1")
+        self.append(p, "Vr", "{}*{}".format(i, R))
+        self.append(p, "Vl", "{} - {}_Vr".format(Vin, p))
+        if model.integrator == "euler":
+            self.append(p, "i", "{}*{}_Vl/{} + {}".format(dt, p, L, i1))
+        else:
+            self.first_order_step(p, model, "i", i1, "{}/{}".format(Vin, R), "{}*{}/{}".format(dt, R, L))
+        self.append(p, "i1", i)
+        self.append(p, "Vin", Vin)
+
+    def emit_rl_limited_vr(self, p, model, inputs):
+        self.emit_rl(p, model, inputs)
+        max_Vr = self.parameter(p, "max_Vr")
+        Vr, Rd, Vrd = (self.load(p, v) for v in ("Vr", "Rd", "Vrd"))
+        self.line("if {} > {}:".format(Vr, max_Vr))
+        self.indent += 1
+        self.line("{} = {} - {}".format(Vrd, Vr, max_Vr))
+        self.line("{} = {}/{}_i".format(Rd, Vrd, p))
+        self.replace(p, "Vr", max_Vr)
+        self.indent -= 1
+        self.line("else:")
+        self.line("    {} = 0.".format(Rd))
+        self.line("    {} = 0.".format(Vrd))
+        self.append(p, "Rd")
+        self.append(p, "Vrd")
+
+    def first_order_step(self, p, model, variable, x, x_ss, h):
+        """ Inlines `first_order_step`, calling the same pole function """
+        pole = "{}_pole".format(p)
+        self.prologue.append("{} = FIRST_ORDER_POLES[{}.integrator]".format(pole, p))
+        self.line("{}_x_ss = {}".format(p, x_ss))
+        self.append(p, variable, "{0}_x_ss + {1}({2})*({3} - {0}_x_ss)".format(p, pole, h, x))
+
+    def pid_actions(self, p, inputs, differentiated):
+        """ Writes error, PG, IG and the derivative of `differentiated`, returns their locals """
+        dt, Kp, Ti, Td = (self.parameter(p, a) for a in ("dt", "Kp", "Ti", "Td"))
+        I_m0, I_y0, D_y0 = (self.state(p, a) for a in ("I.m0", "I.y0", "D.y0"))
+        error = "{}_e".format(p)
+        self.line("{} = {} - {}".format(error, inputs["SP"], inputs["PV"]))
+        self.line("{0}_PG_ = {1}*{2}".format(p, Kp, error))
+        # DumbIntegrator
+        self.line("{}_y0 = {} if {} else {}".format(p, I_y0, I_y0, error))
+        self.line("{} = {} + {}*(({}_y0 + {})/2)".format(I_m0, I_m0, dt, p, error))
+        self.line("{} = {}".format(I_y0, error))
+        self.line("{}_IG_ = {}*{}/{}".format(p, I_m0, Kp, Ti))
+        # DumbDifferentiator
+        x = inputs["PV"] if differentiated == "PV" else error
+        self.line("{}_y0 = {} if {} else {}".format(p, D_y0, D_y0, x))
+        self.line("{}_DG_ = ({} - {}_y0)/{}*{}*{}".format(p, x, p, dt, Kp, Td))
+        self.line("{} = {}".format(D_y0, x))
+        return Kp, Ti, error
+
+    def emit_pid(self, p, model, inputs):
+        self.pid_actions(p, inputs, "error")
+        self.line("{0}_MV_ = {0}_PG_ + {0}_IG_ + {0}_DG_ + {1}".format(p, inputs["FWD"]))
+        self.append(p, "error", "{}_e".format(p))
+        for variable in ("PG", "IG", "DG", "MV"):
+            self.append(p, variable, "{}_{}_".format(p, variable))
+
+    def emit_pid_limited_mv(self, p, model, inputs):
+        self.emit_pid(p, model, inputs)
+        MV = self.load(p, "MV")
+        branch = "if"
+        for limit, comparison in (("max_MV", ">"), ("min_MV", "<")):
+            if getattr(model, limit) is not None:
+                local = self.parameter(p, limit)
+                self.line("{} {} {} {}:".format(branch, MV, comparison, local))
+                self.indent += 1
+                self.replace(p, "MV", local)
+                self.indent -= 1
+                branch = "elif"
+
+    def emit_pid_limited_integral(self, p, model, inputs):
+        Kp, Ti, error = self.pid_actions(p, inputs, "PV" if model.differ_on_PV else "error")
+        FWD = inputs["FWD"]
+        # DeadBand
+        db, offset = self.parameter(p, "db.db"), self.parameter(p, "db.offset")
+        self.line("if {0}_DG_ > {1} + {2}:".format(p, offset, db))
+        self.line("    {0}_DG_ = {0}_DG_ - {1}".format(p, db))
+        self.line("elif {0}_DG_ < {1} - {2}:".format(p, offset, db))
+        self.line("    {0}_DG_ = {0}_DG_ + {1}".format(p, db))
+        self.line("else:")
+        self.line("    {}_DG_ = {}".format(p, offset))
+        self.line("{0}_MV_ = {0}_PG_ + {0}_IG_ + {0}_DG_ + {1}".format(p, FWD))
+        # anti-windup
+        limits = [(limit, comparison) for limit, comparison in (("max_MV", ">"), ("min_MV", "<")) if getattr(model, limit) is not None]
+        if limits:
+            self.line("{}_wound = False".format(p))
+        for limit, comparison in limits:
+            local = self.parameter(p, limit)
+            self.line("if {}_MV_ {} {}:".format(p, comparison, local))
+            self.line("    {}_MV_ = {}".format(p, local))
+            self.line("    {}_wound = True".format(p))
+        if limits:
+            self.line("if {}_wound:".format(p))
+            self.line("    {0}_IG_ = {0}_MV_ - {0}_PG_ - {0}_DG_ - {1}".format(p, FWD))
+            self.line("    {0}_I_m0 = {0}_IG_*{1}/{2}".format(p, Ti, Kp))
+        self.append(p, "error", error)
+        for variable in ("PG", "IG", "DG", "MV"):
+            self.append(p, variable, "{}_{}_".format(p, variable))
+        self.append(p, "SP", inputs["SP"])
+        self.append(p, "PV", inputs["PV"])
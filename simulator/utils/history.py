@@ -0,0 +1,322 @@
+import numpy as np
+
+class Trace:
+    """ History of a variable stored in a preallocated float64 buffer
+
+    It offers the same access the models' lists used to offer: new
+    values are appended, trace[-1] is the latest value and the whole
+    history is available through values() (or numpy.asarray(trace)).
+    None is stored as NaN. If more values than the preallocated
+    capacity are appended, the buffer grows.
+
+    Args:
+        capacity (int): number of values to preallocate
+        values (iterable): initial values of the trace
+        shape (tuple): shape of each value, e.g. (N,) for a variable
+            of N scenarios simulated at once. Scalars appended to such
+            a trace are broadcast.
+    """
+    def __init__(self, capacity, values = (), shape = ()):
+        values = np.array(list(values), dtype = float)
+        if shape and values.ndim == 1:
+            values = values.reshape((-1,) + (1,)*len(shape))
+        self.shape = shape
+        self.buffer = np.empty((max(capacity, len(values), 1),) + shape)
+        self.buffer[:len(values)] = values
+        self.n = len(values)
+        # latest value kept as a Python object for fast access
+        self.last = self.stored(self.n - 1) if self.n else None
+        # values kept through a reset
+        self.initial = self.n
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        return iter(self.buffer[:self.n].tolist())
+
+    def __array__(self, dtype = None, copy = None):
+        return self.values() if dtype is None else self.values().astype(dtype)
+
+    def __getitem__(self, index):
+        if index == -1 and self.n:
+            return self.last
+        if type(index) == int:
+            if index < 0:
+                index += self.n
+            if index < 0 or index >= self.n:
+                raise IndexError("Trace index out of range")
+            return self.stored(index)
+        return self.values()[index]
+
+    def __setitem__(self, index, value):
+        if type(index) == int:
+            if index < 0:
+                index += self.n
+            if index < 0 or index >= self.n:
+                raise IndexError("Trace index out of range")
+            if index == self.n - 1:
+                self.last = value
+        self.values()[index] = value
+
+    def append(self, value):
+        n = self.n
+        if value is None:
+            value = np.nan
+        try:
+            self.buffer[n] = value
+        except IndexError:
+            self.buffer = np.concatenate((self.buffer, np.empty_like(self.buffer)))
+            self.buffer[n] = value
+        self.n = n + 1
+        self.last = value
+
+    def extend(self, values):
+        """ Appends an array of values at once """
+        n = self.n
+        count = len(values)
+        if count == 0:
+            return
+        while n + count > len(self.buffer):
+            self.buffer = np.concatenate((self.buffer, np.empty_like(self.buffer)))
+        self.buffer[n:n + count] = values
+        self.n = n + count
+        self.last = self.stored(self.n - 1)
+
+    def mark(self):
+        """ Position of the trace, to go back to with `rewind` """
+        return self.n, self.last
+
+    def rewind(self, mark):
+        """ Drops the values appended since `mark` was taken """
+        self.n, self.last = mark
+
+    def values(self):
+        """ Returns a view of the stored values """
+        return self.buffer[:self.n]
+
+    def stored(self, index):
+        """ Returns a copy of the value stored at a non-negative index """
+        if self.shape:
+            return self.buffer[index].copy()
+        return self.buffer.item(index)
+
+    def reset(self):
+        """ Drops every value appended after the initial ones """
+        self.n = self.initial
+        self.last = self.stored(self.n - 1) if self.n else None
+
+    @property
+    def nbytes(self):
+        return self.buffer.nbytes
+
+    def __getstate__(self):
+        # only the stored values are copied, not the whole buffer
+        state = self.__dict__.copy()
+        state["buffer"] = self.values().copy()
+        state["capacity"] = len(self.buffer)
+        return state
+
+    def __setstate__(self, state):
+        values = state.pop("buffer")
+        capacity = state.pop("capacity")
+        self.__dict__.update(state)
+        self.buffer = np.empty((capacity,) + values.shape[1:])
+        self.buffer[:len(values)] = values
+
+class WindowedTrace(Trace):
+    """ Trace keeping only a window of the latest values in memory
+
+    Values that fall out of the window are handed to `writer` in
+    chunks, so the memory used doesn't depend on how many values
+    are appended. Indexing and values() only reach the values still
+    in memory.
+
+    Args:
+        window (int): minimum number of values kept in memory
+        chunk (int): number of values written at once
+        writer (callable): receives the arrays of values to be stored.
+            They are views of the buffer, only valid during the call.
+        values (iterable): initial values of the trace
+        shape (tuple): shape of each value
+    """
+    def __init__(self, window, chunk, writer, values = (), shape = ()):
+        super().__init__(window + chunk, values, shape)
+        self.window = window
+        self.writer = writer
+        self.initial_values = self.values().copy()
+        # values at the start of the buffer already given to the writer
+        self.written = 0
+        # values dropped from memory
+        self.offset = 0
+
+    def append(self, value):
+        if self.n == len(self.buffer):
+            self.spill()
+        super().append(value)
+
+    def extend(self, values):
+        while len(values):
+            if self.n == len(self.buffer):
+                self.spill()
+            space = len(self.buffer) - self.n
+            super().extend(values[:space])
+            values = values[space:]
+
+    def spill(self):
+        """ Writes pending values and keeps only the window in memory """
+        self.flush()
+        start = self.n - self.window
+        self.buffer[:self.window] = self.buffer[start:self.n]
+        self.offset += start
+        self.n = self.window
+        self.written = self.window
+
+    def flush(self):
+        """ Writes the values not yet given to the writer """
+        if self.n > self.written:
+            self.writer(self.buffer[self.written:self.n])
+            self.written = self.n
+
+    def mark(self):
+        # values may have been dropped from memory since
+        return self.total, self.last
+
+    def rewind(self, mark):
+        total, last = mark
+        n = self.n - (self.total - total)
+        if n < self.written:
+            raise ValueError("Values already written can't be dropped")
+        self.n, self.last = n, last
+
+    def reset(self):
+        self.buffer[:self.initial] = self.initial_values
+        self.written = 0
+        self.offset = 0
+        super().reset()
+
+    @property
+    def total(self):
+        """ Number of values appended since the start, including the ones on disk """
+        return self.offset + self.n
+
+class LatestValue(Trace):
+    """ Stand-in for the trace of a variable that isn't recorded
+
+    Only the latest value is kept, which is all the models need to
+    calculate their next value, so appending doesn't allocate memory.
+
+    Args:
+        values (iterable): initial values, only the last one is kept
+    """
+    def __init__(self, values = ()):
+        values = list(values)
+        self.initial_value = np.nan if not values or values[-1] is None else values[-1]
+        self.last = self.initial_value
+
+    def __len__(self):
+        return 1
+
+    def __iter__(self):
+        return iter([self.last])
+
+    def __getitem__(self, index):
+        # slices cover the values kept, the latest one
+        if type(index) == slice:
+            return self.values()[index]
+        if index != -1:
+            raise IndexError("Only the latest value of the variable is kept")
+        return self.last
+
+    def __setitem__(self, index, value):
+        if index != -1:
+            raise IndexError("Only the latest value of the variable is kept")
+        self.last = value
+
+    def append(self, value):
+        self.last = np.nan if value is None else value
+
+    def extend(self, values):
+        if len(values):
+            self.append(values[-1])
+
+    def mark(self):
+        return self.last
+
+    def rewind(self, mark):
+        self.last = mark
+
+    def values(self):
+        return np.array([self.last], dtype = float)
+
+    def reset(self):
+        self.last = self.initial_value
+
+    def __getstate__(self):
+        return self.__dict__
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+    @property
+    def nbytes(self):
+        return 0
+
+class ColumnTrace(Trace):
+    """ View of one column of a trace holding arrays, e.g. of one loop of a PID bank
+
+    It reads the trace through the model on every access, so the view
+    follows the trace if the simulator replaces it (see
+    `Simulator.record`). Only reading is supported.
+
+    Args:
+        model: model holding the trace
+        variable (str): name of the trace
+        column (int): index of the column within each value
+    """
+    def __init__(self, model, variable, column):
+        self.model = model
+        self.variable = variable
+        self.column = column
+
+    @property
+    def trace(self):
+        return getattr(self.model, self.variable)
+
+    @property
+    def last(self):
+        return float(self.trace[-1][self.column])
+
+    @property
+    def total(self):
+        trace = self.trace
+        return getattr(trace, "total", len(trace))
+
+    def __len__(self):
+        return len(self.trace)
+
+    def __iter__(self):
+        return iter(self.values().tolist())
+
+    def __getitem__(self, index):
+        if index == -1:
+            return self.last
+        return self.values()[index]
+
+    def __setitem__(self, index, value):
+        raise TypeError("Columns of a trace are read only")
+
+    def append(self, value):
+        raise TypeError("Columns of a trace are read only")
+
+    def extend(self, values):
+        raise TypeError("Columns of a trace are read only")
+
+    def values(self):
+        return np.asarray(self.trace, dtype = float)[:, self.column]
+
+    def __getstate__(self):
+        return self.__dict__
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
@@ -0,0 +1,192 @@
+import numpy as np
+from ..models.base import BaseModel
+
+class StateSpace:
+    """ Discrete state-space form of a model over one cycle
+
+        x[k+1] = A x[k] + B u[k] + a
+        y[k] = C x[k] + D u[k] + c
+
+    x is the state of the model (see `BaseModel.linear_state`), u holds
+    the arguments of `calculate` named on `inputs` and y the values the
+    model appends on the cycle to the traces named on `outputs`. The
+    constant terms a and c are zero unless given, and `defaults` holds
+    the values of the optional arguments the scenario may leave out.
+    """
+    def __init__(self, inputs, outputs, A, B, C, D, a = None, c = None, defaults = None):
+        self.inputs = list(inputs)
+        self.defaults = {} if defaults is None else dict(defaults)
+        self.outputs = list(outputs)
+        n, m, p = len(A), len(self.inputs), len(self.outputs)
+        self.A = np.asarray(A, dtype = float).reshape(n, n)
+        self.B = np.asarray(B, dtype = float).reshape(n, m)
+        self.C = np.asarray(C, dtype = float).reshape(p, n)
+        self.D = np.asarray(D, dtype = float).reshape(p, m)
+        self.a = np.zeros(n) if a is None else np.asarray(a, dtype = float)
+        self.c = np.zeros(p) if c is None else np.asarray(c, dtype = float)
+
+class LinearPath:
+    """ Propagates the models over several cycles at once while they're linear
+
+    The state-space forms of the models (see `BaseModel.state_space`)
+    are combined, following the execution list, into a single system
+    z[k+1] = M z[k] whose state z holds a constant 1, the states of the
+    models and the latest value of every trace read as an input. The
+    states of a window of cycles are then given by M^k z, the powers of
+    M being taken by repeated squaring, and the traces are filled from
+    them with matrix products.
+
+    A window ends before the next event of a model (e.g. a step of a
+    signal generator), which is calculated as usual, and at the first
+    cycle a model leaves its linear region (see `BaseModel.linear_region`),
+    e.g. a PID whose MV is clamped. Cycles are then calculated one by
+    one for `retry` cycles before trying again, twice as many each time
+    the models are still nonlinear.
+
+    Results are the same as the ones calculated cycle by cycle up to
+    rounding errors, as the operations aren't made in the same order.
+    Scenarios it can't propagate (see `unsupported`) are calculated
+    cycle by cycle.
+
+    Args:
+        sim (Simulator): simulator being run
+    """
+    first_window = 64
+    max_window = 65536
+    max_retry = 4096
+
+    def __init__(self, sim):
+        self.sim = sim
+        self.names = [spec["name"] for spec in sim.execution_list]
+        self.inputs = {spec["name"]: spec["inputs"] for spec in sim.execution_list}
+        # traces read as inputs, their latest values are part of the state
+        self.read = []
+        for name in self.names:
+            for input_spec in self.inputs[name].values():
+                if "model" in input_spec and (input_spec["model"], input_spec["variable"]) not in self.read:
+                    self.read.append((input_spec["model"], input_spec["variable"]))
+        self.retry = sim.linear["retry"]
+        self.backoff = self.retry
+        self.window = self.first_window
+        self.next_try = 0
+
+    @staticmethod
+    def unsupported(sim):
+        """ Why the models of the simulator can't be propagated, None if they can """
+        for spec in sim.execution_list:
+            name = spec["name"]
+            model = sim.models[name]
+            if sim.ticks[name] != 1:
+                return "Model {} has a sample time".format(name)
+            if type(model).state_space is BaseModel.state_space:
+                return "Model {} of class {} has no state-space form".format(name, type(model).__name__)
+        return None
+
+    def advance(self, i, stop):
+        """ Propagates the models from cycle `i` on, returns the number of cycles calculated
+
+        Returns 0 if cycle `i` has to be calculated as usual.
+        """
+        if i == 0 or i < self.next_try:
+            return 0
+        events = [e for e in (model.next_event(i) for model in self.sim.models.values()) if e is not None]
+        if i in events:
+            return 0
+        cycles = min([stop, i + self.window] + events) - i
+        done = self.propagate(i, cycles)
+        if done == cycles:
+            self.window = min(2*self.window, self.max_window)
+            self.backoff = self.retry
+        else:
+            # a model left its linear region on cycle i + done
+            self.window = self.first_window
+            self.next_try = i + done + self.backoff
+            self.backoff = self.retry if done else min(2*self.backoff, self.max_retry)
+        return done
+
+    def system(self):
+        """ Combines the state-space forms of the models
+
+        Returns:
+            tuple: the matrix M, the initial state z and, for each
+                model, its state-space form and the rows of z giving
+                its states, inputs and outputs. None if a model can't
+                be propagated from its current state.
+        """
+        models = self.sim.models
+        forms = [(name, models[name].state_space(), models[name].linear_state()) for name in self.names]
+        if any(ss is None or x is None for _, ss, x in forms):
+            return None
+        n = 1 + sum(len(x) for _, _, x in forms) + len(self.read)
+        identity = np.eye(n)
+        M = np.zeros((n, n))
+        M[0, 0] = 1.
+        z = [1.]
+        # rows of z giving the latest value of each trace read, within the cycle
+        held = 1 + sum(len(x) for _, _, x in forms)
+        current = {trace: identity[held + k] for k, trace in enumerate(self.read)}
+        rows = []
+        start = 1
+        for name, ss, x in forms:
+            X = identity[start:start + len(x)]
+            specs = [self.inputs[name].get(argument, {"value": ss.defaults.get(argument)}) for argument in ss.inputs]
+            U = np.array([self.input_row(spec, current, identity) for spec in specs]).reshape(-1, n)
+            Y = ss.C @ X + ss.D @ U
+            Y[:, 0] += ss.c
+            M[start:start + len(x)] = ss.A @ X + ss.B @ U
+            M[start:start + len(x), 0] += ss.a
+            for variable, row in zip(ss.outputs, Y):
+                if (name, variable) in current:
+                    current[(name, variable)] = row
+            rows.append((name, ss, X, U, Y))
+            z.extend(x)
+            start += len(x)
+        for k, (name, variable) in enumerate(self.read):
+            M[held + k] = current[(name, variable)]
+            z.append(getattr(models[name], variable).last)
+        return M, np.array(z, dtype = float), rows
+
+    def input_row(self, input_spec, current, identity):
+        """ Row of z giving the value of an input """
+        if "value" in input_spec:
+            return input_spec["value"]*identity[0]
+        if not "model" in input_spec:
+            raise ValueError("Input {} of the simulator can't be propagated".format(input_spec["variable"]))
+        return current[(input_spec["model"], input_spec["variable"])]
+
+    def propagate(self, i, cycles):
+        """ Calculates up to `cycles` cycles from `i`, returns how many were linear """
+        system = self.system()
+        if system is None:
+            return 0
+        M, z, rows = system
+        Z = np.empty((len(z), cycles + 1))
+        Z[:, 0] = z
+        # Z[:, k] = M^k z, filled by doubling
+        power = M
+        filled = 1
+        while filled <= cycles:
+            count = min(filled, cycles + 1 - filled)
+            Z[:, filled:filled + count] = power @ Z[:, :count]
+            filled += count
+            power = power @ power
+        states = Z[:, :cycles]
+        linear = np.ones(cycles, dtype = bool)
+        outputs = []
+        for name, ss, X, U, Y in rows:
+            y = Y @ states
+            linear &= self.sim.models[name].linear_region(X @ states, U @ states, y)
+            outputs.append(y)
+        done = cycles if linear.all() else int(np.argmin(linear))
+        if done == 0:
+            return 0
+        for (name, ss, X, U, Y), y in zip(rows, outputs):
+            model = self.sim.models[name]
+            for variable, values in zip(ss.outputs, y):
+                getattr(model, variable).extend(values[:done])
+            model.set_linear_state((X @ Z[:, done]).tolist())
+        # time is accumulated as on every cycle
+        t = np.cumsum(np.concatenate(([self.sim.t.last], np.full(done, self.sim.dt))))
+        self.sim.t.extend(t[1:])
+        self.sim.i = i + done - 1
+        return done
@@ -1,3 +1,80 @@
+import numpy as np
+
+# Integration schemes for a first order system dx/dt = (x_ss - x)/tau whose
+# input is held during the step. Each one gives the factor by which the
+# distance to the steady state x_ss shrinks over a step of h = dt/tau.
+def euler_pole(h):
+    return 1 - h
+
+def backward_euler_pole(h):
+    return 1/(1 + h)
+
+def trapezoidal_pole(h):
+    return (1 - h/2)/(1 + h/2)
+
+def rk4_pole(h):
+    return 1 - h*(1 - h/2*(1 - h/3*(1 - h/4)))
+
+def zoh_pole(h):
+    # exact discretization
+    return np.exp(-h)
+
+FIRST_ORDER_POLES = {
+    "euler": euler_pole,
+    "backward_euler": backward_euler_pole,
+    "trapezoidal": trapezoidal_pole,
+    "rk4": rk4_pole,
+    "zoh": zoh_pole,
+}
+
+def check_integrator(integrator):
+    if integrator not in FIRST_ORDER_POLES:
+        raise ValueError("Unknown integrator {}, expected one of {}".format(integrator, ", ".join(FIRST_ORDER_POLES)))
+
+def first_order_step(integrator, x, x_ss, h):
+    """ Next state of dx/dt = (x_ss - x)/tau after a step of h = dt/tau """
+    return x_ss + FIRST_ORDER_POLES[integrator](h)*(x - x_ss)
+
+def first_order_error(integrator, x, x_ss, x_ss_previous, h):
+    """ Step-doubling estimate of the error made by `first_order_step` from x
+
+    The step is taken again as two halves, the steady state of the
+    second one moved on as it did since the previous step (x_ss_previous,
+    taken as a step as long as this one). Held during the step, an input
+    that changes makes every scheme first order, so the error of the
+    whole step is twice the difference of both ends (Richardson).
+    """
+    if x_ss_previous != x_ss_previous:
+        x_ss_previous = x_ss
+    pole = FIRST_ORDER_POLES[integrator]
+    whole = x_ss + pole(h)*(x - x_ss)
+    half = pole(h/2)
+    middle = x_ss + half*(x - x_ss)
+    x_ss_middle = x_ss + (x_ss - x_ss_previous)/2
+    halves = x_ss_middle + half*(middle - x_ss_middle)
+    return 2*abs(halves - whole)
+
+def held_previous(values, y0):
+    """ Values preceding each of `values` along its first axis
+
+    y0 precedes the first one. As on the scalar classes, a preceding
+    value of 0 (or None) is taken as missing and replaced by the value
+    itself, so that nothing is integrated or differentiated from it.
+    """
+    previous = np.empty_like(values)
+    previous[0] = values[0] if y0 is None else y0
+    previous[1:] = values[:-1]
+    return held(previous, values)
+
+def held(previous, values):
+    """ Previous values, the values themselves where they're missing (0) """
+    return np.where(previous != 0, previous, values)
+
+def steps(dt, values):
+    """ dt, either a step or the steps along the first axis of `values`, broadcastable to them """
+    dt = np.asarray(dt, dtype = float)
+    return dt.reshape(dt.shape + (1,)*(values.ndim - dt.ndim)) if dt.ndim else dt
+
 class DumbIntegrator:
     """ The dumbest possible numerical integrator """
     def __init__(self, m0 = 0):
@@ -16,6 +93,38 @@ class DumbIntegrator:
         self.m0 = total_area
         return total_area
 
+    def calculate_array(self, dt, values):
+        """ Same as calling `calculate` on each of the values, along their first axis
+
+        Returns the integral after each value, equal bit for bit to the
+        ones of `calculate`, and carries the state on, so a long trace
+        can be integrated chunk by chunk.
+        """
+        values = np.asarray(values, dtype = float)
+        if not len(values):
+            return values.copy()
+        areas = steps(dt, values)*((held_previous(values, self.y0) + values)/2)
+        # the areas are summed in order, the first one onto m0
+        areas[0] = self.m0 + areas[0]
+        total_areas = np.cumsum(areas, axis = 0)
+        # update state
+        self.y0 = values[-1]
+        self.m0 = total_areas[-1]
+        return total_areas
+
+    def hold(self, dt, count):
+        """ Same as calling `calculate` count more times with the last value
+
+        The equal areas are added at once, so the result may differ from
+        adding them one by one in the last bits. Areas too small to
+        change m0 are left out, as they would be one by one.
+        """
+        if not self.y0:
+            return
+        area = dt*self.y0
+        if self.m0 + area != self.m0:
+            self.m0 = self.m0 + count*area
+
 class DumbDifferentiator:
     """ The dumbest possible numerical derivator """
     def __init__(self):
@@ -31,6 +140,60 @@ class DumbDifferentiator:
         self.y0 = y
         return rate
 
+    def calculate_array(self, dt, values):
+        """ Same as calling `calculate` on each of the values, along their first axis """
+        values = np.asarray(values, dtype = float)
+        if not len(values):
+            return values.copy()
+        rates = (values - held_previous(values, self.y0))/steps(dt, values)
+        # update state
+        self.y0 = values[-1]
+        return rates
+
+class FilteredDifferentiator(DumbDifferentiator):
+    """ DumbDifferentiator whose rates go through a first order lag
+
+    The lag, dr/dt = (rate - r)/tau, is stepped with backward Euler so
+    that it stays stable whatever dt. A tau of 0 gives the raw rates.
+
+    Args:
+        tau (float): time constant of the lag
+        r0 (float): filtered rate before the first value
+    """
+    def __init__(self, tau, r0 = 0):
+        super().__init__()
+        self.tau = tau
+        self.r0 = r0
+
+    def calculate(self, dt, y):
+        rate = super().calculate(dt, y)
+        filtered = self.r0 + dt/(self.tau + dt)*(rate - self.r0)
+        # update state
+        self.r0 = filtered
+        return filtered
+
+    def calculate_array(self, dt, values):
+        """ Same as calling `calculate` on each of the values, along their first axis
+
+        The rates are calculated at once, but each filtered rate depends
+        on the previous one, so they're filtered one after the other.
+        """
+        rates = super().calculate_array(dt, values)
+        if not len(rates):
+            return rates
+        dt = np.broadcast_to(np.asarray(dt, dtype = float), rates.shape[:1])
+        gains = (dt/(self.tau + dt)).tolist()
+        # floats are filtered faster than numpy scalars
+        rows = rates.tolist() if rates.ndim == 1 else rates
+        r0 = self.r0
+        filtered = []
+        for gain, rate in zip(gains, rows):
+            r0 = r0 + gain*(rate - r0)
+            filtered.append(r0)
+        # update state
+        self.r0 = r0
+        return np.array(filtered)
+
 class DeadBand:
     def __init__(self, db, offset = 0):
         """ Deadband with offset """
@@ -45,3 +208,84 @@ class DeadBand:
             return val + db
         return offset
 
+    def calculate_array(self, values):
+        """ Same as calling `calculate` on each of the values """
+        offset, db = self.offset, self.db
+        values = np.asarray(values, dtype = float)
+        return np.where(values > offset + db, values - db, np.where(values < offset - db, values + db, offset))
+
+class RateLimiter:
+    """ Limits the rate of change of a value to max_rate per unit of time
+
+    The first value, unless y0 is given, passes as it is.
+    """
+    def __init__(self, max_rate, y0 = None):
+        self.max_rate = max_rate
+        self.y0 = y0
+
+    def reset(self, new_y0):
+        self.y0 = new_y0
+
+    def calculate(self, dt, x):
+        if self.y0 is None:
+            y = x
+        else:
+            step = self.max_rate*dt
+            y = min(max(x, self.y0 - step), self.y0 + step)
+        # update state
+        self.y0 = y
+        return y
+
+    def calculate_array(self, dt, values):
+        """ Same as calling `calculate` on each of the values, along their first axis
+
+        Each output depends on the previous one, so, unlike the other
+        classes, the values are still limited one after the other.
+        """
+        values = np.asarray(values, dtype = float)
+        if not len(values):
+            return values.copy()
+        dt = np.broadcast_to(np.asarray(dt, dtype = float), values.shape[:1]).tolist()
+        # floats are limited faster than numpy scalars
+        rows = values.tolist() if values.ndim == 1 else values
+        return np.array([self.calculate(h, x) for h, x in zip(dt, rows)])
+
+class EnsembleIntegrator(DumbIntegrator):
+    """ DumbIntegrator integrating N scenarios at once
+
+    Values are arrays holding one value per scenario. Each element
+    follows exactly the same rules as the scalar integrator.
+    """
+    def calculate(self, dt, y):
+        y0 = y if self.y0 is None else held(self.y0, y)
+        new_area = dt*((y0 + y)/2)
+        total_area = self.m0 + new_area
+        # update state
+        self.y0 = y
+        self.m0 = total_area
+        return total_area
+
+class EnsembleDifferentiator(DumbDifferentiator):
+    """ DumbDifferentiator differentiating N scenarios at once """
+    def calculate(self, dt, y):
+        y0 = y if self.y0 is None else held(self.y0, y)
+        rate = (y - y0)/dt
+        # update state
+        self.y0 = y
+        return rate
+
+class EnsembleDeadBand(DeadBand):
+    """ DeadBand applied to N scenarios at once """
+    calculate = DeadBand.calculate_array
+
+class EnsembleRateLimiter(RateLimiter):
+    """ RateLimiter applied to N scenarios at once """
+    def calculate(self, dt, x):
+        if self.y0 is None:
+            y = np.asarray(x, dtype = float)
+        else:
+            step = self.max_rate*dt
+            y = np.minimum(np.maximum(x, self.y0 - step), self.y0 + step)
+        # update state
+        self.y0 = y
+        return y
@@ -1,5 +1,7 @@
 import warnings
 import sys
+import copy
+import numpy as np
 from .numerical_analysis import DumbDifferentiator
 from ..settings import simulator_settings
 
@@ -7,8 +9,11 @@ class PerformanceMeter:
     def __init__(self, sim, config = None):
         self.sim = sim
         self.config = config if config else simulator_settings["performance_meter"]
-        self.enabled = self.is_enabled(config)
-        self.measurements = self.get_measurements(config)
+        self.enabled = self.is_enabled(self.config)
+        # cycles between two measurements
+        self.ticks = sim.get_ticks(self.config.get("sample_time"))
+        self.measurements = self.get_measurements(self.config)
+        self.record_measured_variables(self.config)
 
     def is_enabled(self, config):
         if config["enabled"]:
@@ -22,16 +27,39 @@ class PerformanceMeter:
             try:
                 class_ = getattr(sys.modules[__name__], mea["class"])
                 instance_ = class_(mea["settings"])
+                instance_.ticks = self.ticks
                 measurements[mea["name"]] = instance_
             except NameError:
                 warnings.warn("Couldn't instantiate a class named {}".format(mea["class"]))
                 continue
         return measurements
     
+    def record_measured_variables(self, config):
+        """ Makes sure the simulator keeps the history of every measured variable """
+        for mea in config["measurements"]:
+            for setting in mea["settings"].values():
+                if type(setting) == dict and "object_name" in setting:
+                    self.sim.record(setting["object_name"], setting["attribute"])
+
+    def fork(self, sim):
+        """ Returns a meter for a fork of the simulator, carrying on from the current measurements """
+        pf = copy.copy(self)
+        pf.sim = sim
+        pf.measurements = copy.deepcopy(self.measurements)
+        return pf
+
     def calculate(self):
+        if self.sim.ensemble:
+            for mea in self.measurements:
+                self.measurements[mea].calculate_ensemble(self.sim)
+            return
         for mea in self.measurements:
             self.measurements[mea].calculate(self.sim)
 
+    def results(self):
+        """ Results of every measurement, serializable to JSON (see `ModelProxy.results`) """
+        return {name: mea.results() for name, mea in self.measurements.items()}
+
     def result_to_string(self):
         result = ""
         for mea in self.measurements:
@@ -41,10 +69,31 @@ class PerformanceMeter:
         return result
 
 class ModelProxy:
+    # cycles between two measurements
+    ticks = 1
+
     def get_value(self, settings, sim):
         instance_ = sim.models[settings["object_name"]]
         return getattr(instance_, settings["attribute"])
 
+    def calculate_ensemble(self, sim):
+        raise NotImplementedError("Class {} can't measure an ensemble.".format(self.__class__.__name__))
+
+    def steady_calls(self, sim):
+        """ Number of calls on the current values, held, that leave the result as it is
+
+        None means any number of calls. Used to skip steady states.
+        """
+        return None
+
+    def hold(self, sim, calls):
+        """ Updates the state as `calls` calls on the current values, held, would """
+        pass
+
+    def results(self):
+        """ Values measured so far, as a dict serializable to JSON """
+        return {}
+
     def result_to_string(self):
         return "Result string not defined for {}. ".format(self.__class__.__name__)
 
@@ -65,6 +114,21 @@ class Overshoot(ModelProxy):
             self.max = overshoot
         return self.max
 
+    def calculate_ensemble(self, sim):
+        """ Same as `calculate`, but for arrays holding one value per scenario """
+        Y = self.get_value(self.Y_settings, sim)[-1]
+        SP = self.get_value(self.SP_settings, sim)[-1]
+        base = Y - SP if self.base is None else np.where(self.base != 0, self.base, Y - SP)
+        self.base = base
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            overshoot = (SP - Y)/base
+        # NaN (0/0) never counts as an overshoot
+        self.max = np.fmax(self.max, overshoot)
+        return self.max
+
+    def results(self):
+        return {"max": np.asarray(self.max).tolist()}
+
     def result_to_string(self):
         return "Max overshoot = {}. ".format(self.max)
 
@@ -79,28 +143,95 @@ class SettlingTime(ModelProxy):
         self.cycles_held = 0
         self.settled = False
         self.settle_time = 0
+        self.last_cycle = None
 
     def calculate(self, sim):
         Y = self.get_value(self.Y_settings, sim)[-1]
         SP = self.get_value(self.SP_settings, sim)[-1]
-        if not self.settled and self.within_range(Y, SP) and self.stabilized(Y, sim):
+        cycles = self.interval(sim)
+        if not self.settled and self.within_range(Y, SP) and self.stabilized(Y, sim, cycles):
             self.settled = True
             self.settle_time = sim.t[-1]
             return self.settle_time
 
+    def calculate_ensemble(self, sim):
+        """ Same as `calculate`, but for arrays holding one value per scenario
+
+        As on `calculate`, the derivative is only followed while a
+        scenario is within range and not settled yet.
+        """
+        Y = self.get_value(self.Y_settings, sim)[-1]
+        SP = self.get_value(self.SP_settings, sim)[-1]
+        if type(self.settled) == bool:
+            # one state per scenario, created on the first cycle
+            self.settled = np.zeros(sim.ensemble, dtype = bool)
+            self.settle_time = np.zeros(sim.ensemble)
+            self.cycles_held = np.zeros(sim.ensemble, dtype = int)
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            within_range = np.abs((Y - SP)/SP) < self.range
+        checked = ~self.settled & within_range
+        # the derivative only follows the scenarios being checked
+        y0 = self.D.y0 if self.D.y0 is not None else 0.
+        derivative = (Y - np.where(y0 != 0, y0, Y))/(sim.dt*self.ticks)
+        self.D.y0 = np.where(checked, Y, y0)
+        held = np.where(derivative < self.dx_threshold, self.cycles_held + self.ticks, 0)
+        self.cycles_held = np.where(checked, held, self.cycles_held)
+        settling = checked & (self.cycles_held > self.dx_cycles_hold)
+        self.settle_time = np.where(settling, sim.t[-1], self.settle_time)
+        self.settled = self.settled | settling
+        return self.settle_time
+
+    def steady_calls(self, sim):
+        Y = self.get_value(self.Y_settings, sim)[-1]
+        SP = self.get_value(self.SP_settings, sim)[-1]
+        if self.settled or not self.within_range(Y, SP) or not 0 < self.dx_threshold:
+            return None
+        # Y held has a null derivative, so it settles on the call
+        # taking cycles_held over dx_cycles_hold
+        return max(0, (self.dx_cycles_hold - self.cycles_held)//self.ticks)
+
+    def hold(self, sim, calls):
+        Y = self.get_value(self.Y_settings, sim)[-1]
+        SP = self.get_value(self.SP_settings, sim)[-1]
+        if calls == 0 or self.settled or not self.within_range(Y, SP):
+            return
+        self.D.y0 = Y
+        self.cycles_held = self.cycles_held + calls*self.ticks if 0 < self.dx_threshold else 0
+
     def within_range(self, Y, SP):
         absolute_difference = abs((Y-SP)/SP)
         return absolute_difference < self.range
 
-    def stabilized(self, Y, sim):
-        derivative = self.D.calculate(sim.dt, Y)
+    def interval(self, sim):
+        """ Cycles since the previous measurement
+
+        Measurements are taken every `ticks` cycles, but on adaptive
+        runs they're taken after every step, whatever its length.
+        """
+        if not sim.adaptive:
+            return self.ticks
+        cycle = sim.completed
+        cycles = self.ticks if self.last_cycle is None else cycle - self.last_cycle
+        self.last_cycle = cycle
+        return cycles
+
+    def stabilized(self, Y, sim, cycles = None):
+        cycles = self.ticks if cycles is None else cycles
+        derivative = self.D.calculate(sim.dt*cycles, Y)
         if derivative < self.dx_threshold:
-            self.cycles_held += 1
+            self.cycles_held += cycles
         else:
             self.cycles_held = 0
         return self.cycles_held > self.dx_cycles_hold
 
+    def results(self):
+        return {"settled": np.asarray(self.settled).tolist(), "settle_time": np.asarray(self.settle_time).tolist(),
+            "cycles_held": np.asarray(self.cycles_held).tolist(), "dx_cycles_hold": self.dx_cycles_hold}
+
     def result_to_string(self):
+        if type(self.settled) != bool:
+            settle_time = np.where(self.settled, self.settle_time, np.nan)
+            return "Settle time = {} (NaN if it didn't stabilize). ".format(settle_time)
         if not self.settled:
             return "System didn't stabilize. "
         else:
@@ -0,0 +1,99 @@
+import os
+import json
+import shutil
+import numpy as np
+from .history import WindowedTrace
+
+class Recorder:
+    """ Streams traces to a directory, one column per variable
+
+    Each variable gets its own sub-directory holding the chunks
+    written by its trace as numbered `.npy` files. An `index.json`
+    file lists the columns, so the run can be reopened later through
+    `Recording`.
+
+    Args:
+        path (str): directory where the recording is stored. It's
+            created if it doesn't exist and its columns are
+            overwritten.
+        window (int): number of values each trace keeps in memory
+        chunk (int): number of values written at once
+        metadata (dict): extra information saved on the index
+    """
+    def __init__(self, path, window, chunk, metadata = None):
+        self.path = path
+        self.window = window
+        self.chunk = chunk
+        self.metadata = metadata if metadata else {}
+        self.traces = {}
+        self.chunks_written = {}
+        os.makedirs(path, exist_ok = True)
+
+    def trace(self, name, values = (), shape = ()):
+        """ Returns a windowed trace whose history is written to the column `name` """
+        self.clear(name)
+        self.chunks_written[name] = 0
+        trace = WindowedTrace(self.window, self.chunk, lambda data: self.write(name, data), values, shape)
+        self.traces[name] = trace
+        self.write_index()
+        return trace
+
+    def write(self, name, data):
+        f = os.path.join(self.path, name, "{:06d}.npy".format(self.chunks_written[name]))
+        np.save(f, data)
+        self.chunks_written[name] += 1
+
+    def clear(self, name):
+        column = os.path.join(self.path, name)
+        if os.path.exists(column):
+            shutil.rmtree(column)
+        os.makedirs(column)
+
+    def flush(self):
+        """ Writes every value still held only in memory """
+        for name in self.traces:
+            self.traces[name].flush()
+
+    def reset(self):
+        """ Discards everything written so far """
+        for name in self.traces:
+            self.clear(name)
+            self.chunks_written[name] = 0
+
+    def write_index(self):
+        with open(os.path.join(self.path, "index.json"), "w") as wf:
+            json.dump({"columns": list(self.traces), "metadata": self.metadata}, wf)
+
+class Recording:
+    """ Reads a recording written by `Recorder`
+
+    Args:
+        path (str): directory of the recording
+    """
+    def __init__(self, path):
+        if not os.path.exists(os.path.join(path, "index.json")):
+            raise FileNotFoundError("No recording found at {}".format(path))
+        self.path = path
+        with open(os.path.join(path, "index.json"), "r") as rf:
+            index = json.load(rf)
+        self.columns = index["columns"]
+        self.metadata = index["metadata"]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __getitem__(self, name):
+        """ Returns the whole column `name` as an array """
+        chunks = list(self.chunks(name))
+        if not chunks:
+            return np.empty(0)
+        return np.concatenate(chunks)
+
+    def chunks(self, name):
+        """ Yields the chunks of column `name` as memory-mapped arrays """
+        if name not in self.columns:
+            raise KeyError(name)
+        column = os.path.join(self.path, name)
+        for f in sorted(os.listdir(column)):
+            if f.endswith(".npy"):
+                yield np.load(os.path.join(column, f), mmap_mode = "r")
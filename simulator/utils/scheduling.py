@@ -0,0 +1,112 @@
+def strongly_connected_components(nodes, edges):
+    """ Tarjan's algorithm, without recursion
+
+    Args:
+        nodes (list): nodes of the graph
+        edges (dict): maps each node to the set of nodes it points to
+
+    Returns:
+        list of lists: components, each in the order nodes were visited
+    """
+    index = {}
+    lowlink = {}
+    stack = []
+    on_stack = set()
+    components = []
+    counter = 0
+    for root in nodes:
+        if root in index:
+            continue
+        work = [(root, iter(sorted(edges.get(root, ()))))]
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, successors = work[-1]
+            advanced = False
+            for successor in successors:
+                if successor not in index:
+                    index[successor] = lowlink[successor] = counter
+                    counter += 1
+                    stack.append(successor)
+                    on_stack.add(successor)
+                    work.append((successor, iter(sorted(edges.get(successor, ())))))
+                    advanced = True
+                    break
+                if successor in on_stack:
+                    lowlink[node] = min(lowlink[node], index[successor])
+            if advanced:
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[node])
+            if lowlink[node] == index[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.remove(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                components.append(component)
+    return components
+
+def levelize(nodes, edges, key = None):
+    """ Groups the nodes of an acyclic graph in levels (Kahn's algorithm)
+
+    Nodes of a level only point to nodes of later levels, so the nodes
+    within a level don't depend on each other.
+
+    Args:
+        nodes (list): nodes of the graph
+        edges (dict): maps each node to the set of nodes it points to
+        key (callable): sorts the nodes within a level
+
+    Returns:
+        list of lists: the levels
+    """
+    incoming = {node: 0 for node in nodes}
+    for node in nodes:
+        for successor in edges.get(node, ()):
+            incoming[successor] += 1
+    level = sorted([node for node in nodes if incoming[node] == 0], key = key)
+    levels = []
+    while level:
+        levels.append(level)
+        following = []
+        for node in level:
+            for successor in edges.get(node, ()):
+                incoming[successor] -= 1
+                if incoming[successor] == 0:
+                    following.append(successor)
+        level = sorted(following, key = key)
+    if sum(len(l) for l in levels) != len(nodes):
+        raise ValueError("Graph has cycles")
+    return levels
+
+def connected_components(nodes, links):
+    """ Groups nodes linked to each other, whatever the direction
+
+    Args:
+        nodes (list): nodes of the graph
+        links (iterable): pairs of linked nodes
+
+    Returns:
+        list of lists: components, with nodes in the given order
+    """
+    parent = {node: node for node in nodes}
+
+    def find(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for a, b in links:
+        parent[find(a)] = find(b)
+    components = {}
+    for node in nodes:
+        components.setdefault(find(node), []).append(node)
+    return list(components.values())
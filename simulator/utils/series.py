@@ -0,0 +1,152 @@
+import io
+import mmap
+import numpy as np
+
+def open_series(path, time_column = 0, value_column = 1, period = None, columns = 2):
+    """ Opens a time/value series stored on a file, without reading it
+
+    Args:
+        path (str): `.npy` file holding a 2D array with a column per
+            variable (or a 1D array of values), `.csv` file with a
+            column per variable and an optional header, or any other
+            file of raw float64 values, `columns` per row
+        time_column, value_column (int or str): columns of the times
+            and of the values, by index or, on CSV files, by name
+        period (float): time between two samples of a series without
+            times (1D arrays and single column binary files)
+        columns (int): number of columns of a binary file
+
+    Returns:
+        ArraySeries or CSVSeries
+    """
+    if path.endswith(".csv"):
+        return CSVSeries(path, time_column, value_column)
+    if path.endswith(".npy"):
+        data = np.load(path, mmap_mode = "r")
+    else:
+        data = np.memmap(path, dtype = np.float64, mode = "r")
+        if columns > 1:
+            data = data.reshape(-1, columns)
+    if not len(data):
+        raise ValueError("Empty series {}".format(path))
+    if data.ndim == 1:
+        if period is None:
+            raise ValueError("Series {} has no times, a period must be given".format(path))
+        return ArraySeries(None, data, period)
+    return ArraySeries(data[:, time_column], data[:, value_column])
+
+class ArraySeries:
+    """ Series held by (memory-mapped) arrays
+
+    Args:
+        times (np.ndarray): increasing times of the samples, None if
+            they're taken every `period`
+        values (np.ndarray): values of the samples
+        period (float): time between two samples if `times` is None
+    """
+    def __init__(self, times, values, period = None):
+        self.times = times
+        self.values = values
+        self.period = period
+
+    def first_time(self):
+        return 0. if self.times is None else float(self.times[0])
+
+    def window(self, start, stop):
+        """ Samples covering the times from `start` to `stop`
+
+        They go from the last sample up to `start` (or the first one) to
+        the first sample from `stop` on (or the last one), and are copied
+        from the file, so only that part of it is read.
+        """
+        n = len(self.values)
+        if self.times is None:
+            first = int(np.floor(start/self.period)) - 1
+            last = int(np.ceil(stop/self.period)) + 2
+        else:
+            first = int(np.searchsorted(self.times, start, side = "right")) - 1
+            last = int(np.searchsorted(self.times, stop, side = "left")) + 1
+        first, last = max(first, 0), min(max(last, first + 1), n)
+        values = np.array(self.values[first:last], dtype = float)
+        if self.times is None:
+            return np.arange(first, last)*self.period, values
+        return np.array(self.times[first:last], dtype = float), values
+
+class CSVSeries:
+    """ Series read from a CSV file through a memory map
+
+    The file is parsed forward, a block of bytes at a time, as later
+    times are asked for. Only the samples still needed are kept, so
+    going back to earlier times parses the file again from the start.
+
+    Args:
+        path (str): CSV file, comma separated, with an optional header
+        time_column, value_column (int or str): columns, by index or name
+    """
+    # bytes parsed at once
+    block = 1 << 20
+
+    def __init__(self, path, time_column = 0, value_column = 1):
+        self.path = path
+        with open(path, "rb") as f:
+            first_line = f.readline()
+            self.map = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ) if first_line else b""
+        self.data_start = 0
+        names = [name.strip() for name in first_line.decode().split(",")]
+        try:
+            [float(name) for name in names]
+        except ValueError:
+            # a header
+            self.data_start = len(first_line)
+        columns = []
+        for column in (time_column, value_column):
+            if type(column) == str:
+                if not self.data_start or column not in names:
+                    raise ValueError("Column {} not found on {}".format(column, path))
+                column = names.index(column)
+            columns.append(column)
+        self.columns = tuple(columns)
+        if not self.map[self.data_start:].strip():
+            raise ValueError("Empty series {}".format(path))
+        self.rewind()
+
+    def rewind(self):
+        self.position = self.data_start
+        self.times = np.empty(0)
+        self.values = np.empty(0)
+        self.dropped = False
+
+    def first_time(self):
+        position, times, values, dropped = self.position, self.times, self.values, self.dropped
+        self.rewind()
+        self.read()
+        first = float(self.times[0])
+        self.position, self.times, self.values, self.dropped = position, times, values, dropped
+        return first
+
+    def read(self):
+        """ Parses the next block of lines, returns False at the end of the file """
+        size = len(self.map)
+        if self.position >= size:
+            return False
+        end = min(size, self.position + self.block)
+        if end < size:
+            # up to the last full line
+            end = self.map.rfind(b"\n", self.position, end) + 1 or size
+        data = np.loadtxt(io.BytesIO(self.map[self.position:end]), delimiter = ",", usecols = self.columns, ndmin = 2)
+        self.position = end
+        self.times = np.concatenate((self.times, data[:, 0]))
+        self.values = np.concatenate((self.values, data[:, 1]))
+        return True
+
+    def window(self, start, stop):
+        """ Samples covering the times from `start` to `stop` (see `ArraySeries.window`) """
+        if self.dropped and (not len(self.times) or start < self.times[0]):
+            self.rewind()
+        while (not len(self.times) or self.times[-1] < stop) and self.read():
+            pass
+        first = max(int(np.searchsorted(self.times, start, side = "right")) - 1, 0)
+        if first:
+            self.times, self.values = self.times[first:], self.values[first:]
+            self.dropped = True
+        return self.times, self.values
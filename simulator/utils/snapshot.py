@@ -0,0 +1,38 @@
+import copy
+import pickle
+
+class Snapshot:
+    """ State of a simulation between two cycles
+
+    Holds copies of the models (with their traces, integrators and
+    events), of the time trace and, optionally, of the measurements of
+    a performance meter. It's taken by `Simulator.snapshot` and given
+    back to `Simulator.restore`, which may be called any number of
+    times from the same snapshot.
+
+    Args:
+        sim (Simulator): simulator whose state is copied
+        pf (PerformanceMeter): optional performance meter
+    """
+    def __init__(self, sim, pf = None):
+        self.dt = sim.dt
+        self.ensemble = sim.ensemble
+        self.i = sim.i
+        self.completed = sim.completed
+        self.models = copy.deepcopy(sim.models)
+        self.t = copy.deepcopy(sim.t)
+        self.measurements = copy.deepcopy(pf.measurements) if pf else None
+
+    def save(self, path):
+        """ Writes the snapshot to a file """
+        with open(path, "wb") as f:
+            pickle.dump(self, f, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path):
+        """ Reads a snapshot written by `save` """
+        with open(path, "rb") as f:
+            snapshot = pickle.load(f)
+        if not isinstance(snapshot, Snapshot):
+            raise ValueError("{} doesn't hold a snapshot".format(path))
+        return snapshot
@@ -29,4 +29,29 @@ class TestBaseModel(unittest.TestCase):
         self.asd.update_attributes(**{"a_list": 4})
         self.assertListEqual(self.asd.a_list, [1,2,3,4])
 
+    def test_record_outputs(self):
+        class Qwe(BaseModel):
+            traces = ("x", "y")
+            outputs = ("y", "x")
+
+            def __init__(self):
+                self.x = [0]
+                self.y = [1]
+
+        class Zxc(Qwe):
+            outputs = Qwe.outputs + ("z",)
+
+            def __init__(self):
+                super().__init__()
+                self.z = []
+
+        qwe = Qwe()
+        qwe.record_outputs(2, 3)
+        self.assertListEqual(qwe.x, [0, 3])
+        self.assertListEqual(qwe.y, [1, 2])
+        zxc = Zxc()
+        zxc.record_outputs(2, 3, 4)
+        self.assertListEqual(zxc.z, [4])
+        # models without outputs don't record anything
+        self.asd.record_outputs()
 
@@ -0,0 +1,85 @@
+import unittest
+import numpy as np
+from scipy.integrate import solve_ivp
+from simulator.models.electric_motor import ElectricMotor
+
+PARAMS = {
+    "coil_turns": 1000, "coil_size": 0.05, "magnetic_permea": 1e-3, "solenoid_length": 0.1, "solenoid_area": 1e-3,
+    "stator_induc": 0.1, "stator_resist": 100,
+    "rotor_induc": 2e-4, "rotor_resist": 1, "rotor_inertia": 1e-4, "viscous_friction": 1e-4,
+    "load_torque": 0.01,
+    "stator_current": 0.5, "rotor_current": 0, "rotor_speed": 0, "rotor_position": 0,
+    "stator_voltage": 100
+}
+
+class TestElectricMotor(unittest.TestCase):
+    def setUp(self):
+        self.Va = 12.
+
+    def reference(self, times):
+        """ Solution of the equations by a stiff solver """
+        m = ElectricMotor(1e-3, **PARAMS)
+        def derivatives(t, x):
+            ie, ia, w, omega = x
+            return [(m.stator_voltage - m.Re*ie)/m.Le, (self.Va - m.Ra*ia - m.K*ie*w)/m.La, (m.K*ie*ia - m.F*w - m.load_torque)/m.J, w]
+        x0 = [m.ie[0], m.ia[0], m.w[0], m.omega[0]]
+        return solve_ivp(derivatives, (0, times[-1]), x0, method = "Radau", t_eval = times, rtol = 1e-10, atol = 1e-10).y
+
+    def run_motor(self, integrator, dt, duration):
+        motor = ElectricMotor(dt, **dict(PARAMS, integrator = integrator))
+        for _ in range(int(round(duration/dt))):
+            motor.calculate(self.Va)
+        return motor
+
+    def test_stiff_integrators(self):
+        # the rotor's electrical time constant is 0.2 ms, explicit Euler needs dt < 0.4 ms
+        times = np.arange(1, 301)*1e-3
+        expected = self.reference(times)
+        for integrator in ["zoh", "backward_euler", "trapezoidal"]:
+            with self.subTest(integrator = integrator):
+                motor = self.run_motor(integrator, 1e-3, 0.3)
+                self.assertTrue(np.all(np.isfinite(motor.w)))
+                np.testing.assert_allclose(motor.w[1:], expected[2], rtol = 0, atol = 0.01*np.max(expected[2]))
+        # while explicit Euler diverges
+        motor = self.run_motor("euler", 1e-3, 0.3)
+        self.assertGreater(np.max(np.abs(motor.w)), 1e6*np.max(expected[2]))
+
+    def test_euler(self):
+        times = np.arange(1, 101)*1e-3
+        expected = self.reference(times)
+        motor = self.run_motor("euler", 1e-5, 0.1)
+        np.testing.assert_allclose(motor.w[100::100], expected[2], rtol = 1e-2)
+
+    def test_steady_state(self):
+        motor = self.run_motor("zoh", 0.01, 10)
+        flux = motor.K*PARAMS["stator_voltage"]/motor.Re
+        # Va = Ra*ia + flux*w and flux*ia = F*w + Tl
+        ia, w = np.linalg.solve([[motor.Ra, flux], [flux, -motor.F]], [self.Va, motor.load_torque])
+        self.assertAlmostEqual(motor.ia[-1], ia)
+        self.assertAlmostEqual(motor.w[-1], w, places = 6)
+        self.assertAlmostEqual(motor.speed[-1], motor.w[-2])
+
+    def test_state_space(self):
+        for integrator in ["zoh", "trapezoidal", "euler"]:
+            motor = ElectricMotor(1e-5, **dict(PARAMS, integrator = integrator))
+            motor.calculate(self.Va)
+            # the stator current is still rising
+            self.assertIsNone(motor.state_space())
+            motor = ElectricMotor(1e-5, **dict(PARAMS, stator_current = 1., integrator = integrator))
+            for _ in range(10):
+                motor.calculate(self.Va)
+            ss = motor.state_space()
+            x = np.array(motor.linear_state())
+            u = [self.Va, motor.load_torque, motor.stator_voltage]
+            motor.calculate(self.Va)
+            y = ss.C @ x + ss.D @ u + ss.c
+            np.testing.assert_allclose(y, [getattr(motor, v)[-1] for v in ss.outputs], rtol = 1e-12)
+            np.testing.assert_allclose(ss.A @ x + ss.B @ u + ss.a, motor.linear_state(), rtol = 1e-12)
+            self.assertTrue(motor.linear_region(x[:, None], np.array(u)[:, None], y[:, None]).all())
+
+    def test_unknown_integrator(self):
+        with self.assertRaises(ValueError):
+            ElectricMotor(1e-3, **dict(PARAMS, integrator = "rk4"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import copy
+import unittest
+import numpy as np
+from simulator.models.pid import PIDLimitedIntegral
+from simulator.models.pid_bank import PIDBank
+
+class TestPIDBank(unittest.TestCase):
+    def setUp(self):
+        self.loops = [
+            {"name": "a", "Kp": 2, "Ti": 1, "Td": 0.001, "min_MV": 0, "max_MV": 8},
+            {"name": "b", "Kp": 1.5, "Ti": 0.2, "Td": 0.05, "db_DG": 0.02, "max_MV": 3},
+            {"name": "c", "Kp": 0.5, "Ti": 2, "Td": 0.1, "min_MV": -1, "differ_on_PV": False, "error": 1},
+        ]
+        self.bank = PIDBank(0.01, copy.deepcopy(self.loops))
+        settings = lambda loop: {key: value for key, value in loop.items() if key != "name"}
+        self.pids = [PIDLimitedIntegral(0.01, **settings(loop)) for loop in self.loops]
+
+    def test_same_as_pids(self):
+        rng = np.random.default_rng(0)
+        for cycle in range(500):
+            SP = 10. if cycle < 200 else 4.
+            PV = rng.normal(size = 3)*5
+            MV = self.bank.calculate(SP, PV, 0.5)
+            for k, pid in enumerate(self.pids):
+                pid.calculate(SP, PV[k], 0.5)
+                self.assertEqual(MV[k], pid.MV[-1])
+        for variable in PIDBank.traces:
+            for k, pid in enumerate(self.pids):
+                np.testing.assert_array_equal(getattr(self.bank, "{}[{}]".format(variable, k)).values()[1:], getattr(pid, variable)[1:])
+
+    def test_loops(self):
+        self.bank.calculate(1., np.array([0., 1., 2.]), 0.)
+        self.assertEqual(getattr(self.bank, "PV[c]")[-1], 2.)
+        self.assertEqual(getattr(self.bank, "PV[2]")[-1], 2.)
+        self.assertEqual(len(getattr(self.bank, "MV[a]")), 2)
+        with self.assertRaises(AttributeError):
+            getattr(self.bank, "MV[d]")
+        with self.assertRaises(AttributeError):
+            getattr(self.bank, "Kp[a]")
+
+    def test_names(self):
+        with self.assertRaises(ValueError):
+            PIDBank(0.01, [{"name": "a", "Kp": 1, "Ti": 1, "Td": 0}]*2)
+        bank = PIDBank(0.01, [{"Kp": 1, "Ti": 1, "Td": 0}]*2)
+        self.assertListEqual(bank.names, ["0", "1"])
+
+if __name__ == '__main__':
+    unittest.main()
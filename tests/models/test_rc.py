@@ -1,3 +1,5 @@
+import math
+import numpy as np
 import unittest
 from simulator.models.rc import RC
 
@@ -25,3 +27,20 @@ class TestRC(unittest.TestCase):
         self.assertAlmostEqual(self.rc.Vc[-1], Vc)
         self.assertAlmostEqual(self.rc.Vr[-1], Vr)
         self.assertAlmostEqual(self.rc.i[-1], i)
+
+    def test_zoh(self):
+        rc = RC(0.5, self.R, self.C, self.Q, integrator = "zoh")
+        Vin = 10.0
+        for k in range(1, 5):
+            Q = rc.calculate(Vin)
+            self.assertAlmostEqual(Q, self.C*Vin*(1 - math.exp(-k*0.5/(self.R*self.C))))
+
+    def test_state_space(self):
+        Vin = 10.0
+        for integrator in ["euler", "zoh"]:
+            rc = RC(0.1, self.R, self.C, 1., integrator = integrator)
+            ss = rc.state_space()
+            x = np.array(rc.linear_state())
+            rc.calculate(Vin)
+            np.testing.assert_allclose(ss.C @ x + ss.D @ [Vin] + ss.c, [getattr(rc, v)[-1] for v in ss.outputs])
+            np.testing.assert_allclose(ss.A @ x + ss.B @ [Vin] + ss.a, rc.linear_state())
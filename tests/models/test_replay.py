@@ -0,0 +1,105 @@
+import os
+import pickle
+import tempfile
+import unittest
+import numpy as np
+from simulator.models.signal_replay import SignalReplay
+from simulator.utils.series import CSVSeries
+
+class TestSignalReplay(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        # samples every 0.25 s, from t = 1
+        self.times = 1 + 0.25*np.arange(400)
+        self.values = np.sin(self.times)
+        self.data = np.column_stack((self.times, self.values))
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.dir.name, name)
+
+    def expected(self, t, interpolation):
+        if interpolation == "linear":
+            return np.interp(t, self.times, self.values)
+        return self.values[np.maximum(np.searchsorted(self.times, t, side = "right") - 1, 0)]
+
+    def replay(self, model, cycles):
+        for cycle in range(1, cycles):
+            model.calculate(cycle)
+        return np.array(model.current_value)
+
+    def files(self):
+        np.save(self.path("series.npy"), self.data)
+        self.data.tofile(self.path("series.bin"))
+        np.savetxt(self.path("series.csv"), self.data, delimiter = ",", header = "time,value", comments = "")
+        return [self.path(name) for name in ("series.npy", "series.bin", "series.csv")]
+
+    def test_formats(self):
+        cycles = 1200
+        for path in self.files():
+            for interpolation in SignalReplay.interpolations:
+                with self.subTest(path = path, interpolation = interpolation):
+                    model = SignalReplay(0.1, path, interpolation, start = 0.)
+                    model.chunk = 64
+                    values = self.replay(model, cycles)
+                    expected = self.expected(0.1*np.arange(cycles), interpolation)
+                    np.testing.assert_allclose(values, expected, rtol = 0, atol = 1e-12)
+
+    def test_start(self):
+        model = SignalReplay(0.25, self.files()[0])
+        self.assertEqual(model.current_value[0], self.values[0])
+        model.calculate(1)
+        self.assertEqual(model.current_value[1], self.values[1])
+
+    def test_period(self):
+        np.save(self.path("values.npy"), self.values)
+        model = SignalReplay(0.1, self.path("values.npy"), "linear", period = 0.25)
+        model.chunk = 50
+        values = self.replay(model, 500)
+        expected = np.interp(0.1*np.arange(500), 0.25*np.arange(len(self.values)), self.values)
+        np.testing.assert_allclose(values, expected, rtol = 0, atol = 1e-12)
+
+    def test_csv_window(self):
+        np.savetxt(self.path("series.csv"), self.data, delimiter = ",")
+        series = CSVSeries(self.path("series.csv"))
+        series.block = 200
+        times, values = series.window(50., 60.)
+        self.assertLessEqual(times[0], 50.)
+        self.assertGreaterEqual(times[-1], 60.)
+        # earlier samples are dropped, going back reads the file again
+        self.assertLess(len(times), len(self.times))
+        times, values = series.window(1., 2.)
+        np.testing.assert_array_equal(times[:5], self.times[:5])
+
+    def test_csv_columns(self):
+        data = np.column_stack((self.values, self.times))
+        np.savetxt(self.path("series.csv"), data, delimiter = ",", header = "PV,time", comments = "")
+        model = SignalReplay(0.25, self.path("series.csv"), time_column = "time", value_column = "PV")
+        self.assertEqual(model.current_value[0], self.values[0])
+        with self.assertRaises(ValueError):
+            SignalReplay(0.25, self.path("series.csv"), value_column = "MV")
+
+    def test_pickle(self):
+        model = SignalReplay(0.1, self.files()[2], "linear")
+        model.calculate(1)
+        copy = pickle.loads(pickle.dumps(model))
+        self.assertEqual(copy.trajectory, [])
+        self.assertEqual(copy.calculate(2), model.calculate(2))
+
+    def test_empty(self):
+        with open(self.path("empty.csv"), "w") as wf:
+            wf.write("time,value\n")
+        open(self.path("blank.csv"), "w").close()
+        np.save(self.path("empty.npy"), np.empty((0, 2)))
+        for name in ("empty.csv", "blank.csv", "empty.npy"):
+            with self.subTest(name = name), self.assertRaisesRegex(ValueError, "Empty series"):
+                SignalReplay(0.1, self.path(name))
+
+    def test_unknown_interpolation(self):
+        with self.assertRaises(ValueError):
+            SignalReplay(0.1, self.files()[0], "cubic")
+
+if __name__ == '__main__':
+    unittest.main()
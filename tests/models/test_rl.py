@@ -1,5 +1,7 @@
+import math
+import numpy as np
 import unittest
-from simulator.models.rl import RL
+from simulator.models.rl import RL, RLLimitedVr
 
 class TestRL(unittest.TestCase):
     def setUp(self):
@@ -22,3 +24,32 @@ class TestRL(unittest.TestCase):
         self.assertAlmostEqual(self.rl.calculate(Vin), newi)
         self.assertAlmostEqual(self.rl.Vr[-1], Vr)
         self.assertAlmostEqual(self.rl.Vl[-1], Vl)
+
+    def test_zoh(self):
+        rl = RL(0.5, self.R, self.L, self.i, integrator = "zoh")
+        Vin = 10.0
+        for k in range(1, 5):
+            i = rl.calculate(Vin)
+            self.assertAlmostEqual(i, Vin/self.R*(1 - math.exp(-k*0.5*self.R/self.L)))
+
+    def test_state_space(self):
+        Vin = 10.0
+        for rl in [RL(0.1, self.R, self.L, 1., integrator = "rk4"), RLLimitedVr(0.1, self.R, self.L, 1., 8.)]:
+            ss = rl.state_space()
+            x = np.array(rl.linear_state())
+            rl.calculate(Vin)
+            y = ss.C @ x + ss.D @ [Vin] + ss.c
+            np.testing.assert_allclose(y, [getattr(rl, v)[-1] for v in ss.outputs])
+            np.testing.assert_allclose(ss.A @ x + ss.B @ [Vin] + ss.a, rl.linear_state())
+            self.assertTrue(rl.linear_region(x[:, None], np.array([[Vin]]), y[:, None]).all())
+
+    def test_integrators(self):
+        Vin = 10.0
+        exact = Vin/self.R*(1 - math.exp(-0.1*self.R/self.L))
+        for integrator in ["euler", "backward_euler", "trapezoidal", "rk4"]:
+            rl = RL(0.1, self.R, self.L, self.i, integrator = integrator)
+            self.assertAlmostEqual(rl.calculate(Vin), exact, places = 1)
+
+    def test_unknown_integrator(self):
+        with self.assertRaises(ValueError):
+            RL(self.dt, self.R, self.L, self.i, integrator = "leapfrog")
@@ -1,3 +1,4 @@
+import pickle
 import unittest
 from simulator.models.signal_generator import SignalGenerator
 
@@ -60,3 +61,46 @@ class TestSignalGenerator(unittest.TestCase):
         self.sig.calculate(7)
         self.assertEqual(self.sig.current_value[-1], self.step_value + 2 - 2)
 
+
+    def test_held_until(self):
+        # start holds until the step, which holds until the ramp
+        self.assertEqual(self.sig.held_until(0), 1)
+        self.sig.calculate(0)
+        self.assertEqual(self.sig.held_until(1), 2)
+        self.sig.calculate(1)
+        # ramps change on every cycle
+        self.assertEqual(self.sig.held_until(2), 3)
+        for cycle in range(2, 6):
+            self.sig.calculate(cycle)
+        # the pause holds forever
+        self.assertIsNone(self.sig.held_until(6))
+
+    def test_chunks(self):
+        reference = SignalGenerator(self.events)
+        sig = SignalGenerator(self.events)
+        sig.chunk = 3
+        for cycle in range(20):
+            self.assertEqual(sig.calculate(cycle), reference.calculate(cycle))
+        # going back, as after restoring a snapshot
+        self.assertEqual(sig.calculate(4), reference.current_value[5])
+
+    def test_many_events(self):
+        events = [{"start": {"value": 0}}] + [{"step": {"cycle": cycle, "value": cycle}} for cycle in range(10, 100000, 10)]
+        sig = SignalGenerator(events)
+        for cycle in range(100000):
+            sig.calculate(cycle)
+        self.assertListEqual(list(sig.current_value[1:]), [cycle//10*10 for cycle in range(100000)])
+        self.assertEqual(sig.next_event(55), 60)
+        self.assertIsNone(sig.next_event(100000))
+
+    def test_pickle(self):
+        for cycle in range(3):
+            self.sig.calculate(cycle)
+        sig = pickle.loads(pickle.dumps(self.sig))
+        self.assertListEqual(sig.trajectory, [])
+        for cycle in range(3, 8):
+            self.assertEqual(sig.calculate(cycle), self.sig.calculate(cycle))
+
+    def test_unknown_event(self):
+        with self.assertRaises(ValueError):
+            SignalGenerator([{"sine": {"cycle": 10, "value": 1}}])
@@ -0,0 +1,788 @@
+import os
+import json
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import simulator
+from simulator.simulator import Simulator
+from simulator.utils.recording import Recording
+from simulator.utils.snapshot import Snapshot
+from simulator.utils.history import LatestValue
+from simulator.utils.performance_meter import PerformanceMeter
+from simulator.utils.adaptive import AdaptiveStep
+from simulator.utils.codegen import StepWriter
+
+EXAMPLES = os.path.join(os.path.dirname(simulator.__file__), "settings", "models", "examples")
+
+class TestSimulator(unittest.TestCase):
+    def setUp(self):
+        self.sim = Simulator(os.path.join(EXAMPLES, "rl_plus_pid"), 0.001, 1)
+
+    def test_compiled_plan(self):
+        self.sim.run()
+        plan = self.sim.compile_plan()
+        self.assertEqual(len(plan), len(self.sim.execution_list))
+        for (calculate, resolvers), model_definition in zip(plan, self.sim.execution_list):
+            inputs = self.sim.get_model_inputs(model_definition)
+            self.assertEqual(calculate, self.sim.models[model_definition["name"]].calculate)
+            self.assertListEqual([resolve() for resolve in resolvers], list(inputs.values()))
+
+    def test_run(self):
+        self.sim.run()
+        self.assertEqual(len(self.sim.t), self.sim.cycles + 1)
+        self.assertEqual(len(self.sim.models["rl"].Vr), self.sim.cycles + 1)
+
+    def test_reset(self):
+        # a simulator reset runs as a new one
+        for scenario in sorted(os.listdir(EXAMPLES)):
+            with self.subTest(scenario = scenario):
+                sim = Simulator(os.path.join(EXAMPLES, scenario), 0.001, 1, record = "all")
+                sim.run()
+                expected = {name: {v: np.array(getattr(m, v), dtype = float) for v in m.traces} for name, m in sim.models.items()}
+                sim.stop_running()
+                sim.reset()
+                sim.run()
+                for name, model in sim.models.items():
+                    for variable, values in expected[name].items():
+                        np.testing.assert_array_equal(np.array(getattr(model, variable), dtype = float), values)
+
+class TestScheduling(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        for f in os.listdir(os.path.join(EXAMPLES, "rl_plus_pid")):
+            with open(os.path.join(EXAMPLES, "rl_plus_pid", f), "r") as rf:
+                spec = json.load(rf)
+            # orders that contradict the inputs
+            spec["order"] = {"sig": 2, "rl": 1, "pid": 0}[spec["name"]]
+            with open(os.path.join(self.tmp.name, f), "w") as wf:
+                json.dump(spec, wf)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_order_from_inputs(self):
+        sim = Simulator(self.tmp.name, 0.001, 1)
+        self.assertListEqual([spec["name"] for spec in sim.execution_list], ["rl", "sig", "pid"])
+        self.assertListEqual([[spec["name"] for spec in level] for level in sim.execution_levels], [["rl", "sig"], ["pid"]])
+
+    def test_algebraic_loop(self):
+        with open(os.path.join(self.tmp.name, "pid.json"), "r") as rf:
+            spec = json.load(rf)
+        # Vl depends on the input of the same cycle
+        spec["inputs"]["PV"]["variable"] = "Vl"
+        with open(os.path.join(self.tmp.name, "pid.json"), "w") as wf:
+            json.dump(spec, wf)
+        with self.assertRaises(ValueError):
+            Simulator(self.tmp.name, 0.001, 1)
+
+class TestMultiRate(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.write_scenario(0.01)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_scenario(self, sample_time):
+        for f in os.listdir(os.path.join(EXAMPLES, "rl_plus_pid")):
+            with open(os.path.join(EXAMPLES, "rl_plus_pid", f), "r") as rf:
+                spec = json.load(rf)
+            if spec["name"] == "pid":
+                spec["sample_time"] = sample_time
+            with open(os.path.join(self.tmp.name, f), "w") as wf:
+                json.dump(spec, wf)
+
+    def test_sample_time(self):
+        sim = Simulator(self.tmp.name, 0.001, 1)
+        sim.record("rl", "Vin")
+        sim.run()
+        self.assertEqual(sim.models["pid"].dt, 0.01)
+        self.assertEqual(len(sim.models["pid"].MV), sim.cycles//10 + 1)
+        self.assertEqual(len(sim.models["rl"].Vin), sim.cycles + 1)
+        self.assertEqual(len(sim.get_time("pid", "MV")), len(sim.models["pid"].MV))
+        self.assertAlmostEqual(sim.get_time("pid", "MV")[2], 0.011)
+        # zero-order hold: the RL reads the MV of the last calculation
+        np.testing.assert_array_equal(sim.models["rl"].Vin[2:12], [sim.models["pid"].MV[1]]*10)
+
+    def test_default_meter(self):
+        # the meter takes the settings of the simulator when given none
+        sim = Simulator(self.tmp.name, 0.001, 1)
+        pf = PerformanceMeter(sim)
+        self.assertEqual(pf.config, simulator.settings.simulator_settings["performance_meter"])
+        self.assertEqual(pf.ticks, 1)
+
+    def test_invalid_sample_time(self):
+        self.write_scenario(0.0105)
+        with self.assertRaises(ValueError):
+            Simulator(self.tmp.name, 0.001, 1)
+
+class TestSignalReplay(unittest.TestCase):
+    def setUp(self):
+        # rl_plus_pid replaying the SP recorded from its signal generator
+        self.tmp = tempfile.TemporaryDirectory()
+        self.sim = Simulator(os.path.join(EXAMPLES, "rl_plus_pid"), 0.001, 1)
+        self.sim.run()
+        SP = np.array(self.sim.models["sig"].current_value)
+        np.save(os.path.join(self.tmp.name, "sp.npy"), np.column_stack((0.001*np.arange(len(SP)), SP)))
+        for f in os.listdir(os.path.join(EXAMPLES, "rl_plus_pid")):
+            with open(os.path.join(EXAMPLES, "rl_plus_pid", f), "r") as rf:
+                spec = json.load(rf)
+            if spec["name"] == "sig":
+                spec["class"] = "SignalReplay"
+                spec["params"] = {"path": os.path.join(self.tmp.name, "sp.npy")}
+            with open(os.path.join(self.tmp.name, f), "w") as wf:
+                json.dump(spec, wf)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_same_results(self):
+        sim = Simulator(self.tmp.name, 0.001, 1)
+        sim.run()
+        np.testing.assert_array_equal(sim.models["sig"].current_value, self.sim.models["sig"].current_value)
+        np.testing.assert_array_equal(sim.models["rl"].Vr, self.sim.models["rl"].Vr)
+
+    def test_sample_time(self):
+        # a series changing on every millisecond, sampled every 10 cycles
+        t = 0.001*np.arange(1001)
+        np.save(os.path.join(self.tmp.name, "sp.npy"), np.column_stack((t, 10 + np.sin(5*t))))
+        with open(os.path.join(self.tmp.name, "sig.json"), "r") as rf:
+            spec = json.load(rf)
+        spec["sample_time"] = 0.01
+        with open(os.path.join(self.tmp.name, "sig.json"), "w") as wf:
+            json.dump(spec, wf)
+        sim = Simulator(self.tmp.name, 0.001, 1)
+        sim.run()
+        # its initial value, then the values of cycles 0, 10, 20... on the clock of the simulator
+        np.testing.assert_array_equal(sim.models["sig"].current_value, 10 + np.sin(5*np.concatenate(([0.], t[:-1:10]))))
+
+class TestParallel(unittest.TestCase):
+    def setUp(self):
+        # two copies of rl_series_with_rc and rl_plus_pid, which don't interact
+        self.tmp = tempfile.TemporaryDirectory()
+        for scenario, suffix in [("rl_series_with_rc", "a"), ("rl_plus_pid", "b")]:
+            for f in os.listdir(os.path.join(EXAMPLES, scenario)):
+                with open(os.path.join(EXAMPLES, scenario, f), "r") as rf:
+                    text = rf.read()
+                for name in ["sig", "rc", "rl", "pid"]:
+                    text = text.replace('"{}"'.format(name), '"{}_{}"'.format(name, suffix))
+                with open(os.path.join(self.tmp.name, suffix + f), "w") as wf:
+                    wf.write(text)
+        self.pf_config = {
+            "enabled": True,
+            "measurements": [{
+                "class": "Overshoot",
+                "name": "overshoot",
+                "settings": {
+                    "Y": {"object_name": "rl_b", "attribute": "Vr"},
+                    "SP": {"object_name": "sig_b", "attribute": "current_value"}
+                }
+            }]
+        }
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_components(self):
+        sim = Simulator(self.tmp.name, 0.001, 1)
+        groups = sorted(sorted(group) for group in sim.components())
+        self.assertListEqual(groups, [["pid_b", "rl_b", "sig_b"], ["rc_a", "rl_a", "sig_a"]])
+
+    def test_same_results(self):
+        reference = Simulator(self.tmp.name, 0.001, 1)
+        reference_pf = PerformanceMeter(reference, self.pf_config)
+        reference.run(None, reference_pf)
+        sim = Simulator(self.tmp.name, 0.001, 1)
+        pf = PerformanceMeter(sim, self.pf_config)
+        sim.run_parallel(pf, 2)
+        np.testing.assert_array_equal(sim.t.values(), reference.t.values())
+        for name in ["rl_a", "rl_b"]:
+            np.testing.assert_array_equal(sim.models[name].Vr.values(), reference.models[name].Vr.values())
+        self.assertEqual(pf.measurements["overshoot"].max, reference_pf.measurements["overshoot"].max)
+
+class TestSelectiveRecording(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(EXAMPLES, "rl_plus_pid")
+
+    def test_observed(self):
+        sim = Simulator(self.path, 0.001, 1)
+        sim.record("rl", "i")
+        sim.run()
+        self.assertEqual(len(sim.models["rl"].Vr), sim.cycles + 1)
+        self.assertEqual(len(sim.models["rl"].i), sim.cycles + 1)
+        self.assertIsInstance(sim.models["rl"].Vl, LatestValue)
+        self.assertIsInstance(sim.models["pid"].PG, LatestValue)
+
+    def test_same_results(self):
+        reference = Simulator(self.path, 0.001, 1, record = "all")
+        reference.run()
+        sim = Simulator(self.path, 0.001, 1)
+        sim.run()
+        for name in reference.models:
+            for variable in reference.models[name].traces:
+                np.testing.assert_equal(getattr(sim.models[name], variable)[-1], getattr(reference.models[name], variable)[-1])
+
+class TestStreamingSimulator(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.stream = {"path": self.tmp.name, "window": 100, "chunk": 50}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_stream(self):
+        path = os.path.join(EXAMPLES, "rl_plus_pid")
+        reference = Simulator(path, 0.001, 1)
+        reference.run()
+        sim = Simulator(path, 0.001, 1, self.stream)
+        sim.run()
+        self.assertLessEqual(len(sim.models["rl"].Vr), 150)
+        self.assertEqual(sim.models["rl"].Vr[-1], reference.models["rl"].Vr[-1])
+        recording = Recording(self.tmp.name)
+        np.testing.assert_array_equal(recording["rl.Vr"], reference.models["rl"].Vr.values())
+        np.testing.assert_array_equal(recording["t"], reference.t.values())
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(EXAMPLES, "pid_limited_integral_rl")
+        self.pf_config = {
+            "enabled": True,
+            "measurements": [{
+                "class": "Overshoot",
+                "name": "overshoot",
+                "settings": {
+                    "Y": {"object_name": "rl", "attribute": "Vr"},
+                    "SP": {"object_name": "sig", "attribute": "current_value"}
+                }
+            }]
+        }
+        self.reference = Simulator(self.path, 0.001, 2)
+        self.reference_pf = PerformanceMeter(self.reference, self.pf_config)
+        self.reference.run(None, self.reference_pf)
+        self.sim = Simulator(self.path, 0.001, 2)
+        self.pf = PerformanceMeter(self.sim, self.pf_config)
+        self.sim.run(None, self.pf, until = 1)
+
+    def assertSameRun(self, sim, pf):
+        np.testing.assert_array_equal(sim.t.values(), self.reference.t.values())
+        np.testing.assert_array_equal(sim.models["rl"].Vr.values(), self.reference.models["rl"].Vr.values())
+        self.assertEqual(pf.measurements["overshoot"].max, self.reference_pf.measurements["overshoot"].max)
+
+    def test_until(self):
+        self.assertEqual(self.sim.completed, 1000)
+        self.sim.run(None, self.pf)
+        self.assertSameRun(self.sim, self.pf)
+
+    def test_restore(self):
+        snapshot = self.sim.snapshot(self.pf)
+        for _ in range(2):
+            self.sim.restore(snapshot, self.pf)
+            self.sim.run(None, self.pf)
+            self.assertSameRun(self.sim, self.pf)
+
+    def test_fork(self):
+        sim = self.sim.fork()
+        pf = self.pf.fork(sim)
+        sim.run(None, pf)
+        self.assertSameRun(sim, pf)
+        self.assertEqual(self.sim.completed, 1000)
+        self.sim.run(None, self.pf)
+        self.assertSameRun(self.sim, self.pf)
+
+    def test_save(self):
+        with tempfile.TemporaryDirectory() as path:
+            self.sim.snapshot(self.pf).save(os.path.join(path, "snapshot.pkl"))
+            snapshot = Snapshot.load(os.path.join(path, "snapshot.pkl"))
+        sim = Simulator(self.path, 0.001, 2)
+        pf = PerformanceMeter(sim, self.pf_config)
+        sim.restore(snapshot, pf)
+        sim.run(None, pf)
+        self.assertSameRun(sim, pf)
+
+    def test_different_simulation(self):
+        snapshot = self.sim.snapshot()
+        with self.assertRaises(ValueError):
+            Simulator(os.path.join(EXAMPLES, "rl_plus_pid"), 0.001, 2).restore(snapshot)
+
+class TestFastForward(unittest.TestCase):
+    def run_sim(self, fast_forward):
+        sim = Simulator(os.path.join(EXAMPLES, "pid_limited_integral_rl"), 0.001, 40, fast_forward = fast_forward)
+        # settles within a few seconds, before the step at 35 s
+        sim.set_parameter("rl", "L", 1.)
+        pf = PerformanceMeter(sim, simulator.settings.simulator_settings["performance_meter"])
+        sim.run(None, pf)
+        return sim, pf
+
+    def test_same_results(self):
+        reference, reference_pf = self.run_sim(None)
+        with mock.patch.object(Simulator, "skip_steady_state", autospec = True, side_effect = Simulator.skip_steady_state) as skip:
+            sim, pf = self.run_sim({"tolerance": 0, "cycles": 100})
+        self.assertTrue(skip.called)
+        np.testing.assert_array_equal(sim.t.values(), reference.t.values())
+        # the step of the signal generator isn't skipped
+        np.testing.assert_array_equal(sim.models["sig"].current_value.values(), reference.models["sig"].current_value.values())
+        # values that stopped changing exactly are held exactly
+        np.testing.assert_array_equal(sim.models["rl"].Vr.values(), reference.models["rl"].Vr.values())
+        self.assertEqual(pf.result_to_string(), reference_pf.result_to_string())
+
+    def test_tolerance(self):
+        reference, reference_pf = self.run_sim(None)
+        sim, pf = self.run_sim({"tolerance": 1e-9, "cycles": 100})
+        self.assertLess(len(set(sim.models["rl"].Vr.values())), len(set(reference.models["rl"].Vr.values())))
+        np.testing.assert_allclose(sim.models["rl"].Vr.values(), reference.models["rl"].Vr.values(), atol = 1e-5)
+        self.assertEqual(pf.measurements["settling_time"].settle_time, reference_pf.measurements["settling_time"].settle_time)
+        self.assertAlmostEqual(pf.measurements["overshoot"].max, reference_pf.measurements["overshoot"].max)
+
+    def test_hidden_state(self):
+        def scenario(fast_forward):
+            # SP out of reach of the MV, the integral winds up until the step at 30 s
+            sim = Simulator(None, 0.001, 40, fast_forward = fast_forward)
+            specs = [{"name": "sig", "class": "SignalGenerator", "inputs": {"cycle": {"variable": "i"}},
+                    "params": {"events": [{"start": {"value": 10}}, {"step": {"cycle": 30000, "value": 2}}]}},
+                {"name": "rl", "class": "RL", "params": {"resistance": 1, "inductance": 0.1, "current": 0.},
+                    "inputs": {"Vin": {"model": "pid", "variable": "MV"}}},
+                {"name": "pid", "class": "PIDLimitedMV", "params": {"Kp": 1, "Ti": 2, "Td": 0, "max_MV": 5},
+                    "inputs": {"SP": {"model": "sig", "variable": "current_value"}, "PV": {"model": "rl", "variable": "Vr"}, "FWD": {"value": 0}}}]
+            for spec in specs:
+                spec["enabled"] = True
+                sim.models.update(sim.add_model(spec))
+            sim.schedule()
+            sim.allocate()
+            sim.record("pid", "IG")
+            sim.run()
+            return sim
+        reference = scenario(None)
+        with mock.patch.object(Simulator, "skip_steady_state", autospec = True, side_effect = Simulator.skip_steady_state) as skip:
+            sim = scenario({"tolerance": 1e-4, "cycles": 100})
+        self.assertTrue(skip.called)
+        # the integral went on winding up while skipped
+        self.assertAlmostEqual(sim.models["pid"].IG[30001], reference.models["pid"].IG[30001], places = 6)
+        self.assertAlmostEqual(sim.models["pid"].I.m0, reference.models["pid"].I.m0, places = 6)
+
+    def test_ensemble(self):
+        with self.assertRaises(ValueError):
+            Simulator(os.path.join(EXAMPLES, "rl_plus_pid"), 0.001, 1, ensemble = 2, fast_forward = {"tolerance": 0, "cycles": 10})
+
+class TestAdaptive(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.adaptive = {"tolerance": 1e-6, "max_step": 0.1}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_scenario(self, scenario, integrator, sample_time = None):
+        for f in os.listdir(os.path.join(EXAMPLES, scenario)):
+            with open(os.path.join(EXAMPLES, scenario, f), "r") as rf:
+                spec = json.load(rf)
+            if spec["class"].startswith("RL"):
+                spec["integrator"] = integrator
+            if spec["class"].startswith("PID") and sample_time:
+                spec["sample_time"] = sample_time
+            with open(os.path.join(self.tmp.name, f), "w") as wf:
+                json.dump(spec, wf)
+
+    def test_fewer_steps(self):
+        self.write_scenario("rl_limited_vr", "zoh")
+        reference = Simulator(self.tmp.name, 0.001, 10, record = "all")
+        reference.run()
+        sim = Simulator(self.tmp.name, 0.001, 10, record = "all", adaptive = self.adaptive)
+        sim.run()
+        self.assertEqual(sim.completed, sim.cycles)
+        self.assertLess(len(sim.t), sim.cycles/10)
+        self.assertEqual(len(sim.models["rl_limited_vr"].i), len(sim.t))
+        # zoh is exact on held inputs, whatever the step
+        t = sim.t.values()
+        np.testing.assert_allclose(sim.models["rl_limited_vr"].i.values(), np.interp(t, reference.t.values(), reference.models["rl_limited_vr"].i.values()), atol = 1e-9)
+
+    def test_events_and_sample_times(self):
+        self.write_scenario("rl_plus_pid", "rk4", 0.01)
+        sim = Simulator(self.tmp.name, 0.001, 20, adaptive = self.adaptive)
+        sim.record("sig", "current_value")
+        sim.run()
+        t = sim.t.values()
+        self.assertLess(len(t), sim.cycles)
+        # the PID keeps its sample time
+        self.assertEqual(len(sim.models["pid"].MV), sim.cycles//10 + 1)
+        # and its MV reaches the RL on the cycle after, as on fixed steps
+        cycles = np.round(t/0.001).astype(int)
+        self.assertTrue(np.isin(np.arange(1, sim.cycles, 10), cycles).all())
+        # the step at cycle 6000 is hit exactly
+        value = sim.models["sig"].current_value.values()
+        k = np.argmin(np.abs(t - 6.))
+        self.assertAlmostEqual(t[k], 6.)
+        self.assertEqual(value[k], 10.)
+        self.assertEqual(value[k + 1], 0.)
+
+    def test_rejected_steps(self):
+        self.write_scenario("rl_series_with_rc", "euler")
+        reference = Simulator(self.tmp.name, 0.001, 10, record = "all")
+        reference.run()
+        # error of each step accepted, and calculations of the RL
+        accepted = []
+        control = AdaptiveStep.control
+        def controlled(stepper, cycles):
+            cycles = control(stepper, cycles)
+            accepted.append((cycles, max(model.local_error for model in stepper.continuous)))
+            return cycles
+        sim = Simulator(self.tmp.name, 0.001, 10, record = "all", adaptive = self.adaptive)
+        calculated = []
+        sim.models["rl"].calculate = lambda Vin, calculate = sim.models["rl"].calculate: calculated.append(Vin) or calculate(Vin)
+        with mock.patch.object(AdaptiveStep, "control", autospec = True, side_effect = controlled):
+            sim.run()
+        self.assertEqual(sim.completed, sim.cycles)
+        self.assertGreater(len(calculated), len(accepted))
+        self.assertTrue(all(error <= self.adaptive["tolerance"] or cycles == 1 for cycles, error in accepted))
+        # steps redone leave nothing behind
+        for variable in sim.models["rl"].traces:
+            self.assertEqual(len(getattr(sim.models["rl"], variable)), len(sim.t))
+        t = sim.t.values()
+        np.testing.assert_allclose(sim.models["rl"].i.values(), np.interp(t, reference.t.values(), reference.models["rl"].i.values()), atol = 1e-3)
+
+    def test_every_cycle(self):
+        # a PID without sample time is calculated on every cycle
+        self.write_scenario("rl_plus_pid", "zoh")
+        sim = Simulator(self.tmp.name, 0.001, 1, adaptive = self.adaptive)
+        with self.assertWarns(UserWarning):
+            sim.run()
+        self.assertEqual(len(sim.t), sim.cycles + 1)
+
+    def test_continuous_sample_time(self):
+        with open(os.path.join(EXAMPLES, "rl_limited_vr", "rl_limited_vr.json"), "r") as rf:
+            spec = json.load(rf)
+        spec["sample_time"] = 0.01
+        sim = Simulator(None, 0.001, 1, adaptive = self.adaptive)
+        sim.models.update(sim.add_model(spec))
+        sim.allocate()
+        with self.assertRaises(ValueError):
+            sim.run()
+
+class TestLinear(unittest.TestCase):
+    def run_sim(self, scenario, linear, duration = 20):
+        sim = Simulator(os.path.join(EXAMPLES, scenario), 0.001, duration, record = "all", linear = linear)
+        # count the cycles calculated one by one
+        calculated = []
+        sim.models["sig"].calculate = lambda cycle, calculate = sim.models["sig"].calculate: calculated.append(cycle) or calculate(cycle)
+        sim.run()
+        return sim, len(calculated)
+
+    def assertClose(self, sim, reference):
+        np.testing.assert_array_equal(sim.t.values(), reference.t.values())
+        for name, model in reference.models.items():
+            for variable in model.traces:
+                np.testing.assert_allclose(np.asarray(getattr(sim.models[name], variable)), np.asarray(getattr(model, variable)), rtol = 1e-9, atol = 1e-9, err_msg = name + "." + variable)
+
+    def test_same_results(self):
+        for scenario in os.listdir(EXAMPLES):
+            reference, _ = self.run_sim(scenario, None)
+            sim, calculated = self.run_sim(scenario, {"retry": 64})
+            self.assertClose(sim, reference)
+
+    def test_linear_scenario(self):
+        reference, _ = self.run_sim("rl_plus_pid", None)
+        sim, calculated = self.run_sim("rl_plus_pid", {"retry": 64})
+        self.assertClose(sim, reference)
+        # only the first cycles and the events are calculated one by one
+        self.assertLess(calculated, 10)
+        self.assertEqual(sim.completed, sim.cycles)
+
+    def test_nonlinear(self):
+        # Vr is limited from about 8 s on
+        reference, _ = self.run_sim("rl_limited_vr", None)
+        sim, calculated = self.run_sim("rl_limited_vr", {"retry": 64})
+        self.assertClose(sim, reference)
+        self.assertLess(calculated, sim.cycles*0.7)
+        self.assertGreater(calculated, sim.cycles/2)
+        self.assertEqual(np.nanmax(sim.models["rl_limited_vr"].Vr.values()), 8.)
+
+    def test_until(self):
+        reference, _ = self.run_sim("pid_limited_integral_rl", None, 5)
+        sim = Simulator(os.path.join(EXAMPLES, "pid_limited_integral_rl"), 0.001, 5, record = "all", linear = {"retry": 64})
+        sim.run(until = 2.5)
+        self.assertEqual(sim.completed, 2500)
+        sim.run()
+        self.assertClose(sim, reference)
+
+    def test_unsupported(self):
+        # a PID with a sample time, or a model without state-space form
+        with open(os.path.join(EXAMPLES, "rl_plus_pid", "pid.json"), "r") as rf:
+            spec = json.load(rf)
+        spec["sample_time"] = 0.01
+        bank = {"name": "bank", "class": "PIDBank", "enabled": True, "params": {"loops": [{"Kp": 1, "Ti": 1, "Td": 0}]},
+            "inputs": {"SP": {"value": 5}, "PV": [{"model": "rl", "variable": "Vr"}], "FWD": [{"value": 0}]}}
+        for scenario in [[spec], [bank]]:
+            sims = []
+            for linear in [None, {"retry": 64}]:
+                sim = Simulator(os.path.join(EXAMPLES, "rl_plus_pid"), 0.001, 2, record = "all", linear = linear)
+                for added in scenario:
+                    sim.models.update(sim.add_model(added))
+                sim.schedule()
+                sim.allocate()
+                sims.append(sim)
+            sims[0].run()
+            # calculated cycle by cycle instead
+            with self.assertWarns(UserWarning):
+                sims[1].run()
+            self.assertEqual(sims[1].completed, sims[1].cycles)
+            for name, model in sims[0].models.items():
+                for variable in model.traces:
+                    np.testing.assert_array_equal(np.asarray(getattr(sims[1].models[name], variable)), np.asarray(getattr(model, variable)))
+
+class TestCompiled(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_scenario(self, scenario, integrator, sample_time = None):
+        for f in os.listdir(os.path.join(EXAMPLES, scenario)):
+            with open(os.path.join(EXAMPLES, scenario, f), "r") as rf:
+                spec = json.load(rf)
+            if spec["class"] in ["RC", "RL", "RLLimitedVr"]:
+                spec["integrator"] = integrator
+            if spec["class"].startswith("PID") and sample_time:
+                spec["sample_time"] = sample_time
+            with open(os.path.join(self.tmp.name, f), "w") as wf:
+                json.dump(spec, wf)
+
+    def assertSameTraces(self, sim, reference):
+        np.testing.assert_array_equal(sim.t.values(), reference.t.values())
+        self.assertEqual(sim.i, reference.i)
+        for name, model in reference.models.items():
+            for variable in model.traces:
+                trace = getattr(sim.models[name], variable)
+                self.assertEqual(type(trace), type(getattr(model, variable)))
+                np.testing.assert_array_equal(np.asarray(trace), np.asarray(getattr(model, variable)), err_msg = name + "." + variable)
+                np.testing.assert_array_equal(trace.last, getattr(model, variable).last)
+
+    def test_same_traces(self):
+        compiled = {class_.__name__ for class_ in StepWriter.EMITTERS}
+        for scenario in os.listdir(EXAMPLES):
+            with self.subTest(scenario = scenario):
+                classes = set()
+                for f in os.listdir(os.path.join(EXAMPLES, scenario)):
+                    with open(os.path.join(EXAMPLES, scenario, f), "r") as rf:
+                        classes.add(json.load(rf)["class"])
+                if not classes <= compiled:
+                    self.skipTest("{} can't be compiled".format(", ".join(sorted(classes - compiled))))
+                for integrator, sample_time in [("euler", None), ("zoh", 0.01)]:
+                    self.write_scenario(scenario, integrator, sample_time)
+                    for record in ["all", "observed"]:
+                        reference = Simulator(self.tmp.name, 0.001, 5, record = record)
+                        reference.run()
+                        sim = Simulator(self.tmp.name, 0.001, 5, record = record)
+                        sim.compile()
+                        sim.run(until = 2)
+                        sim.run()
+                        self.assertSameTraces(sim, reference)
+                    for f in os.listdir(self.tmp.name):
+                        os.remove(os.path.join(self.tmp.name, f))
+
+    def test_switch(self):
+        # the state left by a compiled run is carried on by the interpreter
+        path = os.path.join(EXAMPLES, "pid_limited_integral_rl")
+        reference = Simulator(path, 0.001, 5, record = "all")
+        reference.run()
+        sim = Simulator(path, 0.001, 5, record = "all")
+        sim.compile()
+        sim.run(until = 2)
+        sim.compiled = False
+        sim.run()
+        self.assertSameTraces(sim, reference)
+
+    def test_cache(self):
+        path = os.path.join(EXAMPLES, "rl_plus_pid")
+        step = Simulator(path, 0.001, 1).compile()
+        sim = Simulator(path, 0.001, 1)
+        sim.set_parameter("pid", "Kp", 2*sim.models["pid"].Kp)
+        self.assertIs(sim.compile(), step)
+        reference = Simulator(path, 0.001, 1)
+        reference.set_parameter("pid", "Kp", 2*reference.models["pid"].Kp)
+        reference.run()
+        sim.run()
+        self.assertSameTraces(sim, reference)
+        # other recorded variables give another function
+        self.assertIsNot(Simulator(path, 0.001, 1, record = "all").compile(), step)
+        # and runs don't write the function of their simulator again
+        with mock.patch.object(simulator.simulator, "step_function", wraps = simulator.simulator.step_function) as written:
+            sim = Simulator(path, 0.001, 1)
+            sim.compile()
+            sim.run(until = 0.5)
+            sim.run()
+            self.assertEqual(written.call_count, 1)
+            sim.set_parameter("pid", "Kp", 1.)
+            sim.compile()
+            self.assertEqual(written.call_count, 2)
+
+    def test_stop(self):
+        path = os.path.join(EXAMPLES, "rl_plus_pid")
+        calls = []
+        def stop(sim):
+            calls.append(sim.completed)
+            return sim.t[-1] >= 0.1
+        sim = Simulator(path, 0.001, 1)
+        sim.compile()
+        sim.run(stop = stop)
+        self.assertEqual(np.diff(calls).max(), simulator.simulator.COMPILED_STOP_CHUNK)
+        self.assertLess(sim.completed, 100 + simulator.simulator.COMPILED_STOP_CHUNK)
+        reference = Simulator(path, 0.001, 1)
+        reference.run(until = sim.completed*0.001)
+        self.assertSameTraces(sim, reference)
+
+    def test_not_compiled(self):
+        sim = Simulator(os.path.join(EXAMPLES, "rl_plus_pid"), 0.001, 1)
+        sim.models["rl"].__class__ = type("CustomRL", (simulator.simulator.RL,), {})
+        with self.assertRaises(ValueError):
+            sim.compile()
+        with self.assertRaises(ValueError):
+            Simulator(os.path.join(EXAMPLES, "rl_plus_pid"), 0.001, 1, ensemble = 2).compile()
+
+    def test_performance_meter(self):
+        path = os.path.join(EXAMPLES, "pid_limited_integral_rl")
+        config = {"enabled": True, "measurements": [{"class": "Overshoot", "name": "overshoot",
+            "settings": {"Y": {"object_name": "rl", "attribute": "Vr"}, "SP": {"object_name": "sig", "attribute": "current_value"}}}]}
+        reference = Simulator(path, 0.001, 1)
+        reference.run(None, PerformanceMeter(reference, config))
+        sim = Simulator(path, 0.001, 1)
+        pf = PerformanceMeter(sim, config)
+        sim.compile()
+        with self.assertWarns(UserWarning):
+            sim.run(None, pf)
+        self.assertSameTraces(sim, reference)
+
+class TestPIDBank(unittest.TestCase):
+    # three RL plants, controlled by a bank or by a PID each
+    loops = [
+        {"name": "a", "Kp": 2, "Ti": 1, "Td": 0.001, "min_MV": 0, "max_MV": 8},
+        {"name": "b", "Kp": 1.5, "Ti": 0.5, "Td": 0.01, "db_DG": 0.02, "max_MV": 12},
+        {"name": "c", "Kp": 1, "Ti": 0.3, "Td": 0.05, "min_MV": -1, "differ_on_PV": False},
+    ]
+
+    def scenario(self, bank, fast_forward = None, duration = 5):
+        sim = Simulator(None, 0.001, duration, fast_forward = fast_forward)
+        specs = [{"name": "sig", "class": "SignalGenerator", "params": {"events": [{"start": {"value": 10}}, {"step": {"cycle": 3000, "value": 4}}]},
+            "inputs": {"cycle": {"variable": "i"}}}]
+        for k, loop in enumerate(self.loops):
+            MV = {"model": "bank", "variable": "MV[{}]".format(loop["name"])} if bank else {"model": "pid_" + loop["name"], "variable": "MV"}
+            specs.append({"name": "rl_" + loop["name"], "class": "RL", "params": {"resistance": 2 + k, "inductance": 1, "current": 0.},
+                "inputs": {"Vin": MV}})
+            if not bank:
+                params = {key: value for key, value in loop.items() if key != "name"}
+                specs.append({"name": "pid_" + loop["name"], "class": "PIDLimitedIntegral", "params": params,
+                    "inputs": {"SP": {"model": "sig", "variable": "current_value"}, "PV": {"model": "rl_" + loop["name"], "variable": "Vr"}, "FWD": {"value": 0}}})
+        if bank:
+            specs.append({"name": "bank", "class": "PIDBank", "params": {"loops": [dict(loop) for loop in self.loops]},
+                "inputs": {"SP": {"model": "sig", "variable": "current_value"},
+                    "PV": [{"model": "rl_" + loop["name"], "variable": "Vr"} for loop in self.loops],
+                    "FWD": [{"value": 0}]*len(self.loops)}})
+        for spec in specs:
+            spec["enabled"] = True
+            sim.models.update(sim.add_model(spec))
+        sim.schedule()
+        sim.allocate()
+        return sim
+
+    def meter(self, sim, bank):
+        measurement = {"class": "Overshoot", "name": "overshoot", "settings": {
+            "Y": {"object_name": "rl_b", "attribute": "Vr"},
+            "SP": {"object_name": "bank", "attribute": "SP[b]"} if bank else {"object_name": "pid_b", "attribute": "SP"}}}
+        return PerformanceMeter(sim, {"enabled": True, "quiet": True, "measurements": [measurement]})
+
+    def test_same_results(self):
+        reference = self.scenario(False)
+        reference_pf = self.meter(reference, False)
+        reference.record("pid_c", "IG")
+        reference.run(None, reference_pf)
+        sim = self.scenario(True)
+        pf = self.meter(sim, True)
+        sim.record("bank", "IG[c]")
+        sim.run(None, pf)
+        for loop in self.loops:
+            name = loop["name"]
+            np.testing.assert_array_equal(sim.models["rl_" + name].Vr.values(), reference.models["rl_" + name].Vr.values())
+            np.testing.assert_array_equal(getattr(sim.models["bank"], "MV[{}]".format(name)).values(), reference.models["pid_" + name].MV.values())
+        np.testing.assert_array_equal(getattr(sim.models["bank"], "IG[c]").values()[1:], reference.models["pid_c"].IG.values()[1:])
+        self.assertEqual(pf.result_to_string(), reference_pf.result_to_string())
+
+    def test_fast_forward(self):
+        # settles after the step
+        reference = self.scenario(True, duration = 60)
+        reference.run()
+        with mock.patch.object(Simulator, "skip_steady_state", autospec = True, side_effect = Simulator.skip_steady_state) as skip:
+            sim = self.scenario(True, {"tolerance": 0, "cycles": 100}, 60)
+            sim.run()
+        self.assertTrue(skip.called)
+        np.testing.assert_array_equal(sim.models["bank"].MV.values(), reference.models["bank"].MV.values())
+
+    def test_ensemble(self):
+        sim = Simulator(None, 0.001, 1, ensemble = 2)
+        sim.models.update(sim.add_model({"name": "bank", "class": "PIDBank", "enabled": True, "params": {"loops": self.loops}, "inputs": {}}))
+        with self.assertRaises(ValueError):
+            sim.allocate()
+
+class TestElectricMotor(unittest.TestCase):
+    def scenario(self, integrator, dt, adaptive = None, sample_time = None):
+        """ Speed loop of a DC motor whose rotor time constant is 0.2 ms """
+        from tests.models.test_electric_motor import PARAMS
+        sim = Simulator(None, dt, 2, adaptive = adaptive)
+        specs = [
+            {"name": "sig", "class": "SignalGenerator", "params": {"events": [{"start": {"value": 100}}]}, "inputs": {"cycle": {"variable": "i"}}},
+            {"name": "pid", "class": "PIDLimitedMV", "sample_time": sample_time, "params": {"Kp": 0.5, "Ti": 0.2, "Td": 0, "min_MV": -24, "max_MV": 24},
+                "inputs": {"SP": {"model": "sig", "variable": "current_value"}, "PV": {"model": "motor", "variable": "speed"}, "FWD": {"value": 0}}},
+            {"name": "motor", "class": "ElectricMotor", "integrator": integrator, "params": dict(PARAMS), "inputs": {"Va": {"model": "pid", "variable": "MV"}}},
+        ]
+        for spec in specs:
+            spec["enabled"] = True
+            sim.models.update(sim.add_model(spec))
+        sim.schedule()
+        sim.allocate()
+        return sim
+
+    def test_speed_loop(self):
+        # at the cycle time of the PID, 10 times the stable step of explicit Euler
+        sim = self.scenario("zoh", 0.004)
+        sim.run()
+        self.assertListEqual([spec["name"] for spec in sim.execution_list], ["motor", "sig", "pid"])
+        self.assertAlmostEqual(sim.models["motor"].w.last, 100, delta = 0.01)
+        sim = self.scenario("euler", 0.004)
+        with np.errstate(all = "ignore"):
+            sim.run()
+        self.assertFalse(np.isfinite(sim.models["motor"].w.last))
+
+    def test_adaptive(self):
+        # the motor takes steps as long as the sample time of the PID
+        sim = self.scenario("zoh", 0.0001, {"tolerance": 1e-3, "max_step": 0.01}, 0.004)
+        sim.run()
+        self.assertLess(len(sim.t), sim.cycles//10)
+        self.assertAlmostEqual(sim.models["motor"].w.last, 100, delta = 0.01)
+
+class TestEnsemble(unittest.TestCase):
+    def compare(self, scenario, model_name, parameter, values):
+        path = os.path.join(EXAMPLES, scenario)
+        ensemble = Simulator(path, 0.001, 1, record = "all", ensemble = len(values))
+        ensemble.set_parameter(model_name, parameter, values)
+        ensemble.run()
+        for k, value in enumerate(values):
+            sim = Simulator(path, 0.001, 1, record = "all")
+            sim.set_parameter(model_name, parameter, value)
+            sim.run()
+            for name, model in sim.models.items():
+                for variable in model.traces:
+                    expected = getattr(model, variable).values()
+                    result = getattr(ensemble.models[name], variable).values()
+                    if result.ndim == 2:
+                        result = result[:, k]
+                    np.testing.assert_array_equal(result, expected)
+
+    def test_anti_windup(self):
+        self.compare("pid_limited_integral_rl", "pid", "Kp", [1., 2., 50.])
+
+    def test_limited_vr(self):
+        self.compare("rl_limited_vr_pid", "rl_limited_vr", "max_Vr", [3., 8., 20.])
+
+    def test_wrong_size(self):
+        sim = Simulator(os.path.join(EXAMPLES, "rl_plus_pid"), 0.001, 1, ensemble = 3)
+        with self.assertRaises(ValueError):
+            sim.set_parameter("pid", "Kp", [1., 2.])
@@ -0,0 +1,105 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+import multiprocessing
+from unittest import mock
+import simulator
+from simulator.settings import simulator_settings
+from simulator.tuner.brute import BruteTuner
+from simulator.tuner.cache import ResultCache
+
+EXAMPLES = os.path.join(os.path.dirname(simulator.__file__), "settings", "models", "examples")
+
+def write_results(path, start):
+    cache = ResultCache(path)
+    for k in range(start, start + 100):
+        cache.put(str(k), {"k": k})
+    cache.close()
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ResultCache(os.path.join(self.tmp.name, "cache.sqlite"), max_entries = 3)
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def test_put(self):
+        key = self.cache.key({"dt": 0.001}, [1., 0.5, 0.])
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, {"overshoot": {"max": 0.1}})
+        self.assertEqual(self.cache.get(key), {"overshoot": {"max": 0.1}})
+        # gains calculated in slightly different ways are the same
+        self.assertEqual(self.cache.key({"dt": 0.001}, [0.1 + 0.2, 0.5, 0.]), self.cache.key({"dt": 0.001}, [0.3, 0.5, 0.]))
+        self.assertNotEqual(self.cache.key({"dt": 0.01}, [1., 0.5, 0.]), key)
+
+    def test_simulation(self):
+        path = os.path.join(self.tmp.name, "models")
+        shutil.copytree(os.path.join(EXAMPLES, "rl_plus_pid"), path)
+        simulation = ResultCache.simulation(path, 0.001, 1, {})
+        self.assertEqual(ResultCache.simulation(path, 0.001, 1, {}), simulation)
+        with open(os.path.join(path, "pid.json"), "a") as f:
+            f.write(" ")
+        self.assertNotEqual(ResultCache.simulation(path, 0.001, 1, {}), simulation)
+
+    def test_eviction(self):
+        for key in "abcd":
+            self.cache.put(key, key)
+        # "a" is used again, "b" is the least recently used
+        self.cache.get("a")
+        self.cache.evict()
+        self.assertEqual(len(self.cache), 3)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("a"), "a")
+
+    def test_concurrent_writers(self):
+        path = os.path.join(self.tmp.name, "shared.sqlite")
+        ResultCache(path).close()
+        with multiprocessing.Pool(4) as pool:
+            pool.starmap(write_results, [(path, 100*k) for k in range(8)], 1)
+        cache = ResultCache(path)
+        self.assertEqual(len(cache), 800)
+        self.assertEqual(cache.get("799"), {"k": 799})
+        cache.close()
+
+class TestCachedTuner(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.tmp.name, "tuner"))
+        with open(os.path.join(simulator_settings["path_to_settings"], "tuner", "brute.json"), "r") as rf:
+            self.settings = json.load(rf)
+        self.settings.update({"p_range": [1, 10], "p_steps": 2, "i_range": [0.1, 1], "i_steps": 2, "d_steps": 1, "processes": 1, "quiet": True,
+            "cache": {"enabled": True, "path": os.path.join(self.tmp.name, "cache.sqlite")}})
+        self.patch = mock.patch.dict(simulator_settings, {"path_to_settings": self.tmp.name,
+            "path_to_models": os.path.join(EXAMPLES, "rl_plus_pid"), "duration": 1})
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        self.tmp.cleanup()
+
+    def tune(self, **settings):
+        with open(os.path.join(self.tmp.name, "tuner", "brute.json"), "w") as wf:
+            json.dump(dict(self.settings, **settings), wf)
+        tuner = BruteTuner()
+        tuner.run()
+        tuner.cache.close()
+        return tuner.results
+
+    def test_rerun(self):
+        first = self.tune()
+        self.assertFalse(any(r["cached"] for r in first))
+        # only the new values of Kp are simulated
+        second = self.tune(p_steps = 3)
+        self.assertListEqual([r["cached"] for r in second], [True, True, False, False, True, True])
+        self.assertListEqual([r["result"] for r in second if r["settings"]["p"] in (1, 10)], [r["result"] for r in first])
+        # and costs are calculated again from the results
+        weighted = self.tune(cost = dict(self.settings["cost"], overshoot = dict(self.settings["cost"]["overshoot"], weight = 2)))
+        self.assertTrue(all(r["cached"] for r in weighted))
+        self.assertNotEqual([r["result"] for r in weighted], [r["result"] for r in first])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import os
+import json
+import tempfile
+import unittest
+from unittest import mock
+import simulator
+from simulator.settings import simulator_settings
+from simulator.tuner.brute import BruteTuner, RecurringBruteTuner
+from simulator.tuner.optimizer import OptimizerTuner
+from simulator.tuner.journal import TuningJournal
+
+EXAMPLES = os.path.join(os.path.dirname(simulator.__file__), "settings", "models", "examples")
+
+class Stopped(Exception):
+    pass
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.tmp.name, "tuner"))
+        self.journal = os.path.join(self.tmp.name, "results.jsonl")
+        with open(os.path.join(simulator_settings["path_to_settings"], "tuner", "brute.json"), "r") as rf:
+            self.settings = json.load(rf)
+        self.settings.update({"p_range": [1, 3000], "p_steps": 3, "i_range": [0.01, 2], "i_steps": 3, "d_steps": 1, "processes": 1,
+            "quiet": True, "cache": {"enabled": False}, "journal": {"enabled": True, "path": self.journal},
+            "recurring": {"divider": 2, "threshold": -1, "max_loop_runs": 2}})
+        self.patch = mock.patch.dict(simulator_settings, {"path_to_settings": self.tmp.name,
+            "path_to_models": os.path.join(EXAMPLES, "rl_plus_pid"), "duration": 1})
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        self.tmp.cleanup()
+
+    def tuner(self, class_, **settings):
+        with open(os.path.join(self.tmp.name, "tuner", class_.settings_file), "w") as wf:
+            json.dump(dict(self.settings, **settings), wf)
+        tuner = class_()
+        # simulations run, and stop of the job after `limit` of them
+        tuner.simulated, tuner.limit = 0, None
+        run_sim = tuner.run_sim
+        def counted(*candidate):
+            if tuner.simulated == tuner.limit:
+                raise Stopped()
+            tuner.simulated += 1
+            return run_sim(*candidate)
+        tuner.run_sim = counted
+        return tuner
+
+    def resume(self, class_, stop, **settings):
+        """ Results of a job stopped after `stop` simulations and resumed, and of the same job run at once """
+        stopped = self.tuner(class_, **settings)
+        stopped.limit = stop
+        with self.assertRaises(Stopped):
+            stopped.run()
+        resumed = self.tuner(class_, **settings)
+        resumed.run()
+        complete = self.tuner(class_, **dict(settings, journal = {"enabled": False}))
+        complete.run()
+        self.assertEqual(len(TuningJournal.read(self.journal)), complete.simulated)
+        self.assertEqual(stop + resumed.simulated, complete.simulated)
+        self.assertEqual([r["settings"] for r in resumed.results], [r["settings"] for r in complete.results])
+        self.assertEqual(resumed.best_result, complete.best_result)
+        return resumed
+
+    def test_brute(self):
+        self.resume(BruteTuner, 4)
+        # once done, running it again simulates nothing
+        again = self.tuner(BruteTuner)
+        again.run()
+        self.assertEqual(again.simulated, 0)
+
+    def test_recurring(self):
+        resumed = self.resume(RecurringBruteTuner, 12)
+        with open(os.path.splitext(self.journal)[0] + ".checkpoint.json", "r") as rf:
+            checkpoint = json.load(rf)
+        self.assertEqual(checkpoint["state"]["round"], 1)
+        self.assertEqual(checkpoint["state"]["p_range"], list(resumed.p_range))
+        self.assertEqual(checkpoint["best"]["result"], TuningJournal.best(self.journal)["result"])
+
+    def test_halving(self):
+        self.resume(BruteTuner, 11, halving = {"enabled": True, "horizon": 0.25, "eta": 2})
+
+    def test_optimizer(self):
+        self.resume(OptimizerTuner, 7, optimizer = {"method": "bayesian", "budget": 12, "batch": 4, "seed": 0})
+
+    def test_unseeded_optimizer(self):
+        optimizer = {"method": "cmaes", "budget": 12, "batch": 4}
+        stopped = self.tuner(OptimizerTuner, optimizer = optimizer)
+        stopped.limit = 7
+        with self.assertRaises(Stopped):
+            stopped.run()
+        resumed = self.tuner(OptimizerTuner, optimizer = optimizer)
+        resumed.run()
+        self.assertEqual(resumed.simulated, 5)
+        # the seed drawn by the first run is the one resumed with
+        with open(os.path.splitext(self.journal)[0] + ".checkpoint.json", "r") as rf:
+            seed = json.load(rf)["seed"]
+        complete = self.tuner(OptimizerTuner, optimizer = dict(optimizer, seed = seed), journal = {"enabled": False})
+        complete.run()
+        self.assertEqual([r["settings"] for r in resumed.results], [r["settings"] for r in complete.results])
+
+    def test_cut_line(self):
+        tuner = self.tuner(BruteTuner)
+        tuner.limit = 2
+        with self.assertRaises(Stopped):
+            tuner.run()
+        # a job killed while writing a result
+        with open(self.journal, "a") as wf:
+            wf.write('{"result": 1.')
+        self.assertEqual(len(TuningJournal.read(self.journal)), 2)
+        resumed = self.tuner(BruteTuner)
+        resumed.run()
+        self.assertEqual(resumed.simulated, 7)
+        self.assertEqual(len(TuningJournal.read(self.journal)), 9)
+
+    def test_other_job(self):
+        tuner = self.tuner(BruteTuner)
+        tuner.limit = 2
+        with self.assertRaises(Stopped):
+            tuner.run()
+        with self.assertRaises(ValueError):
+            self.tuner(BruteTuner, p_steps = 4).run()
+        # unless it isn't resumed
+        restarted = self.tuner(BruteTuner, p_steps = 4, journal = {"enabled": True, "path": self.journal, "resume": False})
+        restarted.run()
+        self.assertEqual(restarted.simulated, 12)
+
+if __name__ == '__main__':
+    unittest.main()
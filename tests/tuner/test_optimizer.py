@@ -0,0 +1,97 @@
+import os
+import json
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import simulator
+from simulator.settings import simulator_settings
+from simulator.tuner.optimizer import NelderMead, CMAES, BayesianOptimization, OptimizerTuner
+
+EXAMPLES = os.path.join(os.path.dirname(simulator.__file__), "settings", "models", "examples")
+
+def minimize(search, budget):
+    """ Lowest value of a bowl centered on (0.3, 0.7) found within a budget """
+    best = np.inf
+    evaluations = 0
+    while evaluations < budget and not search.done:
+        x = search.ask()
+        costs = np.sum((x - [0.3, 0.7])**2, axis = 1)
+        search.tell(x, costs)
+        best = min(best, costs.min())
+        evaluations += len(x)
+    return best
+
+class TestSearches(unittest.TestCase):
+    def test_nelder_mead(self):
+        self.assertLess(minimize(NelderMead(np.full(2, 0.5)), 100), 1e-4)
+
+    def test_cmaes(self):
+        self.assertLess(minimize(CMAES(np.full(2, 0.5), np.random.default_rng(0)), 200), 1e-4)
+
+    def test_bayesian(self):
+        self.assertLess(minimize(BayesianOptimization(np.full(2, 0.5), np.random.default_rng(0), batch = 4), 40), 1e-3)
+
+    def test_diverging(self):
+        # costs that couldn't be calculated, or exploded, don't hide the others
+        y = BayesianOptimization.transform(np.array([1., 2., 3., np.inf, np.nan, 1e300]))
+        self.assertTrue(np.all(np.isfinite(y)))
+        self.assertTrue(y[0] < y[1] < y[2])
+
+class TestOptimizerTuner(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.tmp.name, "tuner"))
+        with open(os.path.join(simulator_settings["path_to_settings"], "tuner", "optimizer.json"), "r") as rf:
+            self.settings = json.load(rf)
+        self.settings.update({"p_range": [1, 3000], "i_range": [0.01, 2], "d_range": [0, 0], "processes": 1, "quiet": True,
+            "cache": {"enabled": False}})
+        self.patch = mock.patch.dict(simulator_settings, {"path_to_settings": self.tmp.name,
+            "path_to_models": os.path.join(EXAMPLES, "rl_plus_pid"), "duration": 2})
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        self.tmp.cleanup()
+
+    def tune(self, abandon = None, **optimizer):
+        with open(os.path.join(self.tmp.name, "tuner", "optimizer.json"), "w") as wf:
+            json.dump(dict(self.settings, optimizer = optimizer, abandon = abandon or {}), wf)
+        tuner = OptimizerTuner()
+        tuner.run()
+        return tuner
+
+    def test_budget(self):
+        for method in OptimizerTuner.methods:
+            tuner = self.tune(method = method, budget = 10, batch = 4, seed = 0)
+            self.assertEqual(len(tuner.results), 10)
+            # Td has a single value and isn't searched
+            self.assertTrue(all(r["settings"]["d"] == 0 for r in tuner.results))
+            self.assertTrue(all(1 <= r["settings"]["p"] <= 3000 for r in tuner.results))
+            self.assertLess(tuner.best_result["result"], 100)
+
+    def test_seed(self):
+        first = self.tune(method = "bayesian", budget = 8, batch = 4, seed = 1)
+        second = self.tune(method = "bayesian", budget = 8, batch = 4, seed = 1)
+        self.assertListEqual([r["settings"] for r in first.results], [r["settings"] for r in second.results])
+
+    def test_abandoned(self):
+        told = []
+        tell = NelderMead.tell
+        def told_costs(search, x, costs):
+            told.extend(costs)
+            return tell(search, x, costs)
+        with mock.patch.object(NelderMead, "tell", autospec = True, side_effect = told_costs):
+            tuner = self.tune(abandon = {"enabled": True, "period": 0.1}, method = "nelder_mead", budget = 12, seed = 0)
+        abandoned = [k for k, r in enumerate(tuner.results[:len(told)]) if r["abandoned"]]
+        self.assertTrue(abandoned)
+        # the lower bound of an abandoned candidate isn't taken as its cost
+        self.assertTrue(all(told[k] == np.inf for k in abandoned))
+        self.assertFalse(tuner.best_result["abandoned"])
+
+    def test_method(self):
+        with self.assertRaises(ValueError):
+            self.tune(method = "simplex")
+
+if __name__ == '__main__':
+    unittest.main()
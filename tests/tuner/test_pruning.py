@@ -0,0 +1,70 @@
+import os
+import json
+import tempfile
+import unittest
+from unittest import mock
+import simulator
+from simulator.settings import simulator_settings
+from simulator.simulator import Simulator
+from simulator.tuner.brute import BruteTuner
+
+EXAMPLES = os.path.join(os.path.dirname(simulator.__file__), "settings", "models", "examples")
+
+class TestPruning(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.tmp.name, "tuner"))
+        with open(os.path.join(simulator_settings["path_to_settings"], "tuner", "brute.json"), "r") as rf:
+            self.settings = json.load(rf)
+        self.settings.update({"p_range": [1, 20], "p_steps": 3, "i_range": [0.05, 2], "i_steps": 3, "d_steps": 1, "processes": 1,
+            "quiet": True, "cache": {"enabled": False}})
+        self.patch = mock.patch.dict(simulator_settings, {"path_to_settings": self.tmp.name,
+            "path_to_models": os.path.join(EXAMPLES, "rl_plus_pid"), "duration": 4})
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        self.tmp.cleanup()
+
+    def tune(self, **settings):
+        with open(os.path.join(self.tmp.name, "tuner", "brute.json"), "w") as wf:
+            json.dump(dict(self.settings, **settings), wf)
+        tuner = BruteTuner()
+        tuner.run()
+        return tuner
+
+    def test_stop(self):
+        sim = Simulator(simulator_settings["path_to_models"], simulator_settings["dt"], simulator_settings["duration"])
+        sim.run(stop = lambda s: s.t[-1] >= 0.5)
+        self.assertFalse(sim.running)
+        self.assertAlmostEqual(sim.t[-1], 0.5)
+
+    def test_abandon(self):
+        full = self.tune()
+        pruned = self.tune(abandon = {"enabled": True, "period": 0.1})
+        self.assertEqual(pruned.best_result["result"], full.best_result["result"])
+        self.assertEqual(pruned.best_result["settings"], full.best_result["settings"])
+        self.assertTrue(any(r["abandoned"] for r in pruned.results))
+        self.assertLess(sum(r["time"] for r in pruned.results), sum(r["time"] for r in full.results))
+        # abandoned candidates would have cost more
+        costs = {tuple(r["settings"].values()): r["result"] for r in full.results}
+        for r in pruned.results:
+            if r["abandoned"]:
+                self.assertLessEqual(r["result"], costs[tuple(r["settings"].values())])
+
+    def test_halving(self):
+        full = self.tune()
+        screened = self.tune(halving = {"enabled": True, "horizon": 1, "eta": 2})
+        self.assertEqual(len(screened.results), len(full.results))
+        complete = [r for r in screened.results if not r["abandoned"]]
+        # 9 candidates on 1 s, 5 on 2 s and 3 on the whole 4 s
+        self.assertEqual(len(complete), 3)
+        self.assertEqual(sum(r["time"] < 1.5 for r in screened.results), 4)
+        # survivors carried on from a snapshot end with the cost of a full run
+        costs = {tuple(r["settings"].values()): r["result"] for r in full.results}
+        for r in complete:
+            self.assertAlmostEqual(r["result"], costs[tuple(r["settings"].values())])
+        self.assertNotIn("snapshot", screened.best_result)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+import numpy as np
+from simulator.utils.history import Trace, WindowedTrace, LatestValue
+from simulator.models.rl import RL
+
+class TestTrace(unittest.TestCase):
+    def setUp(self):
+        self.trace = Trace(3, [1.])
+
+    def test_append(self):
+        self.trace.append(2.)
+        self.trace.append(None)
+        self.assertEqual(len(self.trace), 3)
+        self.assertEqual(self.trace[0], 1.)
+        self.assertEqual(self.trace[-2], 2.)
+        self.assertTrue(np.isnan(self.trace[-1]))
+        with self.assertRaises(IndexError):
+            self.trace[3]
+
+    def test_grow(self):
+        for v in range(10):
+            self.trace.append(v)
+        np.testing.assert_array_equal(self.trace.values(), [1.] + list(range(10)))
+        self.assertEqual(self.trace[-1], 9)
+
+    def test_set_latest(self):
+        self.trace.append(2.)
+        self.trace[-1] = 5.
+        self.assertEqual(self.trace[-1], 5.)
+        self.assertListEqual(list(self.trace), [1., 5.])
+
+    def test_reset(self):
+        self.trace.append(2.)
+        self.trace.reset()
+        self.assertListEqual(list(self.trace), [1.])
+        self.assertEqual(self.trace[-1], 1.)
+
+    def test_rewind(self):
+        self.trace.append(2.)
+        latest = LatestValue([2.])
+        marks = self.trace.mark(), latest.mark()
+        for v in range(3, 10):
+            self.trace.append(v)
+            latest.append(v)
+        self.trace.rewind(marks[0])
+        latest.rewind(marks[1])
+        self.assertListEqual(list(self.trace), [1., 2.])
+        self.assertEqual(self.trace[-1], 2.)
+        self.assertEqual(latest[-1], 2.)
+
+    def test_latest_only(self):
+        latest = LatestValue([1.])
+        latest.append(2.)
+        self.assertEqual(latest[-1], 2.)
+        # the initial value isn't kept
+        for index in [0, 1, -2]:
+            with self.assertRaises(IndexError):
+                latest[index]
+            with self.assertRaises(IndexError):
+                latest[index] = 3.
+        latest[-1] = 3.
+        self.assertListEqual(list(latest[:]), [3.])
+
+class TestAllocatedModel(unittest.TestCase):
+    def test_same_values_as_lists(self):
+        rl_list = RL(0.001, 1., 1., 0.)
+        rl_trace = RL(0.001, 1., 1., 0.)
+        rl_trace.allocate(lambda name, values: Trace(101, values))
+        for _ in range(100):
+            self.assertEqual(rl_list.calculate(10.), rl_trace.calculate(10.))
+        for name in RL.traces:
+            expected = [np.nan if v is None else v for v in getattr(rl_list, name)]
+            np.testing.assert_array_equal(getattr(rl_trace, name).values(), expected)
+        rl_trace.reset()
+        self.assertEqual(len(rl_trace.i), 1)
+
+class TestWindowedTrace(unittest.TestCase):
+    def setUp(self):
+        self.written = []
+        self.trace = WindowedTrace(4, 3, lambda data: self.written.append(data.copy()), [0.])
+
+    def test_window(self):
+        for v in range(1, 20):
+            self.trace.append(float(v))
+            self.assertLessEqual(len(self.trace), 7)
+        self.assertEqual(self.trace[-1], 19.)
+        self.assertEqual(self.trace.total, 20)
+        np.testing.assert_array_equal(self.trace.values()[-4:], [16., 17., 18., 19.])
+        self.trace.flush()
+        np.testing.assert_array_equal(np.concatenate(self.written), np.arange(20.))
+
+    def test_rewind(self):
+        for v in range(1, 7):
+            self.trace.append(float(v))
+        # the value appended after the mark spills the others
+        mark = self.trace.mark()
+        self.trace.append(60.)
+        self.trace.rewind(mark)
+        self.assertEqual(self.trace.total, 7)
+        self.assertEqual(self.trace[-1], 6.)
+        for v in range(7, 20):
+            self.trace.append(float(v))
+        self.trace.flush()
+        np.testing.assert_array_equal(np.concatenate(self.written), np.arange(20.))
+        # values written can't be dropped
+        mark = self.trace.mark()
+        for v in range(20, 30):
+            self.trace.append(float(v))
+        with self.assertRaises(ValueError):
+            self.trace.rewind(mark)
+
+    def test_reset(self):
+        for v in range(1, 20):
+            self.trace.append(float(v))
+        self.trace.reset()
+        self.assertEqual(self.trace.total, 1)
+        self.assertListEqual(list(self.trace), [0.])
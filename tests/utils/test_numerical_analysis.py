@@ -0,0 +1,131 @@
+import copy
+import unittest
+import numpy as np
+from simulator.utils.numerical_analysis import DumbIntegrator, DumbDifferentiator, FilteredDifferentiator, DeadBand, RateLimiter
+from simulator.utils.numerical_analysis import EnsembleIntegrator, EnsembleDifferentiator, EnsembleDeadBand, EnsembleRateLimiter
+from simulator.utils.numerical_analysis import FIRST_ORDER_POLES, first_order_step, first_order_error
+
+class TestArrays(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.values = rng.normal(size = 1000).cumsum()
+        # zeros are taken as missing previous values
+        self.values[[0, 10, 11, 500]] = 0.
+        self.steps = rng.uniform(0.001, 0.1, size = 1000)
+
+    def scalar(self, method, dt):
+        """ Calls on each value """
+        return np.array([method(dt[k] if np.ndim(dt) else dt, v) for k, v in enumerate(self.values)])
+
+    def test_integrator(self):
+        for dt in [0.01, self.steps]:
+            scalar = DumbIntegrator(2.)
+            expected = self.scalar(scalar.calculate, dt)
+            integrator = DumbIntegrator(2.)
+            np.testing.assert_array_equal(integrator.calculate_array(dt, self.values), expected)
+            self.assertEqual(integrator.m0, scalar.m0)
+            self.assertEqual(integrator.y0, scalar.y0)
+
+    def test_differentiator(self):
+        for dt in [0.01, self.steps]:
+            scalar = DumbDifferentiator()
+            expected = self.scalar(scalar.calculate, dt)
+            np.testing.assert_array_equal(DumbDifferentiator().calculate_array(dt, self.values), expected)
+
+    def test_filtered_differentiator(self):
+        for dt in [0.01, self.steps]:
+            scalar = FilteredDifferentiator(0.05, 1.)
+            expected = self.scalar(scalar.calculate, dt)
+            filtered = FilteredDifferentiator(0.05, 1.)
+            np.testing.assert_array_equal(filtered.calculate_array(dt, self.values), expected)
+            self.assertEqual(filtered.r0, scalar.r0)
+            self.assertEqual(filtered.y0, scalar.y0)
+        # chunk by chunk, and a scenario per column
+        filtered = FilteredDifferentiator(0.05)
+        chunks = np.split(self.values, [0, 1, 300, 301, 999])
+        expected = FilteredDifferentiator(0.05).calculate_array(0.01, self.values)
+        np.testing.assert_array_equal(np.concatenate([filtered.calculate_array(0.01, c) for c in chunks]), expected)
+        columns = FilteredDifferentiator(0.05).calculate_array(0.01, np.stack([self.values, 2*self.values], axis = 1))
+        np.testing.assert_array_equal(columns[:, 0], expected)
+        # no lag gives the raw rates, and a lag settles on the slope of a ramp
+        np.testing.assert_allclose(FilteredDifferentiator(0).calculate_array(0.01, self.values),
+            DumbDifferentiator().calculate_array(0.01, self.values), atol = 1e-9)
+        ramp = FilteredDifferentiator(0.05).calculate_array(0.01, 1 + 3*np.arange(200)*0.01)
+        self.assertLess(ramp[1], 3)
+        self.assertAlmostEqual(ramp[-1], 3)
+
+    def test_chunks(self):
+        whole = DumbIntegrator().calculate_array(0.01, self.values)
+        integrator, differentiator = DumbIntegrator(), DumbDifferentiator()
+        chunks = np.split(self.values, [0, 1, 300, 301, 999])
+        np.testing.assert_array_equal(np.concatenate([integrator.calculate_array(0.01, c) for c in chunks]), whole)
+        rates = np.concatenate([differentiator.calculate_array(0.01, c) for c in chunks])
+        np.testing.assert_array_equal(rates, DumbDifferentiator().calculate_array(0.01, self.values))
+        # and carry on with the scalar calculation
+        scalar = DumbIntegrator()
+        self.scalar(scalar.calculate, 0.01)
+        self.assertEqual(integrator.calculate(0.01, 1.), scalar.calculate(0.01, 1.))
+
+    def test_hold(self):
+        integrator = DumbIntegrator(2.)
+        held = copy.deepcopy(integrator)
+        held.calculate(0.01, 0.5)
+        held.hold(0.01, 1000)
+        for _ in range(1001):
+            integrator.calculate(0.01, 0.5)
+        self.assertAlmostEqual(held.m0, integrator.m0, delta = 1e-12*integrator.m0)
+        # areas lost in the rounding of m0 are lost all the same
+        integrator = DumbIntegrator(1e20)
+        integrator.calculate(0.01, 1.)
+        integrator.hold(0.01, 10**6)
+        self.assertEqual(integrator.m0, 1e20)
+
+    def test_deadband(self):
+        deadband = DeadBand(0.5, 1.)
+        np.testing.assert_array_equal(deadband.calculate_array(self.values), [deadband.calculate(v) for v in self.values])
+
+    def test_rate_limiter(self):
+        limiter = RateLimiter(10.)
+        limited = limiter.calculate_array(0.01, self.values)
+        self.assertEqual(limited[0], self.values[0])
+        self.assertTrue(np.all(np.abs(np.diff(limited)) <= 10*0.01 + 1e-12))
+        scalar = RateLimiter(10.)
+        np.testing.assert_array_equal(limited, [scalar.calculate(0.01, v) for v in self.values])
+        self.assertEqual(limiter.y0, limited[-1])
+
+    def test_ensembles(self):
+        # a chunk of N scenarios, a value per scenario along the second axis
+        values = self.values.reshape(100, 10)
+        for scalar, ensemble, array in [
+                (DumbIntegrator(), EnsembleIntegrator(np.zeros(10)), DumbIntegrator(np.zeros(10))),
+                (DumbDifferentiator(), EnsembleDifferentiator(), DumbDifferentiator()),
+                (RateLimiter(10.), EnsembleRateLimiter(10.), EnsembleRateLimiter(10.))]:
+            with self.subTest(model = type(scalar).__name__):
+                expected = np.array([ensemble.calculate(0.01, v) for v in values])
+                np.testing.assert_array_equal(array.calculate_array(0.01, values), expected)
+                np.testing.assert_array_equal(expected[:, 3], [scalar.calculate(0.01, v) for v in values[:, 3]])
+        deadband = EnsembleDeadBand(np.full(10, 0.5), np.zeros(10))
+        np.testing.assert_array_equal(deadband.calculate(values), DeadBand(0.5).calculate_array(values))
+
+class TestFirstOrder(unittest.TestCase):
+    def exact(self, x, x_ss, x_ss_next, h):
+        """ Step from x, the steady state moving linearly from x_ss to x_ss_next """
+        pole = np.exp(-h)
+        return pole*x + x_ss*(1 - pole) + (x_ss_next - x_ss)*(1 - (1 - pole)/h)
+
+    def test_error(self):
+        for integrator in FIRST_ORDER_POLES:
+            for h in [0.01, 0.1]:
+                # held steady state, then one that keeps moving
+                for x, x_ss, x_ss_previous in [(0., 1., 1.), (0.5, 1., 0.9)]:
+                    with self.subTest(integrator = integrator, h = h, moving = x_ss != x_ss_previous):
+                        estimate = first_order_error(integrator, x, x_ss, x_ss_previous, h)
+                        error = abs(first_order_step(integrator, x, x_ss, h) - self.exact(x, x_ss, 2*x_ss - x_ss_previous, h))
+                        if error < 1e-15:
+                            self.assertLess(estimate, 1e-15)
+                        else:
+                            self.assertGreater(estimate, 0.9*error)
+                            self.assertLess(estimate, 2*error)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,16 @@
+import unittest
+from simulator.utils.scheduling import strongly_connected_components, levelize
+
+class TestScheduling(unittest.TestCase):
+    def test_components(self):
+        edges = {"a": {"b"}, "b": {"c"}, "c": {"a"}, "d": {"a"}, "e": {"e"}}
+        components = strongly_connected_components(["a", "b", "c", "d", "e"], edges)
+        self.assertCountEqual([sorted(c) for c in components], [["a", "b", "c"], ["d"], ["e"]])
+
+    def test_levels(self):
+        edges = {"a": {"c"}, "b": {"c"}, "c": {"d"}}
+        self.assertListEqual(levelize(["d", "c", "b", "a"], edges, str), [["a", "b"], ["c"], ["d"]])
+
+    def test_cycle(self):
+        with self.assertRaises(ValueError):
+            levelize(["a", "b"], {"a": {"b"}, "b": {"a"}})